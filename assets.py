@@ -0,0 +1,75 @@
+import base64
+import io
+import logging
+import mimetypes
+import os
+import threading
+import streamlit as st
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+_INJECTED_KEY = "_assets_injected_css"
+_cache = {}
+_lock = threading.Lock()
+
+def _cached(kind, path, build):
+    """Build an asset once per process, rebuilding it when the file's mtime changes."""
+    mtime = os.path.getmtime(path)
+    key = (kind, path)
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] == mtime:
+            return entry[1]
+    value = build(path)
+    with _lock:
+        _cache[key] = (mtime, value)
+    return value
+
+def _read_text(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def read_text_asset(path):
+    return _cached("text", path, _read_text)
+
+def _encode_image(path, max_width=600, quality=85):
+    mime = mimetypes.guess_type(path)[0] or "image/jpeg"
+    with open(path, "rb") as f:
+        data = f.read()
+    if Image is not None:
+        # The sidebar shows the logo at ~300px, so a 2x JPEG is plenty
+        image = Image.open(io.BytesIO(data))
+        if image.width > max_width:
+            image.thumbnail((max_width, max_width * image.height // image.width))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+        if buffer.tell() < len(data):
+            data, mime = buffer.getvalue(), "image/jpeg"
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+def image_data_uri(path):
+    """Return the (downscaled) image as a data URI, or None if it cannot be read."""
+    try:
+        return _cached("image", path, _encode_image)
+    except Exception as e:
+        logging.error(f"Error converting image to base64: {str(e)}")
+        return None
+
+def begin_render():
+    """Mark the start of a page render; called by main before any page runs."""
+    st.session_state[_INJECTED_KEY] = set()
+
+def inject_css(path='style.css'):
+    """Inject a stylesheet at most once per render.
+
+    When a page runs on its own (without main calling begin_render) it always injects.
+    """
+    injected = st.session_state.get(_INJECTED_KEY)
+    if injected is not None and path in injected:
+        return
+    st.markdown(f"<style>{read_text_asset(path)}</style>", unsafe_allow_html=True)
+    if injected is not None:
+        injected.add(path)
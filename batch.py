@@ -0,0 +1,226 @@
+"""Headless batch generation of problems, solutions, Lean Canvases and Business Canvases.
+
+Usage: python batch.py INPUT OUTPUT [--kind KIND] [--workers N] [--rate PER_MINUTE] [--retries N]
+
+INPUT is a .csv or .jsonl file with one item per row. Each row names its generator
+in a "kind" column (or uses --kind) and gives that generator's fields, e.g.
+
+    kind,industry_name,problem_description,solution_description
+    lean_canvas,Bijouteries,Clients hesitate to buy online,Virtual try-on
+
+Results are appended to OUTPUT (JSONL) as they finish. Rerunning with the same
+OUTPUT skips the items that already succeeded, so an interrupted batch resumes.
+The API key is read from GEMINI_API_KEY.
+"""
+import argparse
+import csv
+import hashlib
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rate_limit import is_throttled
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 4))
+BATCH_RATE = float(os.environ.get("BATCH_RATE", 30))
+BATCH_RETRIES = int(os.environ.get("BATCH_RETRIES", 3))
+BATCH_BACKOFF = float(os.environ.get("BATCH_BACKOFF", 2))
+
+# kind: (module, class, fields with their defaults (None means required), function(generator) -> output)
+KINDS = {
+    "problems": ("problems", "SSSSS", {
+        "industry_name": None, "type_client": None, "region": "wt-wt", "problem_number": 3, "year": 2024,
+    }, lambda generator: {"problems": generator.execute()}),
+    "solutions": ("solutions", "Solutions", {
+        "industry_name": None, "problem_description": None, "num_solutions": 3, "creative_method": "Five Whys", "year": 2024,
+    }, lambda generator: dict(zip(("existing_solutions", "creative_solutions"), generator.execute()))),
+    "lean_canvas": ("lean_canvas", "LeanCanvas", {
+        "industry_name": None, "problem_description": None, "solution_description": None, "year": 2024,
+    }, lambda generator: {"lean_canvas": generator.execute()}),
+    "business_canvas": ("business_canvas", "BusinessCanvas", {
+        "industry_name": None, "job_to_be_done": None, "customer_description": None,
+    }, lambda generator: {
+        **dict(zip(("value_proposition_canvas", "business_model_canvas"), generator.execute())),
+        "value_proposition": generator.value_proposition.to_dict(), "handoff_tokens": generator.handoff_tokens,
+    }),
+}
+
+# Fields every generator takes, overridable per row
+COMMON_FIELDS = {"language": "French", "model": "gemini-1.5-flash", "google_temperature": 0.7}
+INT_FIELDS = {"problem_number", "num_solutions", "year"}
+FLOAT_FIELDS = {"google_temperature"}
+
+# Errors of the API client and HTTP layers that a later attempt may not hit
+TRANSIENT_ERRORS = {"Timeout", "ConnectTimeout", "ReadTimeout", "ConnectionError", "DeadlineExceeded", "ServiceUnavailable", "InternalServerError"}
+
+class NoResult(Exception):
+    """The generator returned nothing, e.g. for a model answer it could not parse; another sample may do."""
+
+def is_transient(error) -> bool:
+    """True for rate limits, timeouts, connection and server errors and empty results, which are worth retrying."""
+    if is_throttled(error):
+        return True
+    while error is not None:
+        if isinstance(error, (NoResult, TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERRORS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+class RateLimiter:
+    """Spaces item starts evenly so all workers together stay under rate per minute."""
+
+    def __init__(self, rate):
+        self.interval = 60.0 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def read_items(path, default_kind=None):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    items = []
+    for row in rows:
+        row = {name: value for name, value in row.items() if value not in (None, "")}
+        row.setdefault("kind", default_kind)
+        if row["kind"] not in KINDS:
+            raise ValueError(f"Unknown kind {row['kind']!r} in {row}; expected one of {', '.join(KINDS)}")
+        row.setdefault("id", item_id(row))
+        items.append(row)
+    return items
+
+def item_id(row) -> str:
+    return hashlib.sha256(json.dumps(row, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def completed_ids(path):
+    """Ids already written successfully to the output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+def build_generator(api_key, row):
+    module_name, class_name, fields, _ = KINDS[row["kind"]]
+    kwargs = {}
+    for name, default in {**COMMON_FIELDS, **fields}.items():
+        value = row.get(name, default)
+        if value is None:
+            raise ValueError(f"Missing field {name!r} for kind {row['kind']}")
+        if name in INT_FIELDS:
+            value = int(value)
+        elif name in FLOAT_FIELDS:
+            value = float(value)
+        kwargs[name] = value
+    generator_class = getattr(importlib.import_module(module_name), class_name)
+    return generator_class(google_api_key=api_key, **kwargs)
+
+def run_item(api_key, row, limiter, retries, backoff):
+    """Generate one item, retrying transient failures with exponential backoff. Returns the output record.
+
+    Other errors, such as a missing field, fail the item at once.
+    """
+    run = KINDS[row["kind"]][3]
+    start = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        limiter.wait()
+        try:
+            generator = build_generator(api_key, row)
+            output = run(generator)
+            if any(value is None for value in output.values()):
+                raise NoResult("The generator returned no result")
+            # Outputs served from the semantic cache rather than generated for this item
+            output["reused"] = sorted(getattr(generator, "reused", {}))
+            status, error = "ok", None
+            break
+        except Exception as e:
+            output, status, error = None, "failed", str(e)
+            if attempt > retries or not is_transient(e):
+                break
+            logging.warning(f"Item {row['id']} attempt {attempt} failed: {error}")
+            time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return {
+        "id": row["id"], "kind": row["kind"], "status": status, "input": row, "output": output,
+        "error": error, "attempts": attempt, "latency": round(time.perf_counter() - start, 3),
+    }
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_batch(api_key, items, output_path, workers=BATCH_WORKERS, rate=BATCH_RATE, retries=BATCH_RETRIES, backoff=BATCH_BACKOFF):
+    """Run items concurrently, appending each record to output_path as it finishes. Returns the records."""
+    limiter = RateLimiter(rate)
+    records = []
+    with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_item, api_key, row, limiter, retries, backoff) for row in items]
+        for future in as_completed(futures):
+            record = future.result()
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            records.append(record)
+            print(f"[{len(records)}/{len(items)}] {record['kind']} {record['id']} {record['status']} in {record['latency']:.1f}s", file=sys.stderr)
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate problems, solutions and canvases for every row of a CSV or JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL file of items")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--kind", choices=list(KINDS), help="Generator for rows without a kind column")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Items generated concurrently")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE, help="Item starts per minute across all workers (0 for no limit)")
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES, help="Retries per failed item")
+    parser.add_argument("--backoff", type=float, default=BATCH_BACKOFF, help="Base delay in seconds between retries")
+    parser.add_argument("--restart", action="store_true", help="Ignore earlier results in OUTPUT instead of resuming")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        parser.error("GEMINI_API_KEY is not set")
+
+    items = read_items(args.input, args.kind)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = completed_ids(args.output)
+    pending = [row for row in items if row["id"] not in done]
+    print(f"{len(items)} items, {len(items) - len(pending)} already done, {len(pending)} to run", file=sys.stderr)
+
+    start = time.perf_counter()
+    records = run_batch(api_key, pending, args.output, args.workers, args.rate, args.retries, args.backoff)
+    elapsed = time.perf_counter() - start
+
+    latencies = [record["latency"] for record in records]
+    succeeded = sum(1 for record in records if record["status"] == "ok")
+    print(f"{succeeded} succeeded, {len(records) - succeeded} failed in {elapsed:.1f}s")
+    if records:
+        print(f"throughput {len(records) / elapsed * 60:.1f} items/min, "
+              f"latency p50 {percentile(latencies, 0.5):.1f}s p95 {percentile(latencies, 0.95):.1f}s")
+    if succeeded < len(records):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare the old scrape() extraction with extraction.extract_main_text.
+
+Usage: python benchmarks/bench_extraction.py [--repeat N]
+
+Runs both approaches over the saved pages in benchmarks/fixtures and prints
+time, peak memory and output size per page. Peak memory is what tracemalloc
+sees, i.e. Python-level allocations; lxml's C-side tree is not included.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from extraction import extract_main_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def baseline_extract(html):
+    """What tools.scrape did before: html.parser and the whole page's get_text()."""
+    return BeautifulSoup(html, 'html.parser').get_text()
+
+def measure(function, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = function(html)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    tracemalloc.start()
+    function(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024, len(output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'page':<26}{'approach':<10}{'time ms':>10}{'peak KiB':>12}{'chars':>10}")
+    totals = {"baseline": [0, 0, 0], "engine": [0, 0, 0]}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        name = os.path.basename(path)
+        for label, function in (("baseline", baseline_extract), ("engine", lambda page: extract_main_text(page, max_chars=None))):
+            elapsed_ms, peak_kib, chars = measure(function, html, args.repeat)
+            totals[label] = [totals[label][0] + elapsed_ms, max(totals[label][1], peak_kib), totals[label][2] + chars]
+            print(f"{name:<26}{label:<10}{elapsed_ms:>10.1f}{peak_kib:>12.0f}{chars:>10}")
+    for label, (elapsed_ms, peak_kib, chars) in totals.items():
+        print(f"{'TOTAL':<26}{label:<10}{elapsed_ms:>10.1f}{peak_kib:>12.0f}{chars:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Run every generation pipeline offline and record its cost.
+
+Usage: python benchmarks/bench_pipelines.py [--repeat N] [--only NAME ...] [--output FILE]
+
+Gemini, DuckDuckGo and the web are replaced by the deterministic stand-ins in
+benchmarks/fakes.py (a fake chat model with fixed latency and token rate, a fake
+DDGS, and a local server for benchmarks/fixtures), so runs need no key or
+network and are comparable across commits. Each pipeline starts with empty
+LLM, search and HTTP caches. Wall time, CPU time, peak memory (tracemalloc, so
+Python allocations only) and call counts are printed and written as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modules read these at import time. They are overridden, not defaulted, so neither the checkout's
+# .cache nor caches named in the environment are read or written, and every run starts cold.
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench-")
+os.environ["TRACE_PATH"] = ""
+os.environ["LLM_CACHE_PATH"] = os.path.join(SCRATCH_DIR, "llm_cache.sqlite3")
+os.environ["HTTP_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "http")
+os.environ["CHECKPOINT_PATH"] = os.path.join(SCRATCH_DIR, "checkpoints.sqlite3")
+os.environ["JOB_STORE_PATH"] = os.path.join(SCRATCH_DIR, "jobs.sqlite3")
+
+import fakes
+
+fakes.install_fake_search()
+
+import http_client
+import llm_cache
+import search_cache
+import semantic_cache
+import tools
+from problems import SSSSS
+from solutions import Solutions
+from lean_canvas import LeanCanvas
+from business_canvas import BusinessCanvas
+import problems
+import solutions
+import lean_canvas
+import business_canvas
+
+API_KEY = "offline-benchmark"
+INDUSTRY = "Industrie plastique"
+PROBLEM = "Les délais de fabrication des moules sont trop longs"
+SOLUTION = "Impression 3D des inserts de moules"
+# Rows of the Problems tab solved together by the solutions_fanout case
+FANOUT_PROBLEMS = [
+    {"problem": PROBLEM, "description": "Chaque nouveau moule immobilise la presse pendant des semaines", "impact": "Élevé"},
+    {"problem": "Pénurie de régleurs qualifiés", "description": "Les départs à la retraite ne sont pas remplacés", "impact": "Élevé"},
+    {"problem": "Hausse du prix des résines", "description": "Les contrats d'approvisionnement sont renégociés chaque trimestre", "impact": "Moyen"},
+    {"problem": "Taux de rebut élevé au démarrage", "description": "Les réglages sont refaits à chaque changement de série", "impact": "Moyen"},
+]
+
+def use_model(fake_model, *modules):
+    for module in modules:
+        module.get_chat_model = lambda api_key, model, temperature, role=None: fake_model
+
+def reset_caches(run_dir):
+    os.makedirs(run_dir, exist_ok=True)
+    http_client._cache = http_client.HTTPCache(os.path.join(run_dir, "http"))
+    llm_cache._cache = llm_cache.LLMCache(os.path.join(run_dir, "llm_cache.sqlite3"))
+    semantic_cache.semantic_cache = semantic_cache.SemanticCache()
+    http_client.stats = http_client.FetchStats()
+    search_cache.search_cache = search_cache.SearchCache()
+    fakes.counters.reset()
+
+def fixture_urls():
+    pages = sorted(name for name in os.listdir(fakes.FIXTURES_DIR) if name.endswith(".html"))
+    return [f"{fakes.FakeDDGS.base_url}/{page}" for page in pages]
+
+def pipelines(fake_model):
+    """name -> function running the pipeline once."""
+    def business_plan():
+        import business_plan
+        use_model(fake_model, business_plan)
+        params = {
+            "company_name": "Moules Express", "target_customer": "Fabricants de moules", "industry": INDUSTRY,
+            "description": SOLUTION, "year": 2024, "region": "wt-wt", "lang": "French", "model": "fake", "temperature": 0.5,
+        }
+        return business_plan.run_business_plan(API_KEY, params, resume=False)
+
+    def solutions_fanout():
+        # Same path as the Solutions tab's "solve every problem" mode; compare its wall time with the solutions case
+        agents = [
+            Solutions(API_KEY, 0.5, INDUSTRY, solutions.problem_description(problem), 3, "French", 2024, "fake", "Five Whys", use_cache=False)
+            for problem in FANOUT_PROBLEMS
+        ]
+        events = list(solutions.stream_solutions_for_problems(agents))
+        errors = [error for _, name, _, _, error in events if name is None and error is not None]
+        if errors:
+            raise errors[0]
+        return events
+
+    def summarize():
+        url = fixture_urls()[0]
+        return tools.summarize(tools.scrape(url), fake_model, 0.5, "French", url, PROBLEM)
+
+    return {
+        "problems": lambda: SSSSS(API_KEY, 0.5, INDUSTRY, "Fabricants de moules", "wt-wt", 3, "French", 2024, "fake", use_cache=False).generate_problem(),
+        "solutions": lambda: Solutions(API_KEY, 0.5, INDUSTRY, PROBLEM, 3, "French", 2024, "fake", "Five Whys", use_cache=False).execute(),
+        "solutions_fanout": solutions_fanout,
+        "lean_canvas": lambda: LeanCanvas(API_KEY, 0.5, INDUSTRY, PROBLEM, SOLUTION, "French", 2024, "fake", use_cache=False).execute(),
+        "business_canvas": lambda: BusinessCanvas(API_KEY, 0.5, INDUSTRY, PROBLEM, "Fabricants de moules", "French", "fake", use_cache=False).execute(),
+        "business_plan": business_plan,
+        "scrape": lambda: [tools.scrape(url) for url in fixture_urls()],
+        "summarize": summarize,
+    }
+
+def measure(function, run_dir):
+    reset_caches(run_dir)
+    tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        function()
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_s": round(wall, 4), "cpu_s": round(cpu, 4), "peak_kib": round(peak / 1024),
+        "error": error, **fakes.counters.snapshot(), "fetch": http_client.stats.snapshot(),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="Pipelines to run (default: all)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per call, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--output-tokens", type=int, default=200, help="Length of each fake answer")
+    parser.add_argument("--output", default="bench_pipelines.json")
+    args = parser.parse_args()
+
+    fake_model = fakes.FakeChatModel(latency=args.latency, tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens)
+    use_model(fake_model, problems, solutions, lean_canvas, business_canvas)
+    server = fakes.serve_fixtures()
+
+    available = pipelines(fake_model)
+    selected = args.only or list(available)
+    results = {}
+    print(f"{'pipeline':<18}{'wall s':>9}{'cpu s':>9}{'peak KiB':>10}{'llm':>6}{'search':>8}{'http':>6}")
+    for name in selected:
+        runs = [measure(available[name], os.path.join(SCRATCH_DIR, f"{name}-{index}")) for index in range(args.repeat)]
+        ok = [run for run in runs if run["error"] is None]
+        summary = {
+            "wall_s": statistics.median(run["wall_s"] for run in ok) if ok else None,
+            "cpu_s": statistics.median(run["cpu_s"] for run in ok) if ok else None,
+            "peak_kib": max(run["peak_kib"] for run in ok) if ok else None,
+        }
+        results[name] = {"median": summary, "runs": runs}
+        if ok:
+            last = ok[-1]
+            print(f"{name:<18}{summary['wall_s']:>9.3f}{summary['cpu_s']:>9.3f}{summary['peak_kib']:>10}"
+                  f"{last['llm_calls']:>6}{last['search_calls']:>8}{last['http_requests']:>6}")
+        else:
+            print(f"{name:<18} failed: {runs[-1]['error']}")
+    server.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {"repeat": args.repeat, "latency": args.latency, "tokens_per_second": args.tokens_per_second, "output_tokens": args.output_tokens},
+        "pipelines": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Time Streamlit reruns of main.py with and without lazy navigation.
+
+Usage: python benchmarks/bench_rerun.py [--repeat N] [--output FILE]
+
+Each mode (LAZY_NAVIGATION=0 renders every page in st.tabs, LAZY_NAVIGATION=1
+only the selected one) runs in its own process through
+streamlit.testing.v1.AppTest, so module imports are cold for both. The script
+enters an API key (the first page render, imports included), then moves the
+temperature slider --repeat times; nothing calls a model, so the reruns
+measure page rendering only. DuckDuckGo is replaced by benchmarks/fakes.py.
+Rerun times are main.py's own measurement (session_state["last_rerun_ms"]);
+wall times include Streamlit's script runner.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+API_KEY = "offline-benchmark"
+
+def run_mode(repeat):
+    """Runs in the child process; returns the timings of one mode."""
+    import fakes
+    fakes.install_fake_search()
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=120)
+    app.run()
+    app.text_input(key="api_key").input(API_KEY)
+    started = time.perf_counter()
+    app.run()
+    first_wall_ms = (time.perf_counter() - started) * 1000
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    first_ms = app.session_state["last_rerun_ms"]
+
+    rerun_ms, wall_ms = [], []
+    for index in range(repeat):
+        app.slider(key="temperature_problems").set_value(0.4 if index % 2 else 0.6)
+        started = time.perf_counter()
+        app.run()
+        wall_ms.append((time.perf_counter() - started) * 1000)
+        rerun_ms.append(app.session_state["last_rerun_ms"])
+    return {
+        "first_render_ms": round(first_ms, 1), "first_render_wall_ms": round(first_wall_ms, 1),
+        "rerun_ms": round(statistics.median(rerun_ms), 1), "rerun_wall_ms": round(statistics.median(wall_ms), 1),
+        "modules": len(sys.modules),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default="bench_rerun.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.repeat)))
+        return
+
+    results = {}
+    print(f"{'navigation':<12}{'first ms':>10}{'first wall':>12}{'rerun ms':>10}{'rerun wall':>12}{'modules':>9}")
+    for name, value in (("tabs", "0"), ("lazy", "1")):
+        # Each mode gets its own scratch caches and job store, never the checkout's .cache
+        scratch = tempfile.mkdtemp(prefix=f"bench-rerun-{name}-")
+        env = {
+            **os.environ, "LAZY_NAVIGATION": value, "TRACE_PATH": "",
+            "LLM_CACHE_PATH": os.path.join(scratch, "llm_cache.sqlite3"), "HTTP_CACHE_DIR": os.path.join(scratch, "http"),
+            "CHECKPOINT_PATH": os.path.join(scratch, "checkpoints.sqlite3"), "JOB_STORE_PATH": os.path.join(scratch, "jobs.sqlite3"),
+        }
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--repeat", str(args.repeat)],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+        if child.returncode != 0:
+            print(f"{name:<12} failed: {child.stderr.strip().splitlines()[-1] if child.stderr.strip() else child.returncode}")
+            results[name] = {"error": child.stderr[-2000:]}
+            continue
+        result = results[name] = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{name:<12}{result['first_render_ms']:>10.0f}{result['first_render_wall_ms']:>12.0f}"
+              f"{result['rerun_ms']:>10.1f}{result['rerun_wall_ms']:>12.1f}{result['modules']:>9}")
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat, "modes": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
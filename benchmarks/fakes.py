@@ -0,0 +1,144 @@
+"""Deterministic stand-ins for Gemini, DuckDuckGo and the web, used by bench_pipelines.py.
+
+install_fake_search() must run before the app modules are imported, because
+search_cache imports DDGS at module level.
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+import types
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class Counters:
+    """Thread-safe call counters, reset before each pipeline."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.values = {"llm_calls": 0, "llm_prompt_tokens": 0, "llm_output_tokens": 0, "search_calls": 0, "http_requests": 0}
+
+    def add(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.values[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+counters = Counters()
+
+def _words(text) -> int:
+    return len(text.split())
+
+def fake_answer(prompt, output_tokens) -> str:
+    """A markdown table whose content depends only on the prompt, roughly output_tokens words long."""
+    seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    rows = max(1, output_tokens // 40)
+    lines = ["| Item | Description | Impact | Source |", "| --- | --- | --- | --- |"]
+    for row in range(rows):
+        description = " ".join(f"term{seed[(row + i) % 64]}{i}" for i in range(30))
+        lines.append(f"| Item {row + 1} | {description} | High | https://example.com/{seed[:8]}/{row} |")
+    table = "\n".join(lines)
+    # The crew agents' ReAct loop stops on a final answer
+    if "Final Answer" in prompt:
+        return f"Thought: I now know the final answer\nFinal Answer: {table}"
+    return table
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that sleeps latency seconds, then produces output_tokens at tokens_per_second."""
+
+    latency: float = 0.2
+    tokens_per_second: float = 400.0
+    output_tokens: int = 200
+    model: str = "fake-gemini"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _prompt(self, messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        answer = fake_answer(prompt, self.output_tokens)
+        time.sleep(self.latency + self.output_tokens / self.tokens_per_second)
+        counters.add(llm_calls=1, llm_prompt_tokens=_words(prompt), llm_output_tokens=_words(answer))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        answer = fake_answer(prompt, self.output_tokens)
+        counters.add(llm_calls=1, llm_prompt_tokens=_words(prompt), llm_output_tokens=_words(answer))
+        time.sleep(self.latency)
+        words = answer.split(" ")
+        for start in range(0, len(words), 20):
+            chunk = " ".join(words[start:start + 20]) + " "
+            time.sleep(min(20, len(words) - start) / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+class FakeDDGS:
+    """DDGS replacement returning results that point at the local fixture server."""
+
+    base_url = "http://127.0.0.1:8765"
+    results_per_query = 8
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def text(self, keywords, region="wt-wt", safesearch="moderate", **kwargs):
+        counters.add(search_calls=1)
+        pages = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith(".html"))
+        results = []
+        for index in range(self.results_per_query):
+            page = pages[index % len(pages)]
+            title = page.rsplit(".", 1)[0].replace("_", " ")
+            results.append({
+                "title": f"{title} {keywords}",
+                "href": f"{self.base_url}/{page}?result={index}",
+                "body": f"{keywords} — extract {index} of {title}",
+            })
+        return results
+
+class RatelimitException(Exception):
+    pass
+
+def install_fake_search():
+    """Register a duckduckgo_search module whose DDGS is FakeDDGS."""
+    module = types.ModuleType("duckduckgo_search")
+    module.DDGS = FakeDDGS
+    exceptions = types.ModuleType("duckduckgo_search.exceptions")
+    exceptions.RatelimitException = RatelimitException
+    module.exceptions = exceptions
+    sys.modules["duckduckgo_search"] = module
+    sys.modules["duckduckgo_search.exceptions"] = exceptions
+
+class _FixtureHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        counters.add(http_requests=1)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixtures(port=0):
+    """Serve benchmarks/fixtures on localhost in a daemon thread; returns the server."""
+    handler = functools.partial(_FixtureHandler, directory=FIXTURES_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeDDGS.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return server
@@ -1,10 +1,16 @@
+import json
+import logging
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
+from assets import inject_css
+from model_factory import get_chat_model
 from typing import Dict, Optional
+from llm_cache import cached_completion, cached_stream
+from canvases import ValuePropositionCanvas
+from summarization import count_tokens
+from semantic_cache import semantic_completion, semantic_stream
 
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# Below this many parsed sections the handoff falls back to the full value proposition text
+MIN_HANDOFF_SECTIONS = 4
 
 def localize_text(language):
     texts = {
@@ -19,7 +25,10 @@ def localize_text(language):
             "result_bc": "Business Model Canvas",
             "api_key": "Enter your Google API Key",
             "temperature": "Select the temperature",
-            "error": "An error occurred while generating the Business Canvas"
+            "error": "An error occurred while generating the Business Canvas",
+            "handoff": "Value proposition passed on in {after} tokens instead of {before} ({saved}% fewer)",
+            "export": "Download the canvases (JSON)",
+            "reused": "Reused the result generated for similar inputs ({inputs}, similarity {similarity:.0%})."
         },
         "French": {
             "title": "Canvas du modèle d'affaires",
@@ -32,43 +41,88 @@ def localize_text(language):
             "result_bc": "Business Model Canvas",
             "api_key": "Entrez votre clé API Google",
             "temperature": "Sélectionnez la température",
-            "error": "Une erreur est survenue lors de la génération du Canvas du modèle d'affaires"
+            "error": "Une erreur est survenue lors de la génération du Canvas du modèle d'affaires",
+            "handoff": "Proposition de valeur transmise en {after} jetons au lieu de {before} ({saved} % de moins)",
+            "export": "Télécharger les canvas (JSON)",
+            "reused": "Résultat réutilisé d'une demande similaire ({inputs}, similarité {similarity:.0%})."
         }
     }
     return texts[language]
 
 class BusinessCanvas:
-    def __init__(self, google_api_key, google_temperature, industry_name, job_to_be_done, customer_description, language):
-        self.gpt_model = ChatGoogleGenerativeAI(api_key=google_api_key, model="gemini-1.5-flash")
+    def __init__(self, google_api_key, google_temperature, industry_name, job_to_be_done, customer_description, language, model="gemini-1.5-flash", use_cache=True):
+        self.gpt_model = get_chat_model(google_api_key, model, google_temperature, role="canvas")
         self.google_api_key = google_api_key
         self.google_temperature = google_temperature
         self.industry_name = industry_name
         self.job_to_be_done = job_to_be_done
         self.customer_description = customer_description
         self.language = language
+        self.model = model
+        self.use_cache = use_cache
+        self.reused = {}
+        self.value_proposition = None
+        self.handoff_tokens = None
 
     def call_google_chat(self, prompt):
-        response = self.gpt_model.invoke(prompt)
-        return response.content
+        return cached_completion(lambda: self.gpt_model.invoke(prompt).content, prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def stream_google_chat(self, prompt):
+        return cached_stream(lambda: (chunk.content for chunk in self.gpt_model.stream(prompt)), prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def _on_reuse(self, name, match):
+        self.reused[name] = match
+
+    def _semantic(self, name, prompt, stream, **text_inputs):
+        """Serve near-identical requests (same language and model) from the semantic cache."""
+        exact_inputs = {"language": self.language, "model": self.gpt_model.model, "temperature": float(self.google_temperature)}
+        if stream:
+            return semantic_stream(name, text_inputs, exact_inputs, lambda: self.stream_google_chat(prompt), use_cache=self.use_cache, on_reuse=self._on_reuse)
+        return semantic_completion(name, text_inputs, exact_inputs, lambda: self.call_google_chat(prompt), use_cache=self.use_cache, on_reuse=self._on_reuse)
 
     def format_markdown_table(self, content: str) -> str:
         formatted_content = content.replace('* ', '<br>* ')
         return formatted_content
 
-    def generate_value_proposition_canvas(self):
+    def generate_value_proposition_canvas(self, stream=False):
         prompt = f"""
             Imagine you are the founder of a new startup in the {self.industry_name} industry. Your target customers are {self.customer_description} who are looking for a solution to the following problem: {self.job_to_be_done}.
             Your goal is to create a value proposition that clearly communicates the unique benefits and value your product or service provides to your target customers. Please respond only in the {self.language} language. Present the value proposition canvas in a markdown table with the following sections: 'Customer Jobs', 'Pains', 'Gains', 'Products & Services', 'Pain Relievers', and 'Gain Creators'.
         """
-        response = self.call_google_chat(prompt)
+        text_inputs = {"industry_name": self.industry_name, "job_to_be_done": self.job_to_be_done, "customer_description": self.customer_description}
+        if stream:
+            # Unformatted chunks; callers apply format_markdown_table to the joined text
+            return self._semantic("business_canvas:value_proposition", prompt, True, **text_inputs)
+        response = self._semantic("business_canvas:value_proposition", prompt, False, **text_inputs)
         return self.format_markdown_table(response)
 
-    def generate_business_model_canvas(self, value_proposition_canvas):
+    def condense_value_proposition(self, value_proposition_canvas: str) -> str:
+        """Parse the value proposition table into self.value_proposition and return the compact text
+        handed to the Business Model Canvas prompt, recording the token saving in self.handoff_tokens."""
+        self.value_proposition = ValuePropositionCanvas.parse(value_proposition_canvas)
+        if self.value_proposition.found() >= MIN_HANDOFF_SECTIONS:
+            handoff = self.value_proposition.condensed()
+        else:
+            handoff = " ".join(value_proposition_canvas.replace('<br>', ' ').split())
+        before, after = count_tokens(value_proposition_canvas), count_tokens(handoff)
+        self.handoff_tokens = {"before": before, "after": after, "saved_percent": round(100 * (before - after) / before) if before else 0}
+        logging.info(f"Value proposition handoff: {after} tokens instead of {before} ({self.value_proposition.found()} sections parsed)")
+        return handoff
+
+    def generate_business_model_canvas(self, value_proposition_canvas, stream=False):
+        value_proposition = self.condense_value_proposition(value_proposition_canvas)
         prompt = f"""
             Act as a business consultant from a top management company.
-            I want you to generate a Business Model Canvas for a company in the {self.industry_name} industry that delivers the value proposition: {value_proposition_canvas} to {self.customer_description}. You should complete the business canvas with the following components: 'Key Activities', 'Key Resources', 'Key Partners', 'Customer Relationships', 'Channels', 'Customer Segments', 'Cost Structure', and 'Revenue Streams'. Please respond only in the {self.language} language. Present the business canvas in a markdown table.
+            I want you to generate a Business Model Canvas for a company in the {self.industry_name} industry that delivers the following value proposition to {self.customer_description}:
+            {value_proposition}
+            You should complete the business canvas with the following components: 'Key Activities', 'Key Resources', 'Key Partners', 'Customer Relationships', 'Channels', 'Customer Segments', 'Cost Structure', and 'Revenue Streams'. Please respond only in the {self.language} language. Present the business canvas in a markdown table.
         """
-        response = self.call_google_chat(prompt)
+        # The condensed value proposition is a text input too, so a reused business model always fits its value proposition
+        text_inputs = {"industry_name": self.industry_name, "customer_description": self.customer_description, "value_proposition": value_proposition}
+        if stream:
+            # Unformatted chunks; callers apply format_markdown_table to the joined text
+            return self._semantic("business_canvas:business_model", prompt, True, **text_inputs)
+        response = self._semantic("business_canvas:business_model", prompt, False, **text_inputs)
         return self.format_markdown_table(response)
 
     def execute(self):
@@ -77,7 +131,7 @@ class BusinessCanvas:
         return value_proposition_canvas, business_model_canvas
 
 def display_business_canvas(api_key, temperature, lang, model):
-    load_css('style.css')
+    inject_css('style.css')
 
     lang_texts = localize_text(lang)
     
@@ -108,17 +162,57 @@ def display_business_canvas(api_key, temperature, lang, model):
         else:
             try:
                 with st.spinner(lang_texts["result_vp"]):
-                    agent = BusinessCanvas(api_key, temperature, industry_name, job_to_be_done, customer_description, lang)
-                    value_proposition_canvas, business_model_canvas = agent.execute()
+                    agent = BusinessCanvas(api_key, temperature, industry_name, job_to_be_done, customer_description, lang, model)
                     
                     st.markdown(f'**{lang_texts["result_vp"]}**')
-                    st.markdown(value_proposition_canvas, unsafe_allow_html=True)
+                    vp_placeholder = st.empty()
+                    with vp_placeholder.container():
+                        value_proposition_canvas = st.write_stream(agent.generate_value_proposition_canvas(stream=True))
+                    value_proposition_canvas = agent.format_markdown_table(value_proposition_canvas)
+                    vp_placeholder.markdown(value_proposition_canvas, unsafe_allow_html=True)
                     st.markdown('<br><br><br>', unsafe_allow_html=True)
 
                     with st.spinner(lang_texts["result_bc"]):
                         st.markdown(f'**{lang_texts["result_bc"]}**')
-                        st.markdown(business_model_canvas, unsafe_allow_html=True)
+                        bc_placeholder = st.empty()
+                        with bc_placeholder.container():
+                            business_model_canvas = st.write_stream(agent.generate_business_model_canvas(value_proposition_canvas, stream=True))
+                        business_model_canvas = agent.format_markdown_table(business_model_canvas)
+                        bc_placeholder.markdown(business_model_canvas, unsafe_allow_html=True)
                         st.markdown('<br><br>', unsafe_allow_html=True)
-                
+
+                # Kept so later reruns redisplay and export the canvases without calling the model
+                st.session_state["business_canvas_result"] = {
+                    "industry": industry_name,
+                    "value_proposition_canvas": value_proposition_canvas,
+                    "value_proposition": agent.value_proposition.to_dict(),
+                    "business_model_canvas": business_model_canvas,
+                    "handoff_tokens": agent.handoff_tokens,
+                }
+                for match in agent.reused.values():
+                    st.caption(lang_texts["reused"].format(inputs=match.describe(), similarity=match.similarity))
+                display_handoff_and_export(lang_texts)
+
             except Exception as e:
                 st.error(f"{lang_texts['error']} : {str(e)}")
+    elif st.session_state.get("business_canvas_result"):
+        result = st.session_state["business_canvas_result"]
+        st.markdown(f'**{lang_texts["result_vp"]}**')
+        st.markdown(result["value_proposition_canvas"], unsafe_allow_html=True)
+        st.markdown('<br><br><br>', unsafe_allow_html=True)
+        st.markdown(f'**{lang_texts["result_bc"]}**')
+        st.markdown(result["business_model_canvas"], unsafe_allow_html=True)
+        st.markdown('<br><br>', unsafe_allow_html=True)
+        display_handoff_and_export(lang_texts)
+
+def display_handoff_and_export(lang_texts):
+    result = st.session_state["business_canvas_result"]
+    tokens = result["handoff_tokens"]
+    st.caption(lang_texts["handoff"].format(before=tokens["before"], after=tokens["after"], saved=tokens["saved_percent"]))
+    st.download_button(
+        lang_texts["export"],
+        json.dumps(result, ensure_ascii=False, indent=2),
+        file_name="business_canvas.json",
+        mime="application/json",
+        key="export_business_canvas",
+    )
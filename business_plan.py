@@ -1,7 +1,8 @@
 import os
-import time
+import logging
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
+from assets import inject_css
+from model_factory import get_chat_model
 from tools_business_plan.search_tools import SearchTools
 from tools_business_plan.fetch_tools import FetchTools
 from tools_business_plan.scrape_tools import ScrapeTools
@@ -9,10 +10,12 @@ from tools_business_plan.summarize_tools import SummarizeTools
 from tools_business_plan.article_tools import ArticleTools
 from tools_business_plan.calculate_tools import CalculateTools
 from crewai import Agent, Task, Process, Crew
+from crew_runner import run_task_graph, DEFAULT_MAX_WORKERS
+from jobs import get_runner, JobQueueFull, QUEUED, DONE, FAILED
+from checkpoints import RunCheckpoints
+from tool_memo import tool_run
 
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 3))
 
 def localize_text(language):
     texts = {
@@ -28,7 +31,11 @@ def localize_text(language):
             "expenses_percentage": "Expenses Percentage",
             "submit": "Submit",
             "processing": "Generating business plan...",
-            "result_title": "Here is your Business Plan:"
+            "queued": "Waiting for a free worker (position {position} in the queue)...",
+            "queue_full": "Too many business plans are waiting, please try again in a few minutes.",
+            "failed": "The business plan could not be generated",
+            "result_title": "Here is your Business Plan:",
+            "tool_reuse": "Tool calls shared between agents"
         },
         "French": {
             "title": "Plan d'affaires",
@@ -42,13 +49,179 @@ def localize_text(language):
             "expenses_percentage": "Pourcentage des dépenses",
             "submit": "Soumettre",
             "processing": "Génération du plan d'affaires en cours...",
-            "result_title": "Voici votre Plan d'Affaires :"
+            "queued": "En attente d'un processus libre (position {position} dans la file)...",
+            "queue_full": "Trop de plans d'affaires sont en attente, veuillez réessayer dans quelques minutes.",
+            "failed": "Le plan d'affaires n'a pas pu être généré",
+            "result_title": "Voici votre Plan d'Affaires :",
+            "tool_reuse": "Appels d'outils partagés entre les agents"
         }
     }
     return texts[language]
 
-def display_business_plan(api_key, temperature, lang, model):
-    load_css('style.css')
+def run_business_plan(api_key, params, report=None, parallel=True, max_workers=DEFAULT_MAX_WORKERS, resume=True):
+    """Build the four-agent crew from the form inputs in params and run it.
+
+    report(name, output), if given, receives each task's output as soon as it is done, then
+    the number of tool calls the agents shared. With resume, tasks already checkpointed for the
+    same inputs are reused (parallel mode only).
+    """
+    company_name = params["company_name"]
+    target_customer = params["target_customer"]
+    industry = params["industry"]
+    description = params["description"]
+    year = params["year"]
+    region = params["region"]
+    lang = params["lang"]
+    # The three research agents gather and digest sources; only the consultant writes the plan itself
+    research_llm = get_chat_model(api_key, params["model"], params["temperature"], role="research")
+    synthesis_llm = get_chat_model(api_key, params["model"], params["temperature"], role="synthesize")
+
+    market_agent = Agent(
+        role="Market Research Analyst",
+        goal=f"""Conduct a detailed market analysis for the {industry} industry and targeting {target_customer} to ensure the business {description} is backed by solid research and data.""",
+        backstory=f"""You are an expert in understanding market demand, demand estimation, target audience, and competition in the {industry} industry. You are skilled at doing market research for a given {description}". YOu have worked with numerous startups and established companies, helping them identify market trends and develop successful business strategies.primary mission is to help the company {company_name}. Please respond only in {lang}. You must Include references to external data for market analysis""",
+        allow_delegation=False,
+        tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
+        llm=research_llm,
+        verbose=True
+    )
+
+    technology_agent = Agent(
+        role="Technology Expert",
+        goal=f"""Assess the technological feasibility and necessary technologies for the {industry} industry.""",
+        backstory=f"""You are a visionary in technology with a deep understanding of technological trends especially in products like {description}. Your expertise is crucial for aligning technology with business strategies. Please respond only in {lang}.""",
+        allow_delegation=False,
+        tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
+        llm=research_llm,
+        verbose=True
+    )
+
+    financial_agent = Agent(
+        role="Profitability Analyst",
+        goal=f"""Establish the cashflow prediction for the company.""",
+        backstory=f"""You are an expert in financial analysis. Your mission is to build financial projections for {company_name}, indicating robust growth over the next three years. Please respond only in {lang}.""",
+        allow_delegation=False,
+        tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
+        llm=research_llm,
+        verbose=True
+    )
+
+    business_consultant = Agent(
+        role="Business Development Consultant",
+        goal= f"""Evaluate the business model for {description}, focusing on scalability and revenue streams.""",
+        backstory=f"""Expert in shaping business strategies for products like {description} in {industry} industry. 
+              Understands scalability and potential revenue streams to ensure long-term sustainability""",
+        allow_delegation=True,
+        tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
+        llm=synthesis_llm,
+        verbose=True
+    )
+
+    task1 = Task(
+        description=f"""Conduct a detailed market analysis for the {industry} industry, targeting {target_customer} for {description}.
+         Current year is {year} and the target customer is in {region}. Write a report on the ideal customer profile, demande estimation in canadian dollars and marketing 
+         strategies to reach the widest possible audience. Include at least 10 bullet points addressing key marketing areas. Please respond only in {lang}.
+                  
+        """,
+        agent=market_agent,
+        expected_output="Market analysis including demand size in canadian dollars, demand trends, ideal customer profile and segements."
+    )
+
+    task2 = Task(
+        description=f"""Assess the technological feasibility and necessary technologies for the {industry} industry for {description} .
+         Write a report detailing necessary technologies and manufacturing approaches. Include at least 10 bullet points on key technological areas.
+         Please respond only in {lang}.
+        """,
+        agent=technology_agent,
+        expected_output="Technological assessment including required technologies and their implementation."
+    )
+
+    task3 = Task(
+        description=f"""Establish financial projections and build an income statement.
+        Write a report detailing necessary financial and profitability of the {company_name} if it launch the {description}. 
+        Include at least 10 bullet points on key financial and profitability issues to consider by the {company_name}.
+         Please respond only in {lang}.
+        """,
+        agent=financial_agent,
+        expected_output="Detailed financial projections including revenue, COGS, gross profit, expenses, net income, and detailled issues and recommendations to consider."
+    )
+
+    task4 = Task(
+        description=f""" Analyze and summarize marketing, technological, and financial reports and write a detailed business plan 
+        describing how to make sustainable and profitable for {description}. The business plan has to be concise with at least ten bullet points and five goals and must contain 
+        a schedule for which goals should be achieved and when starting no earlier than next {year}. Please respond only in {lang}.
+        """,
+        agent=business_consultant,
+        context = [task1, task2,task3], 
+        expected_output="A detailed business plan that integrates the marketing, technological, and financial reports, outlining a sustainable and profitable business model for the product."
+    )
+
+    agents = [market_agent, technology_agent, financial_agent, business_consultant]
+    tasks = [task1, task2, task3, task4]
+
+    # Every agent's search, fetch, scrape and summarize calls share one set of results
+    with tool_run() as tool_memo:
+        if parallel:
+            # task1-task3 are independent; task4 waits for them through its context
+            on_task_done = (lambda task, output: report(task.agent.role, str(output))) if report else None
+            checkpoints = RunCheckpoints(params) if resume else None
+            result = run_task_graph(agents, tasks, max_workers=max_workers, verbose=2, on_task_done=on_task_done, checkpoints=checkpoints)[-1]
+        else:
+            crew = Crew(
+                agents=agents,
+                tasks=tasks,
+                verbose=2,
+                process=Process.sequential
+            )
+
+            result = crew.kickoff()
+
+    savings = tool_memo.summary()
+    if savings:
+        logging.info(f"Business plan tool reuse:\n{savings}")
+        if report:
+            report(localize_text(lang)["tool_reuse"], "\n".join(f"- {line}" for line in savings.splitlines()))
+
+    return result
+
+def display_job(job_id, lang_texts):
+    """Show a business plan job's status and outputs, polling until it finishes.
+
+    While the job is queued or running, only this panel is redrawn every JOB_POLL_INTERVAL
+    seconds (a Streamlit fragment); the rest of the page is not run again.
+    """
+    job = get_runner().store.get(job_id)
+    if job is None:
+        return
+    polling = job["status"] not in (DONE, FAILED)
+    st.fragment(run_every=JOB_POLL_INTERVAL if polling else None)(_job_panel)(job_id, lang_texts, polling)
+
+def _job_panel(job_id, lang_texts, polling):
+    runner = get_runner()
+    job = runner.store.get(job_id)
+    if job is None:
+        return
+    if polling and job["status"] in (DONE, FAILED):
+        # One full rerun to stop the polling now that the job is over
+        st.rerun()
+
+    for name, output in job["partial"].items():
+        with st.expander(name):
+            st.markdown(output)
+
+    if job["status"] == DONE:
+        st.subheader(lang_texts["result_title"])
+        st.markdown(job["result"])
+    elif job["status"] == FAILED:
+        st.error(f"{lang_texts['failed']} : {job['error']}")
+    else:
+        if job["status"] == QUEUED:
+            st.info(lang_texts["queued"].format(position=runner.position(job_id) + 1))
+        else:
+            st.info(lang_texts["processing"])
+
+def display_business_plan(api_key, temperature, lang, model, parallel=True, max_workers=DEFAULT_MAX_WORKERS):
+    inject_css('style.css')
     
     lang_texts = localize_text(lang)
     
@@ -109,100 +282,29 @@ def display_business_plan(api_key, temperature, lang, model):
     submit_button = st.button(lang_texts["submit"], key="submit_button_business_plan")
     
     if submit_button:
-        with st.spinner(lang_texts["processing"]):
-            llm = ChatGoogleGenerativeAI(api_key=api_key, model=model, temperature=temperature)
-
-            market_agent = Agent(
-                role="Market Research Analyst",
-                goal=f"""Conduct a detailed market analysis for the {industry} industry and targeting {target_customer} to ensure the business {description} is backed by solid research and data.""",
-                backstory=f"""You are an expert in understanding market demand, demand estimation, target audience, and competition in the {industry} industry. You are skilled at doing market research for a given {description}". YOu have worked with numerous startups and established companies, helping them identify market trends and develop successful business strategies.primary mission is to help the company {company_name}. Please respond only in {lang}. You must Include references to external data for market analysis""",
-                allow_delegation=False,
-                tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
-                llm=llm,
-                verbose=True
-            )
-    
-            technology_agent = Agent(
-                role="Technology Expert",
-                goal=f"""Assess the technological feasibility and necessary technologies for the {industry} industry.""",
-                backstory=f"""You are a visionary in technology with a deep understanding of technological trends especially in products like {description}. Your expertise is crucial for aligning technology with business strategies. Please respond only in {lang}.""",
-                allow_delegation=False,
-                tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
-                llm=llm,
-                verbose=True
-            )
-    
-            financial_agent = Agent(
-                role="Profitability Analyst",
-                goal=f"""Establish the cashflow prediction for the company.""",
-                backstory=f"""You are an expert in financial analysis. Your mission is to build financial projections for {company_name}, indicating robust growth over the next three years. Please respond only in {lang}.""",
-                allow_delegation=False,
-                tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
-                llm=llm,
-                verbose=True
-            )
-    
-            business_consultant = Agent(
-                role="Business Development Consultant",
-                goal= f"""Evaluate the business model for {description}, focusing on scalability and revenue streams.""",
-                backstory=f"""Expert in shaping business strategies for products like {description} in {industry} industry. 
-                      Understands scalability and potential revenue streams to ensure long-term sustainability""",
-                allow_delegation=True,
-                tools=[SearchTools().search_internet, FetchTools().fetch_with_user_agent, ScrapeTools().scrape, SummarizeTools().summarize],
-                llm=llm,
-                verbose=True
-            )
-    
-            task1 = Task(
-                description=f"""Conduct a detailed market analysis for the {industry} industry, targeting {target_customer} for {description}.
-                 Current year is {year} and the target customer is in {region}. Write a report on the ideal customer profile, demande estimation in canadian dollars and marketing 
-                 strategies to reach the widest possible audience. Include at least 10 bullet points addressing key marketing areas. Please respond only in {lang}.
-                          
-                """,
-                agent=market_agent,
-                expected_output="Market analysis including demand size in canadian dollars, demand trends, ideal customer profile and segements."
-            )
-    
-            task2 = Task(
-                description=f"""Assess the technological feasibility and necessary technologies for the {industry} industry for {description} .
-                 Write a report detailing necessary technologies and manufacturing approaches. Include at least 10 bullet points on key technological areas.
-                 Please respond only in {lang}.
-                """,
-                agent=technology_agent,
-                expected_output="Technological assessment including required technologies and their implementation."
-            )
-    
-            task3 = Task(
-                description=f"""Establish financial projections and build an income statement.
-                Write a report detailing necessary financial and profitability of the {company_name} if it launch the {description}. 
-                Include at least 10 bullet points on key financial and profitability issues to consider by the {company_name}.
-                 Please respond only in {lang}.
-                """,
-                agent=financial_agent,
-                expected_output="Detailed financial projections including revenue, COGS, gross profit, expenses, net income, and detailled issues and recommendations to consider."
-            )
-    
-            task4 = Task(
-                description=f""" Analyze and summarize marketing, technological, and financial reports and write a detailed business plan 
-                describing how to make sustainable and profitable for {description}. The business plan has to be concise with at least ten bullet points and five goals and must contain 
-                a schedule for which goals should be achieved and when starting no earlier than next {year}. Please respond only in {lang}.
-                """,
-                agent=business_consultant,
-                context = [task1, task2,task3], 
-                expected_output="A detailed business plan that integrates the marketing, technological, and financial reports, outlining a sustainable and profitable business model for the product."
-            )
-    
-            crew = Crew(
-                agents=[market_agent, technology_agent, financial_agent, business_consultant],
-                tasks=[task1, task2, task3, task4],
-                verbose=2,
-                process=Process.sequential
-            )
-    
-            result = crew.kickoff()
-    
-            st.subheader(lang_texts["result_title"])
-            st.markdown(result)
+        params = {
+            "company_name": company_name,
+            "target_customer": target_customer,
+            "industry": industry,
+            "description": description,
+            "year": int(year),
+            "region": region,
+            "lang": lang,
+            "model": model,
+            "temperature": temperature,
+        }
+        try:
+            # The API key stays in the closure; only the form inputs are written to the job store
+            job_id = get_runner().submit("business_plan", params, lambda job_params, report: run_business_plan(api_key, job_params, report, parallel=parallel, max_workers=max_workers))
+        except JobQueueFull:
+            st.error(lang_texts["queue_full"])
+        else:
+            st.session_state["business_plan_job"] = job_id
+            st.query_params["business_plan_job"] = job_id
+
+    job_id = st.session_state.get("business_plan_job") or st.query_params.get("business_plan_job")
+    if job_id:
+        display_job(job_id, lang_texts)
 
 if __name__ == "__main__":
     display_business_plan(api_key="your_api_key_here", temperature=0.5, lang="French", model="gemini-1.5-pro-latest")
@@ -0,0 +1,205 @@
+"""Structured versions of the canvases the model returns as markdown tables.
+
+Parsing the sections out of the model's table lets a canvas be handed to the next
+prompt as a few short lines instead of the whole markdown, and re-rendered or
+exported later without another model call.
+"""
+import json
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+def _normalize(text) -> str:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]", "", text)
+
+def _clean(text) -> str:
+    text = re.sub(r"<br\s*/?>", " ", text, flags=re.IGNORECASE)
+    text = re.sub(r"[*_`]+", "", text)
+    return " ".join(text.split()).strip(" -•:;")
+
+def parse_markdown_tables(text) -> List[List[List[str]]]:
+    """Every markdown table in text, as rows of cells; separator rows are dropped."""
+    tables, rows = [], []
+    for line in (text or "").splitlines() + [""]:
+        line = line.strip()
+        if line.startswith("|"):
+            cells = [cell.strip() for cell in line.strip("|").split("|")]
+            if not all(re.fullmatch(r":?-{2,}:?", cell) for cell in cells if cell):
+                rows.append(cells)
+        elif rows:
+            tables.append(rows)
+            rows = []
+    return tables
+
+def split_items(cell) -> List[str]:
+    """Split a table cell into its bullet points."""
+    parts = re.split(r"<br\s*/?>|\n|(?:^|\s)[*•-]\s+|(?:^|\s)\d+\.\s+", cell or "", flags=re.IGNORECASE)
+    return [item for item in (_clean(part) for part in parts) if item]
+
+# Column titles of the Problems tab's table, in either answer language
+PROBLEM_COLUMNS = {"problem": ("Problème", "Problem", "Problèmes", "Problems"), "description": ("Description",), "impact": ("Impact",)}
+
+def parse_problems(text) -> List[Dict[str, str]]:
+    """Rows of the problems table as {"problem", "description", "impact"}; without known headers the first columns are used."""
+    for table in parse_markdown_tables(text):
+        header = [_normalize(cell) for cell in table[0]]
+        columns = {}
+        for name, titles in PROBLEM_COLUMNS.items():
+            columns[name] = next((index for index, cell in enumerate(header) if cell in {_normalize(title) for title in titles}), None)
+        if columns["problem"] is None:
+            if len(header) < 2:
+                continue
+            columns = {"problem": 0, "description": 1, "impact": 2 if len(header) > 2 else None}
+        problems = []
+        for row in table[1:]:
+            cells = {name: _clean(row[index]) if index is not None and index < len(row) else "" for name, index in columns.items()}
+            if cells["problem"]:
+                problems.append(cells)
+        if problems:
+            return problems
+    return []
+
+class Canvas:
+    """Sections of a canvas, each a list of short items.
+
+    Subclasses list their SECTIONS as (key, title, aliases); aliases cover the
+    French titles the model uses when it answers in French. layout records how the
+    model's table was laid out ({"columns": one column per section, "order": section
+    keys, "header": header row of a table with one row per section}), so that a
+    canvas rendered again looks like the one the model wrote.
+    """
+
+    SECTIONS = []
+
+    def __init__(self, items: Optional[Dict[str, List[str]]] = None, layout: Optional[Dict] = None):
+        self.items = {key: list((items or {}).get(key, [])) for key, _, _ in self.SECTIONS}
+        self.layout = dict(layout or {})
+
+    @classmethod
+    def section_for(cls, label, exact=False) -> Optional[str]:
+        """Section key for a row or column label; unless exact, the label may continue past the title."""
+        label = _normalize(label)
+        if not label:
+            return None
+        candidates = []
+        for key, title, aliases in cls.SECTIONS:
+            for alias in [title, *aliases]:
+                alias = _normalize(alias)
+                if label == alias:
+                    return key
+                if not exact and label.startswith(alias):
+                    candidates.append((len(alias), key))
+        return max(candidates)[1] if candidates else None
+
+    @classmethod
+    def parse(cls, text) -> "Canvas":
+        """Read the sections from the model's markdown, whether they are laid out as rows or as columns."""
+        canvas = cls()
+        for table in parse_markdown_tables(text):
+            header = [cls.section_for(cell) for cell in table[0]]
+            if sum(1 for key in header if key) >= 2:
+                # One column per section
+                canvas.layout = canvas.layout or {"columns": True, "order": [key for key in header if key]}
+                for row in table[1:]:
+                    for key, cell in zip(header, row):
+                        if key:
+                            canvas.items[key].extend(split_items(cell))
+                continue
+            keys = []
+            for row in table:
+                key = cls.section_for(row[0]) if row else None
+                if key:
+                    keys.append(key)
+                    canvas.items[key].extend(item for cell in row[1:] for item in split_items(cell))
+            if keys and not canvas.layout:
+                first_is_section = cls.section_for(table[0][0]) is not None
+                canvas.layout = {"columns": False, "order": keys, "header": None if first_is_section else table[0][:2]}
+        if not canvas.found():
+            canvas._parse_headings(text)
+        return canvas
+
+    def _parse_headings(self, text):
+        """Fallback for answers written as headings or bold labels followed by bullets."""
+        key = None
+        for line in (text or "").splitlines():
+            stripped = line.strip().lstrip("#").strip()
+            label, _, rest = stripped.partition(":")
+            heading = self.section_for(_clean(label), exact=True)
+            if heading:
+                key = heading
+                self.items[key].extend(split_items(rest))
+            elif key:
+                self.items[key].extend(split_items(stripped))
+
+    def found(self) -> int:
+        """Number of sections that have at least one item."""
+        return sum(1 for items in self.items.values() if items)
+
+    def is_complete(self) -> bool:
+        return self.found() == len(self.SECTIONS)
+
+    def condensed(self, exclude=()) -> str:
+        """One line per section, items separated by semicolons: the compact form used in follow-up prompts."""
+        return "\n".join(f"{title}: {'; '.join(self.items[key])}" for key, title, _ in self.SECTIONS if self.items[key] and key not in exclude)
+
+    @classmethod
+    def title(cls, key) -> str:
+        return next(title for section, title, _ in cls.SECTIONS if section == key)
+
+    @classmethod
+    def keys(cls) -> List[str]:
+        return [key for key, _, _ in cls.SECTIONS]
+
+    def to_markdown(self, titles: Optional[Dict[str, str]] = None, header: Optional[List[str]] = None) -> str:
+        """The canvas as a markdown table laid out like the model's: one column or one row per section.
+
+        titles maps section keys to the titles to show (e.g. in the answer language); header is the
+        header row of a table of rows when the model's own is unknown.
+        """
+        titles = {**{key: title for key, title, _ in self.SECTIONS}, **(titles or {})}
+        order = [key for key in self.layout.get("order", []) if key in self.items]
+        order += [key for key in self.keys() if key not in order]
+
+        def cell(key):
+            return "<br>".join("* " + item for item in self.items[key])
+
+        if self.layout.get("columns"):
+            lines = ["| " + " | ".join(titles[key] for key in order) + " |", "|" + " --- |" * len(order), "| " + " | ".join(cell(key) for key in order) + " |"]
+            return "\n".join(lines)
+        header = self.layout.get("header") or header or ["Section", "Content"]
+        lines = [f"| {header[0]} | {header[1] if len(header) > 1 else ''} |", "| --- | --- |"]
+        for key in order:
+            lines.append(f"| {titles[key]} | {cell(key)} |")
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return {key: list(items) for key, items in self.items.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    @classmethod
+    def from_dict(cls, items, layout=None) -> "Canvas":
+        return cls(items, layout)
+
+class ValuePropositionCanvas(Canvas):
+    SECTIONS = [
+        ("customer_jobs", "Customer Jobs", ["Jobs", "Tâches du client", "Tâches des clients", "Travaux du client", "Emplois du client"]),
+        ("pains", "Pains", ["Douleurs", "Frustrations", "Points de douleur", "Problèmes"]),
+        ("gains", "Gains", ["Bénéfices attendus"]),
+        ("products_services", "Products & Services", ["Products and Services", "Produits et services", "Produits & services"]),
+        ("pain_relievers", "Pain Relievers", ["Soulageurs de douleurs", "Soulagements", "Analgésiques", "Réducteurs de douleurs", "Solutions aux douleurs"]),
+        ("gain_creators", "Gain Creators", ["Créateurs de gains", "Générateurs de gains"]),
+    ]
+
+class LeanCanvasSections(Canvas):
+    SECTIONS = [
+        ("customer_segments", "Customer Segments", ["Segments de clientèle", "Segments de clients", "Segments clients", "Clients cibles"]),
+        ("value_propositions", "Value Propositions", ["Value Proposition", "Unique Value Proposition", "Propositions de valeur", "Proposition de valeur", "Proposition de valeur unique"]),
+        ("channels", "Channels", ["Canaux", "Canaux de distribution"]),
+        ("revenue_streams", "Revenue Streams", ["Flux de revenus", "Sources de revenus", "Revenus"]),
+        ("cost_structure", "Cost Structure", ["Structure des coûts", "Structure de coûts", "Coûts"]),
+        ("key_metrics", "Key Metrics", ["Indicateurs clés", "Métriques clés", "Mesures clés"]),
+        ("competitive_advantages", "Competitive Advantages", ["Competitive Advantage", "Unfair Advantage", "Avantages concurrentiels", "Avantage concurrentiel", "Avantages compétitifs", "Avantage compétitif", "Avantage déloyal"]),
+    ]
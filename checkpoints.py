@@ -0,0 +1,119 @@
+"""Checkpoints of business plan crew task outputs.
+
+Each finished task is saved under a run key derived from the form inputs, so a
+resubmit after a failure (e.g. a quota error in the final synthesis) reuses the
+research tasks that already completed.
+
+Usage: python checkpoints.py list
+       python checkpoints.py clear [--run RUN_KEY]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3"))
+
+# Form inputs that identify a business plan run
+RUN_KEY_FIELDS = ["company_name", "industry", "target_customer", "description", "year", "region", "lang", "model"]
+
+def _sha(*parts) -> str:
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+def run_key(params) -> str:
+    return _sha(*[params.get(field) for field in RUN_KEY_FIELDS])
+
+class CheckpointStore:
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "run_key TEXT NOT NULL, task_name TEXT NOT NULL, fingerprint TEXT NOT NULL, output TEXT NOT NULL, "
+            "params TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (run_key, task_name))"
+        )
+        self._conn.commit()
+
+    def load(self, key, task_name, fingerprint) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, output FROM checkpoints WHERE run_key = ? AND task_name = ?", (key, task_name)
+            ).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        return row[1]
+
+    def save(self, key, task_name, fingerprint, output, params) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_key, task_name, fingerprint, output, params, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, task_name, fingerprint, output, json.dumps(params), time.time()),
+            )
+            self._conn.commit()
+
+    def list(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT run_key, task_name, params, created, LENGTH(output) FROM checkpoints ORDER BY created"
+            ).fetchall()
+
+    def clear(self, key=None) -> int:
+        with self._lock:
+            if key:
+                cursor = self._conn.execute("DELETE FROM checkpoints WHERE run_key LIKE ?", (key + "%",))
+            else:
+                cursor = self._conn.execute("DELETE FROM checkpoints")
+            self._conn.commit()
+            return cursor.rowcount
+
+class RunCheckpoints:
+    """Checkpoints of one run, as used by crew_runner.run_task_graph.
+
+    A task's fingerprint covers its own definition and the outputs of the tasks in
+    its context, so a task is rerun whenever it changed or anything upstream was rerun.
+    """
+
+    def __init__(self, params, store: Optional[CheckpointStore] = None):
+        self.params = {field: params.get(field) for field in RUN_KEY_FIELDS}
+        self.key = run_key(params)
+        self.store = store or CheckpointStore()
+
+    @staticmethod
+    def task_name(task):
+        return task.agent.role
+
+    def fingerprint(self, task, context_outputs) -> str:
+        return _sha(task.description, task.expected_output, *[str(output) for output in context_outputs])
+
+    def load(self, task, fingerprint) -> Optional[str]:
+        return self.store.load(self.key, self.task_name(task), fingerprint)
+
+    def save(self, task, fingerprint, output) -> None:
+        self.store.save(self.key, self.task_name(task), fingerprint, str(output), self.params)
+
+def main():
+    parser = argparse.ArgumentParser(description="List or clear business plan checkpoints.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List saved task checkpoints")
+    clear_parser = subparsers.add_parser("clear", help="Delete checkpoints")
+    clear_parser.add_argument("--run", help="Only delete the checkpoints of this run key (a prefix as shown by list is enough)")
+    args = parser.parse_args()
+
+    store = CheckpointStore()
+    if args.command == "list":
+        for key, task_name, params, created, size in store.list():
+            params = json.loads(params)
+            saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(created))
+            print(f"{key[:12]}  {saved}  {task_name:<32} {size:>7} chars  {params['company_name']} / {params['industry']} / {params['lang']} / {params['model']}")
+    else:
+        print(f"Deleted {store.clear(args.run)} checkpoints")
+
+if __name__ == "__main__":
+    main()
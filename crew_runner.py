@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from crewai import Crew, Process
+from crewai.tasks.task_output import TaskOutput
+from telemetry import in_context, span
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("CREW_MAX_WORKERS", 3))
+
+def task_dependencies(task, tasks):
+    """Return the tasks of this run that the given task lists in its context."""
+    task_ids = {id(t) for t in tasks}
+    return [dep for dep in (task.context or []) if id(dep) in task_ids]
+
+def run_task(task, agents, verbose=2):
+    """Run a single task in its own crew; delegating agents keep access to their coworkers."""
+    crew_agents = agents if task.agent.allow_delegation else [task.agent]
+    crew = Crew(
+        agents=crew_agents,
+        tasks=[task],
+        verbose=verbose,
+        process=Process.sequential
+    )
+    with span("crew_task", agent=task.agent.role):
+        return crew.kickoff()
+
+def restore_task_output(task, raw):
+    """Give a task a checkpointed output so tasks that list it in their context can read it."""
+    try:
+        task.output = TaskOutput(description=task.description, raw=raw, agent=task.agent.role)
+    except (TypeError, ValueError):
+        # Older crewai releases name the field raw_output
+        task.output = TaskOutput(description=task.description, raw_output=raw, agent=task.agent.role)
+
+def run_task_graph(agents, tasks, max_workers=DEFAULT_MAX_WORKERS, verbose=2, on_task_done=None, checkpoints=None):
+    """Run crew tasks as a DAG: independent tasks run concurrently and a task
+    starts only once every task in its context has finished.
+
+    on_task_done(task, output) is called as each task finishes. With checkpoints
+    (a checkpoints.RunCheckpoints), tasks whose checkpoint is still valid are
+    restored instead of run, and every task that does run is saved. Returns the
+    outputs in the same order as tasks. When a task fails no further task starts,
+    the tasks already running finish (and are saved), then the first error is raised.
+    """
+    pending = list(tasks)
+    running = {}
+    outputs = {}
+    error = None
+
+    def finish(task, output):
+        outputs[id(task)] = output
+        if on_task_done:
+            on_task_done(task, output)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while running or (pending and error is None):
+            # Restoring a checkpoint can make further tasks ready, so scan until nothing changes
+            progressed = error is None
+            while progressed:
+                progressed = False
+                for task in list(pending):
+                    dependencies = task_dependencies(task, tasks)
+                    if not all(id(dep) in outputs for dep in dependencies):
+                        continue
+                    fingerprint = checkpoints.fingerprint(task, [outputs[id(dep)] for dep in dependencies]) if checkpoints else None
+                    restored = checkpoints.load(task, fingerprint) if checkpoints else None
+                    if restored is not None:
+                        pending.remove(task)
+                        restore_task_output(task, restored)
+                        finish(task, restored)
+                        progressed = True
+                    elif len(running) < max_workers:
+                        # Tasks are only handed to the pool when a worker is free, so none starts after a failure
+                        pending.remove(task)
+                        running[executor.submit(in_context(run_task), task, agents, verbose)] = (task, fingerprint)
+            if not running:
+                if pending and error is None:
+                    raise ValueError("Crew tasks have a circular context dependency")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task, fingerprint = running.pop(future)
+                try:
+                    output = future.result()
+                except Exception as e:
+                    # Start nothing new but keep collecting the running tasks, so a retry resumes from their checkpoints
+                    error = error or e
+                    continue
+                if checkpoints:
+                    checkpoints.save(task, fingerprint, output)
+                finish(task, output)
+    if error is not None:
+        raise error
+    return [outputs[id(task)] for task in tasks]
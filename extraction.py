@@ -0,0 +1,116 @@
+import os
+import re
+from typing import Optional
+from lxml import etree, html as lxml_html
+from http_client import fetch_text
+from telemetry import traced
+
+MAX_DOWNLOAD_BYTES = int(os.environ.get("SCRAPE_MAX_BYTES", 2_000_000))
+MAX_TEXT_CHARS = int(os.environ.get("SCRAPE_MAX_CHARS", 20000))
+
+# Never part of the readable article. Form controls go, but not <form> itself: ASP.NET
+# WebForms pages wrap the whole body in one
+DROP_TAGS = ["script", "style", "noscript", "template", "iframe", "svg", "canvas", "button", "input", "select", "textarea", "nav", "aside"]
+# Site chrome, unless it is the header/footer of the article itself
+PAGE_CHROME_TAGS = ["header", "footer"]
+# Elements that end a line when the text is flattened
+BLOCK_TAGS = ["p", "div", "section", "article", "main", "li", "ul", "ol", "tr", "table", "br", "pre", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "header", "footer", "figcaption", "dd", "dt"]
+
+# Whole words of a class/id/role name ("share-buttons" but not "shareholder-letter"); plurals also match
+BOILERPLATE_WORDS = set("""
+cookie consent gdpr banner newsletter subscribe social share sharing promo advert advertisement ad sponsor sponsored
+breadcrumb menu navbar sidebar related recommend recommended recommendation comment popup modal skip
+""".split())
+# Chrome only when the name is not about the content itself ("site-header", not "article-header-image")
+CHROME_WORDS = {"header", "footer"}
+CONTENT_WORDS = {"article", "post", "entry", "content", "story", "body", "text", "image", "figure", "photo", "media", "title"}
+
+_parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+
+def _parse(html):
+    # Encode first: lxml refuses str input that carries an encoding declaration
+    return lxml_html.document_fromstring(html.encode("utf-8", errors="replace"), parser=_parser)
+
+def _is_boilerplate(attributes):
+    for name in attributes.lower().split():
+        words = {word for word in re.split(r"[-_]+", name) if word}
+        words |= {word[:-1] for word in words if word.endswith("s")}
+        if words & BOILERPLATE_WORDS or (words & CHROME_WORDS and not words & CONTENT_WORDS):
+            return True
+    return False
+
+def _detached(element, root):
+    return element.getroottree().getroot() is not root
+
+def _remove_boilerplate(root):
+    etree.strip_elements(root, *DROP_TAGS, with_tail=False)
+    for element in list(root.iter(*PAGE_CHROME_TAGS)):
+        if not _detached(element, root) and not element.xpath("ancestor::article"):
+            element.drop_tree()
+
+    page_length = len(root.text_content())
+    for element in root.xpath("//*[@class or @id or @role]"):
+        if element.tag in ("article", "main", "body", "html") or _detached(element, root):
+            continue
+        attributes = " ".join([element.get("id", ""), element.get("class", ""), element.get("role", "")])
+        if not _is_boilerplate(attributes):
+            continue
+        # A matching class on a page-wide wrapper (e.g. "has-sidebar") must not take the article with it
+        if element.xpath(".//article|.//main") or len(element.text_content()) > page_length / 2:
+            continue
+        element.drop_tree()
+
+def _link_density(element):
+    text_length = len(element.text_content()) or 1
+    link_length = sum(len(link.text_content()) for link in element.iter("a"))
+    return link_length / text_length
+
+def _main_container(root):
+    """Pick the article container: an explicit <article>/<main>, otherwise the block
+    whose paragraphs carry the most text (each paragraph also credits its grandparent)."""
+    for query in ("//article", "//main", "//*[@role='main']"):
+        candidates = root.xpath(query)
+        if candidates:
+            return max(candidates, key=lambda element: len(element.text_content()))
+    scores = {}
+    for paragraph in root.iter("p", "pre", "blockquote"):
+        length = len(paragraph.text_content().strip())
+        if length < 25:
+            continue
+        parent = paragraph.getparent()
+        for ancestor, weight in ((parent, 1.0), (parent.getparent() if parent is not None else None, 0.5)):
+            if ancestor is not None:
+                scores[ancestor] = scores.get(ancestor, 0) + weight * length
+    if not scores:
+        body = root.find("body")
+        return body if body is not None else root
+    return max(scores, key=lambda element: scores[element] * (1 - _link_density(element)))
+
+def normalize_whitespace(text):
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def _flatten(element):
+    for block in element.iter(*BLOCK_TAGS):
+        block.tail = "\n" + (block.tail or "")
+    return element.text_content()
+
+def extract_main_text(html, max_chars: Optional[int] = MAX_TEXT_CHARS):
+    """Return the readable article text of an HTML page, without navigation, scripts or banners."""
+    try:
+        root = _parse(html)
+    except (etree.ParserError, ValueError):
+        return ""
+    _remove_boilerplate(root)
+    text = normalize_whitespace(_flatten(_main_container(root)))
+    if max_chars is not None:
+        text = text[:max_chars]
+    return text
+
+@traced("scrape")
+def scrape_url(url, max_bytes=MAX_DOWNLOAD_BYTES, max_chars=MAX_TEXT_CHARS):
+    """Download at most max_bytes of the page and extract its main text; None if it cannot be fetched."""
+    html_content = fetch_text(url, max_bytes=max_bytes)
+    if not html_content:
+        return None
+    return extract_main_text(html_content, max_chars=max_chars)
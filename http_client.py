@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from telemetry import annotate, span
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br" responses)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 20))
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 20))
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 4))
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(".cache", "http"))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 200_000_000))
+HTTP_CACHE_MAX_AGE = float(os.environ.get("HTTP_CACHE_MAX_AGE", 7 * 24 * 3600))
+# The directory is pruned on start and then after every this many stores
+HTTP_CACHE_PRUNE_EVERY = 100
+
+def _checksum(text) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+class HTTPCache:
+    """On-disk page cache revalidated with ETag/Last-Modified conditional GETs.
+
+    Files are written under a temporary name and renamed into place, so a reader never sees
+    a half-written file; the metadata carries the body's checksum, so a body replaced by
+    another writer between the two renames is treated as a miss. Entries older than max_age
+    are deleted, and the oldest ones go first once the directory is bigger than max_bytes.
+    """
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES, max_age: float = HTTP_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._stores = 0
+        self._prune_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+
+    def prune(self) -> None:
+        """Delete expired entries, then the least recently written ones until the cache fits in max_bytes."""
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            # Both files of an entry share its name; temporary files left by a crash are entries of their own
+            now = time.time()
+            entries: Dict[str, list] = {}
+            for entry in os.scandir(self.directory):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(".tmp") and now - stat.st_mtime < 60:
+                    # Probably being written right now
+                    continue
+                name = entry.name if entry.name.endswith(".tmp") else entry.name.rsplit(".", 1)[0]
+                files = entries.setdefault(name, [0.0, 0, []])
+                files[0] = max(files[0], stat.st_mtime)
+                files[1] += stat.st_size
+                files[2].append(entry.path)
+            total = sum(size for _, size, _ in entries.values())
+            for modified, size, paths in sorted(entries.values()):
+                if now - modified <= self.max_age and total <= self.max_bytes:
+                    break
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+        finally:
+            self._prune_lock.release()
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + ".json", base + ".body"
+
+    def load(self, url) -> Optional[Dict]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, encoding="utf-8") as f:
+                meta["text"] = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("checksum") != _checksum(meta["text"]):
+            return None
+        return meta
+
+    def _write(self, path, content) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def store(self, url, response, text, size) -> None:
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "expires": _expiry(response.headers),
+            "size": size,
+            "checksum": _checksum(text),
+        }
+        if not (meta["etag"] or meta["last_modified"] or meta["expires"]):
+            return
+        self._write(body_path, text)
+        self._write(meta_path, json.dumps(meta))
+        self._stores += 1
+        if self._stores % HTTP_CACHE_PRUNE_EVERY == 0:
+            self.prune()
+
+    def touch(self, url, response, meta) -> None:
+        """Refresh validators and expiry after a 304 Not Modified."""
+        meta_path, _ = self._paths(url)
+        meta = {k: v for k, v in meta.items() if k != "text"}
+        meta["etag"] = response.headers.get("ETag", meta.get("etag"))
+        meta["last_modified"] = response.headers.get("Last-Modified", meta.get("last_modified"))
+        meta["expires"] = _expiry(response.headers)
+        self._write(meta_path, json.dumps(meta))
+
+def _expiry(headers) -> Optional[float]:
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return None
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return time.time() + int(match.group(1))
+    if headers.get("Expires"):
+        try:
+            return parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return None
+    return None
+
+def _read_body(response, max_bytes=None):
+    """Read the (decompressed) body, stopping once max_bytes have been received."""
+    chunks = []
+    received = 0
+    truncated = False
+    for chunk in response.iter_content(chunk_size=16384):
+        chunks.append(chunk)
+        received += len(chunk)
+        if max_bytes is not None and received >= max_bytes:
+            truncated = True
+            break
+    response.close()
+    body = b"".join(chunks)
+    if max_bytes is not None:
+        body = body[:max_bytes]
+    return body, truncated
+
+def _decode(body, response):
+    """Decode with the declared charset, falling back to the page's meta charset, then UTF-8."""
+    match = re.search(r"charset=([\w-]+)", response.headers.get("Content-Type", ""))
+    encoding = match.group(1) if match else None
+    if encoding is None:
+        meta_match = re.search(rb"""charset=["']?([\w-]+)""", body[:4096])
+        encoding = meta_match.group(1).decode("ascii") if meta_match else "utf-8"
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+class FetchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    def record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            served = self.cache_hits + self.revalidated
+            total = served + self.misses
+            return {
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "hit_rate": served / total if total else 0.0,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved": self.bytes_saved,
+            }
+
+stats = FetchStats()
+_session = None
+_cache = None
+_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session shared by tools.py and tools_business_plan."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                # Wait for a free connection rather than open (and then discard) extra ones past the per-host limit
+                pool_block=True,
+                max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",)),
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING})
+            _session = session
+        return _session
+
+def get_cache() -> HTTPCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = HTTPCache()
+        return _cache
+
+def fetch_text(url: str, use_cache: bool = True, max_bytes: Optional[int] = None) -> Optional[str]:
+    """GET a page through the pooled session and disk cache; None unless the page is available.
+
+    With max_bytes the download is streamed and cut off at that size; truncated pages are not cached.
+    """
+    with span("fetch", url=url):
+        return _fetch_text(url, use_cache, max_bytes)
+
+def _fetch_text(url, use_cache, max_bytes):
+    cache = get_cache() if use_cache else None
+    cached = cache.load(url) if cache else None
+    headers = {}
+    if cached:
+        if cached.get("expires") and cached["expires"] > time.time():
+            stats.record(cache_hits=1, bytes_saved=cached.get("size", 0))
+            annotate(cache_hit=True)
+            return cached["text"]
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        response = get_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True)
+        stats.record(requests=1)
+
+        if response.status_code == 304 and cached:
+            response.close()
+            cache.touch(url, response, cached)
+            stats.record(revalidated=1, bytes_saved=cached.get("size", 0))
+            annotate(cache_hit=True, revalidated=True)
+            return cached["text"]
+        if response.status_code != 200:
+            response.close()
+            annotate(status=response.status_code)
+            return None
+        body, truncated = _read_body(response, max_bytes)
+    except requests.RequestException as e:
+        logging.warning(f"Error fetching {url}: {str(e)}")
+        return None
+
+    text = _decode(body, response)
+    stats.record(misses=1, bytes_downloaded=len(body))
+    annotate(bytes=len(body), truncated=truncated)
+    if cache and not truncated:
+        cache.store(url, response, text, len(body))
+    return text
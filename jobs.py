@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from telemetry import trace
+
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+JOB_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", 2))
+JOB_MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", 20))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# The process that runs a job; several Streamlit processes may share one store. The token tells this
+# process apart from an earlier one that had the same PID (e.g. PID 1 in a restarted container).
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class JobQueueFull(Exception):
+    pass
+
+class JobStore:
+    """SQLite record of jobs, their partial outputs and results, so they survive reruns and reconnects."""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, "
+            "partial TEXT NOT NULL, result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL, owner TEXT)"
+        )
+        if "owner" not in [column[1] for column in self._conn.execute("PRAGMA table_info(jobs)")]:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._conn.commit()
+
+    def recover_interrupted(self) -> int:
+        """Mark as failed the unfinished jobs of processes on this host that no longer run; returns how many.
+
+        Jobs of live processes, and of other hosts, are left alone.
+        """
+        host = socket.gethostname()
+        with self._lock:
+            rows = self._conn.execute("SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+            interrupted = [job_id for job_id, owner in rows if not _owner_alive(owner, host)]
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                [(FAILED, "Interrupted by a server restart", time.time(), job_id) for job_id in interrupted],
+            )
+            self._conn.commit()
+        return len(interrupted)
+
+    def create(self, kind, params) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, partial, created, updated, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), json.dumps({}), now, now, OWNER),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id, **fields) -> None:
+        if "partial" in fields:
+            fields["partial"] = json.dumps(fields["partial"])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def add_partial(self, job_id, name, output) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT partial FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            partial = json.loads(row[0]) if row else {}
+            partial[name] = output
+            self._conn.execute("UPDATE jobs SET partial = ?, updated = ? WHERE id = ?", (json.dumps(partial), time.time(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, params, partial, result, error, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "kind": row[1], "status": row[2], "params": json.loads(row[3]),
+            "partial": json.loads(row[4]), "result": row[5], "error": row[6], "created": row[7], "updated": row[8],
+        }
+
+    def count(self, *statuses) -> int:
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})", statuses).fetchone()[0]
+
+    def queued_before(self, created) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND created < ?", (QUEUED, created)).fetchone()[0]
+
+def _owner_alive(owner, host) -> bool:
+    # Jobs from before owners were recorded belong to a process that is gone
+    if not owner or owner.count(":") < 2:
+        return False
+    if owner == OWNER:
+        return True
+    owner_host, pid, _ = owner.rsplit(":", 2)
+    if owner_host != host:
+        return True
+    if pid == str(os.getpid()):
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+class JobRunner:
+    """Runs jobs on a bounded worker pool; extra jobs wait in the queue instead of starting more crews."""
+
+    def __init__(self, store: JobStore, max_workers: int = JOB_MAX_WORKERS, max_queued: int = JOB_MAX_QUEUED):
+        self.store = store
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._admission = threading.Lock()
+
+    def submit(self, kind, params, function: Callable) -> str:
+        """Queue function(params, report) and return the job id.
+
+        report(name, output) records a partial output that the page can show before the job finishes.
+        """
+        with self._admission:
+            if self.store.count(QUEUED) >= self.max_queued:
+                raise JobQueueFull(f"{self.max_queued} jobs are already waiting")
+            job_id = self.store.create(kind, params)
+        self._executor.submit(self._run, job_id, params, function)
+        return job_id
+
+    def _run(self, job_id, params, function):
+        self.store.update(job_id, status=RUNNING)
+        try:
+            with trace(f"job:{job_id}"):
+                result = function(params, lambda name, output: self.store.add_partial(job_id, name, output))
+            self.store.update(job_id, status=DONE, result=str(result))
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {str(e)}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+    def position(self, job_id) -> int:
+        """Number of queued jobs created before this one."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return 0
+        return self.store.queued_before(job["created"])
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_runner() -> JobRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            store = JobStore()
+            # Once per process: jobs left unfinished by a process that stopped will never finish
+            store.recover_interrupted()
+            _runner = JobRunner(store)
+        return _runner
@@ -1,14 +1,32 @@
+import os
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
+from assets import inject_css
+from model_factory import get_chat_model
+from llm_cache import cached_completion, cached_stream
+from canvases import LeanCanvasSections, split_items
+from telemetry import in_context
+from semantic_cache import semantic_completion, semantic_stream
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+SECTION_CONCURRENCY = int(os.environ.get("LEAN_CANVAS_SECTION_CONCURRENCY", 4))
+
+# The inputs each section is written from; an edit only regenerates the sections that read the edited input
+SECTION_INPUTS = {
+    "customer_segments": {"problem_description"},
+    "value_propositions": {"problem_description", "solution_description"},
+    "channels": {"solution_description"},
+    "revenue_streams": {"solution_description"},
+    "cost_structure": {"solution_description"},
+    "key_metrics": {"problem_description", "solution_description"},
+    "competitive_advantages": {"solution_description"},
+}
+# A change to any of these invalidates the whole canvas
+CANVAS_INPUTS = ("industry_name", "language", "model")
 
 class LeanCanvas:
-    def __init__(self, google_api_key, google_temperature, industry_name, problem_description, solution_description, language, year, model):
-        self.gpt_model = ChatGoogleGenerativeAI(api_key=google_api_key, model=model)
+    def __init__(self, google_api_key, google_temperature, industry_name, problem_description, solution_description, language, year, model, use_cache=True):
+        self.gpt_model = get_chat_model(google_api_key, model, google_temperature, role="canvas")
         self.google_api_key = google_api_key
         self.google_temperature = google_temperature
         self.industry_name = industry_name
@@ -17,21 +35,70 @@ class LeanCanvas:
         self.language = language
         self.year = year
         self.model = model
+        self.use_cache = use_cache
+        self.reused = {}
 
     def call_google_chat(self, prompt):
-        response = self.gpt_model.invoke(prompt)
-        return response.content
+        return cached_completion(lambda: self.gpt_model.invoke(prompt).content, prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def stream_google_chat(self, prompt):
+        return cached_stream(lambda: (chunk.content for chunk in self.gpt_model.stream(prompt)), prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
 
-    def generate_lean_canvas(self):
+    def _on_reuse(self, name, match):
+        self.reused[name] = match
+
+    def generate_lean_canvas(self, stream=False):
+        text_inputs = {"industry_name": self.industry_name, "problem_description": self.problem_description, "solution_description": self.solution_description}
+        exact_inputs = {"language": self.language, "model": self.gpt_model.model, "temperature": float(self.google_temperature)}
         prompt = f"""
             You are an expert consultant in innovation specializing in applying the Lean Canvas. Your task is to create a detailed Lean Canvas for the following problem and solution in the {self.industry_name} industry: Problem: {self.problem_description}. Solution: {self.solution_description}. Please respond only in the {self.language} language. Present the Lean Canvas in a markdown table with the following sections: 'Customer Segments', 'Value Propositions', 'Channels', 'Revenue Streams', 'Cost Structure', 'Key Metrics', and 'Competitive Advantages'.
         """
-        return self.call_google_chat(prompt)
+        if stream:
+            return semantic_stream("lean_canvas", text_inputs, exact_inputs, lambda: self.stream_google_chat(prompt), use_cache=self.use_cache, on_reuse=self._on_reuse)
+        return semantic_completion("lean_canvas", text_inputs, exact_inputs, lambda: self.call_google_chat(prompt), use_cache=self.use_cache, on_reuse=self._on_reuse)
 
-    def execute(self):
-        lean_canvas = self.generate_lean_canvas()
+    def execute(self, stream=False):
+        lean_canvas = self.generate_lean_canvas(stream=stream)
         return lean_canvas
 
+    def inputs(self):
+        return {
+            "industry_name": self.industry_name, "problem_description": self.problem_description,
+            "solution_description": self.solution_description, "language": self.language, "model": self.model,
+        }
+
+    def affected_sections(self, previous_inputs):
+        """Keys of the sections that must be regenerated when moving from previous_inputs to this canvas's inputs."""
+        current = self.inputs()
+        if any(previous_inputs.get(name) != current[name] for name in CANVAS_INPUTS):
+            return LeanCanvasSections.keys()
+        # Whitespace and case only edits do not change what the model would write
+        changed = {name for name in ("problem_description", "solution_description")
+                   if " ".join(str(previous_inputs.get(name, "")).lower().split()) != " ".join(current[name].lower().split())}
+        return [key for key in LeanCanvasSections.keys() if SECTION_INPUTS[key] & changed]
+
+    def generate_section(self, key, context):
+        title = LeanCanvasSections.title(key)
+        prompt = f"""
+            You are an expert consultant in innovation specializing in applying the Lean Canvas. You are updating one section of a Lean Canvas for the following problem and solution in the {self.industry_name} industry: Problem: {self.problem_description}. Solution: {self.solution_description}.
+            The other sections of the canvas currently read:
+            {context}
+            Write only the '{title}' section, consistent with the other sections, as three to five concise bullet points starting with '* '. Do not add a title, a table or any other text. Please respond only in the {self.language} language.
+        """
+        return self.call_google_chat(prompt)
+
+    def regenerate_sections(self, previous: LeanCanvasSections, keys) -> LeanCanvasSections:
+        """Copy of previous with only the given sections rewritten, each by its own small prompt, concurrently."""
+        canvas = LeanCanvasSections(previous.to_dict(), previous.layout)
+        if not keys:
+            return canvas
+        context = previous.condensed(exclude=keys)
+        with ThreadPoolExecutor(max_workers=min(SECTION_CONCURRENCY, len(keys))) as executor:
+            sections = list(executor.map(in_context(lambda key: self.generate_section(key, context)), keys))
+        for key, text in zip(keys, sections):
+            canvas.items[key] = split_items(text) or [text.strip()]
+        return canvas
+
 def localize_text(language):
     texts = {
         "English": {
@@ -46,7 +113,21 @@ def localize_text(language):
             "solution": "Solution",
             "confirm": "Confirm",
             "submit": "Submit",
-            "result": "Here is your Lean Canvas:"
+            "result": "Here is your Lean Canvas:",
+            "incremental": "Only regenerate the sections affected by my edits",
+            "updated_sections": "Regenerated {count} of {total} sections ({sections}); the others were kept.",
+            "unchanged": "These edits do not affect the canvas; here is the previous one.",
+            "reused": "Reused the result generated for similar inputs ({inputs}, similarity {similarity:.0%}).",
+            "table_header": ["Section", "Content"],
+            "sections": {
+                "customer_segments": "Customer Segments",
+                "value_propositions": "Value Propositions",
+                "channels": "Channels",
+                "revenue_streams": "Revenue Streams",
+                "cost_structure": "Cost Structure",
+                "key_metrics": "Key Metrics",
+                "competitive_advantages": "Competitive Advantages"
+            }
         },
         "French": {
             "title": "Lean Canvas",
@@ -60,13 +141,27 @@ def localize_text(language):
             "solution": "Solution",
             "confirm": "Confirmer",
             "submit": "Soumettre",
-            "result": "Voici votre Lean Canvas :"
+            "result": "Voici votre Lean Canvas :",
+            "incremental": "Ne régénérer que les sections touchées par mes modifications",
+            "updated_sections": "{count} sections sur {total} régénérées ({sections}) ; les autres ont été conservées.",
+            "unchanged": "Ces modifications n'affectent pas le canvas ; voici le précédent.",
+            "reused": "Résultat réutilisé d'une demande similaire ({inputs}, similarité {similarity:.0%}).",
+            "table_header": ["Section", "Contenu"],
+            "sections": {
+                "customer_segments": "Segments de clientèle",
+                "value_propositions": "Propositions de valeur",
+                "channels": "Canaux",
+                "revenue_streams": "Flux de revenus",
+                "cost_structure": "Structure des coûts",
+                "key_metrics": "Indicateurs clés",
+                "competitive_advantages": "Avantages concurrentiels"
+            }
         }
     }
     return texts[language]
 
 def display_lean_canvas(api_key, temperature, lang, model):
-    load_css('style.css')
+    inject_css('style.css')
 
     language = lang
     lang_texts = localize_text(language)
@@ -117,6 +212,7 @@ def display_lean_canvas(api_key, temperature, lang, model):
 
         col7 = st.columns([1])
         with col7[0]:
+            incremental = st.checkbox(lang_texts["incremental"], value=True, key="lean_canvas_incremental")
             generate_button = st.button(lang_texts["submit"], key="generate_lean_canvas_button")
 
         if generate_button:
@@ -126,12 +222,33 @@ def display_lean_canvas(api_key, temperature, lang, model):
                 try:
                     with st.spinner(lang_texts["result"]):
                         agent = LeanCanvas(api_key, temperature, st.session_state.industry_name, detailed_problem_description, detailed_solution_description, language, year=2024, model=model)
-                        lean_canvas = agent.execute()
+                        st.markdown(f"**{lang_texts['problem_description']}**: {detailed_problem_description}")
+                        st.markdown(f"**{lang_texts['solution_description']}**: {detailed_solution_description}")
 
-                        if isinstance(lean_canvas, str):
-                            st.markdown(f"**{lang_texts['problem_description']}**: {detailed_problem_description}")
-                            st.markdown(f"**{lang_texts['solution_description']}**: {detailed_solution_description}")
+                        previous = st.session_state.get("lean_canvas_sections")
+                        affected = agent.affected_sections(previous["inputs"]) if incremental and previous else LeanCanvasSections.keys()
+                        if len(affected) < len(LeanCanvasSections.SECTIONS):
+                            # Reuse the unchanged sections and rewrite only the affected ones
+                            canvas = agent.regenerate_sections(LeanCanvasSections.from_dict(previous["sections"], previous.get("layout")), affected)
+                            lean_canvas = canvas.to_markdown(lang_texts["sections"], lang_texts["table_header"])
                             st.markdown(lean_canvas, unsafe_allow_html=True)
+                            if affected:
+                                titles = ", ".join(lang_texts["sections"][key] for key in affected)
+                                st.caption(lang_texts["updated_sections"].format(count=len(affected), total=len(LeanCanvasSections.SECTIONS), sections=titles))
+                            else:
+                                st.caption(lang_texts["unchanged"])
+                        else:
+                            lean_canvas = st.write_stream(agent.execute(stream=True))
+                            canvas = LeanCanvasSections.parse(lean_canvas)
+                            for match in agent.reused.values():
+                                st.caption(lang_texts["reused"].format(inputs=match.describe(), similarity=match.similarity))
+
+                        if isinstance(lean_canvas, str):
+                            # Only a fully parsed canvas can be updated section by section later
+                            if canvas.is_complete():
+                                st.session_state["lean_canvas_sections"] = {"inputs": agent.inputs(), "sections": canvas.to_dict(), "layout": canvas.layout}
+                            else:
+                                st.session_state.pop("lean_canvas_sections", None)
                             st.markdown("<br><br><br>", unsafe_allow_html=True)
                         else:
                             st.error("Lean Canvas généré n'est pas sous forme de texte.")
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from telemetry import span, stream_span
+
+DEFAULT_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+DEFAULT_TTL = int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 2000))
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in the f-string prompts do not miss the cache."""
+    return " ".join(prompt.split())
+
+class LLMCache:
+    """SQLite response cache with TTL and LRU eviction, shared by every call_google_chat."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, temperature, language, prompt) -> str:
+        raw = "\x1f".join([str(model), str(temperature), str(language), normalize_prompt(prompt)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> LLMCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+def cached_completion(generate: Callable[[], str], prompt, model, temperature, language, use_cache=True) -> str:
+    """Return the cached answer for this prompt, or call generate() and store its result."""
+    with span("call_google_chat", model=model) as current:
+        if not use_cache:
+            return generate()
+        cache = get_cache()
+        key = cache.make_key(model, temperature, language, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            current.set(cache_hit=True)
+            return cached
+        content = generate()
+        if content:
+            cache.set(key, content)
+        return content
+
+def cached_stream(generate_chunks: Callable[[], Iterable[str]], prompt, model, temperature, language, use_cache=True) -> Iterator[str]:
+    """Streaming counterpart of cached_completion: a hit is yielded as one chunk,
+    a miss streams from the model and stores the joined text once it is complete."""
+    with stream_span("call_google_chat", model=model, stream=True) as current:
+        cache = get_cache() if use_cache else None
+        key = cache.make_key(model, temperature, language, prompt) if cache else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                current.set(cache_hit=True)
+                yield cached
+                return
+        parts = []
+        for chunk in generate_chunks():
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+        content = "".join(parts)
+        if cache and content:
+            cache.set(key, content)
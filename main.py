@@ -1,23 +1,52 @@
 import streamlit as st
-import openai
-import base64
+import importlib
 import os
-import problems
-import solutions
-import lean_canvas
-import business_canvas
-import business_plan
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
 import logging
+import assets
+import telemetry
 
 # Configuration de la journalisation
 logging.basicConfig(level=logging.WARNING)
+# Rerun timings are logged at INFO under the WARNING root level (see benchmarks/bench_rerun.py to compare modes)
+rerun_logger = logging.getLogger("rerun")
+rerun_logger.setLevel(logging.INFO)
 
 st.set_page_config(page_title="AI Marketing Innovation Toolkit", layout="wide", page_icon="uqar.png")
 
-# Apply CSS
-with open('style.css') as f:
-    st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+# Apply CSS once for the whole render; the pages' inject_css calls become no-ops
+assets.begin_render()
+assets.inject_css('style.css')
+
+# Page modules are imported on first use so that, for example, crewai only loads
+# once someone opens the Business Plan page.
+PAGES = {
+    "t_problem": ("problems", "display_problems"),
+    "t_solution": ("solutions", "display_solutions"),
+    "t_lean_canvas": ("lean_canvas", "display_lean_canvas"),
+    "t_business_canvas": ("business_canvas", "display_business_canvas"),
+    "t_business_plan": ("business_plan", "display_business_plan"),
+}
+
+# Set LAZY_NAVIGATION=0 to go back to rendering every page inside st.tabs on each rerun
+LAZY_NAVIGATION = os.environ.get("LAZY_NAVIGATION", "1") != "0"
+
+# TELEMETRY_PANEL=1 shows the stage breakdown of the last request in the sidebar;
+# METRICS_PORT serves the Prometheus counters on http://127.0.0.1:<port>/metrics
+TELEMETRY_PANEL = os.environ.get("TELEMETRY_PANEL", "0") == "1"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+
+if METRICS_PORT:
+    try:
+        telemetry.start_metrics_server(METRICS_PORT)
+    except OSError as e:
+        logging.warning(f"Metrics endpoint not started on port {METRICS_PORT}: {str(e)}")
+
+def load_page(page_key):
+    """Import the page's module if needed and return its display function."""
+    module_name, function_name = PAGES[page_key]
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)
 
 def localize_text(language):
     texts = {
@@ -29,6 +58,7 @@ def localize_text(language):
             "model": "Select Model",
             "apig": "Generate your own Gemini API key by clicking here",
             "warn": "Please enter your API key",
+            "telemetry": "Last request breakdown",
             "tabs": {
                 "t_problem": "Problems",
                 "t_solution": "Solutions",
@@ -45,6 +75,7 @@ def localize_text(language):
             "model": "Sélectionnez le modèle",
             "apig": "Générez votre propre clé Gemini API en cliquant ici",
             "warn":"Veuillez entrer votre clé API",
+            "telemetry": "Détail de la dernière requête",
             "tabs": {
                 "t_problem": "Problèmes",
                 "t_solution": "Solutions",
@@ -56,16 +87,18 @@ def localize_text(language):
     }
     return texts[language]
 
-def img_to_base64(image_path):
-    """Convert image to base64."""
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except Exception as e:
-        logging.error(f"Error converting image to base64: {str(e)}")
-        return None
+def display_telemetry_panel(lang_texts):
+    last_trace = st.session_state.get("last_trace")
+    if not last_trace:
+        return
+    with st.sidebar.expander(lang_texts["telemetry"]):
+        st.caption(f"{last_trace['name']} · {last_trace['seconds']:.2f} s")
+        st.dataframe(last_trace["breakdown"], hide_index=True, use_container_width=True)
 
 def main():
+    rerun_start = time.perf_counter()
+    request_trace = None
+
     with st.expander("**Paramétres**", expanded=True):
         col1, col2, col3, col4 = st.columns([4, 4, 4, 4])
         
@@ -93,10 +126,10 @@ def main():
     with st.sidebar:
         st.markdown(f'<div class="css-1d391kg">Laboratoire Limnat, UQAR, Campus Lévis (<a href="https://limnat.ca" target="_blank">https://limnat.ca</a>)</div>', unsafe_allow_html=True)
         st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-        uqar_img_base64 = img_to_base64("uqar.jpg")
-        if uqar_img_base64:
+        uqar_img_uri = assets.image_data_uri("uqar.jpg")
+        if uqar_img_uri:
             st.markdown(
-                f'<a href="https://www.uqar.ca" target="_blank"><img src="data:image/png;base64,{uqar_img_base64}" class="cover-glow" alt="UQAR"></a>',
+                f'<a href="https://www.uqar.ca" target="_blank"><img src="{uqar_img_uri}" class="cover-glow" alt="UQAR"></a>',
                 unsafe_allow_html=True,
             )
         st.text("")
@@ -108,33 +141,43 @@ def main():
             st.markdown('</div>', unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
         
-    tab_titles = [lang_texts["tabs"]["t_problem"], 
-                  lang_texts["tabs"]["t_solution"], 
-                  lang_texts["tabs"]["t_lean_canvas"], 
-                  lang_texts["tabs"]["t_business_canvas"],
-                  lang_texts["tabs"]["t_business_plan"]]
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(tab_titles)
-    
-    if api_key:
-        os.environ["GEMINI_API_KEY"] = api_key
-
-        with tab1:
-            problems.display_problems(api_key, temperature, lang, model)
-
-        with tab2:
-           solutions.display_solutions(api_key, temperature, lang, model)
-
-        with tab3:
-            lean_canvas.display_lean_canvas(api_key, temperature, lang, model)
-             
-        with tab4:
-            business_canvas.display_business_canvas(api_key, temperature, lang, model)
-
-        with tab5:
-            business_plan.display_business_plan(api_key, temperature, lang, model)
+    if LAZY_NAVIGATION:
+        # Only the selected page's script runs on a rerun
+        page_key = st.radio("", list(PAGES), format_func=lambda key: lang_texts["tabs"][key], horizontal=True, key="active_page", label_visibility="collapsed")
 
+        if api_key:
+            os.environ["GEMINI_API_KEY"] = api_key
+            with telemetry.trace(page_key) as request_trace:
+                load_page(page_key)(api_key, temperature, lang, model)
+        else:
+            st.warning(lang_texts["warn"])
     else:
-        st.warning(lang_texts["warn"])
+        tab_titles = [lang_texts["tabs"][page_key] for page_key in PAGES]
+        tabs = st.tabs(tab_titles)
+
+        if api_key:
+            os.environ["GEMINI_API_KEY"] = api_key
+
+            with telemetry.trace("tabs") as request_trace:
+                for tab, page_key in zip(tabs, PAGES):
+                    with tab:
+                        load_page(page_key)(api_key, temperature, lang, model)
+        else:
+            st.warning(lang_texts["warn"])
+
+    # Reruns that only redraw the page keep the breakdown of the last one that did some work
+    if request_trace is not None and request_trace.spans:
+        st.session_state["last_trace"] = {
+            "name": request_trace.name,
+            "seconds": request_trace.duration,
+            "breakdown": [{**stage, "seconds": round(stage["seconds"], 3)} for stage in request_trace.breakdown()],
+        }
+    if TELEMETRY_PANEL:
+        display_telemetry_panel(lang_texts)
+
+    rerun_ms = (time.perf_counter() - rerun_start) * 1000
+    st.session_state["last_rerun_ms"] = rerun_ms
+    rerun_logger.info(f"Rerun completed in {rerun_ms:.0f} ms (lazy navigation: {LAZY_NAVIGATION})")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+from langchain_google_genai import ChatGoogleGenerativeAI
+from model_router import route_model, router
+from rate_limit import get_limiter, prompt_tokens
+from summarization import count_tokens
+from telemetry import span, stream_span
+
+MODEL_IDLE_TTL = float(os.environ.get("MODEL_IDLE_TTL", 30 * 60))
+# Throttling is retried by rate_limit's limiter; client-side retries would compound its backoff
+CLIENT_MAX_RETRIES = 1
+
+_models = {}
+_lock = threading.Lock()
+
+class RateLimitedChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """Gemini chat model whose calls go through the limiter of its model and API key.
+
+    Every caller (generators, ranking, summarize chains, crew agents) gets its client
+    from get_chat_model, so all calls made with one key share its budgets and backoff. Clients made
+    for a role report each call's latency and tokens to the model router.
+    """
+
+    role: Optional[str] = None
+    selected_model: Optional[str] = None
+
+    def _record(self, timing, tokens_in, tokens_out, first_token=False):
+        if self.role and "seconds" in timing:
+            router.record(self.role, self.model, self.selected_model or self.model, timing["seconds"], tokens_in, tokens_out,
+                          api_key=self.google_api_key.get_secret_value(), first_token=first_token)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens_in = prompt_tokens(messages)
+        # Only the provider call is timed for the router, not waits in the limiter or its backoff
+        timing = {}
+
+        def generate():
+            started = time.perf_counter()
+            result = super(RateLimitedChatGoogleGenerativeAI, self)._generate(messages, stop, run_manager, **kwargs)
+            timing["seconds"] = time.perf_counter() - started
+            return result
+
+        with span("gemini", model=self.model, role=self.role, tokens_in=tokens_in) as current:
+            result = get_limiter(self.model, self.google_api_key.get_secret_value()).call(generate, tokens_in)
+            tokens_out = sum(count_tokens(generation.text) for generation in result.generations)
+            current.set(tokens_out=tokens_out)
+        self._record(timing, tokens_in, tokens_out)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens_in = prompt_tokens(messages)
+        # Time to first token: neither limiter waits nor the time the consumer holds the stream count
+        timing = {}
+
+        def generate_chunks():
+            started = time.perf_counter()
+            for chunk in super(RateLimitedChatGoogleGenerativeAI, self)._stream(messages, stop, run_manager, **kwargs):
+                timing.setdefault("seconds", time.perf_counter() - started)
+                yield chunk
+
+        with stream_span("gemini", model=self.model, role=self.role, tokens_in=tokens_in, stream=True) as current:
+            tokens_out = 0
+            for chunk in get_limiter(self.model, self.google_api_key.get_secret_value()).stream(generate_chunks, tokens_in):
+                tokens_out += count_tokens(chunk.text)
+                current.set(tokens_out=tokens_out)
+                yield chunk
+        self._record(timing, tokens_in, tokens_out, first_token=True)
+
+def _key(api_key, model, temperature, role=None, selected_model=None):
+    api_key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    return api_key_hash, model, float(temperature), role, selected_model
+
+def _evict_idle(now):
+    for key in [key for key, (_, last_used) in _models.items() if now - last_used > MODEL_IDLE_TTL]:
+        del _models[key]
+
+def get_chat_model(api_key, model, temperature, role=None):
+    """Return the shared Gemini client for (api key, model, temperature), creating it on first use.
+
+    With a role (see model_router.ROLES), model is the one selected by the user and the
+    client uses the model the router picks for that role instead; callers that cache answers
+    key them on the client's model, so a fallback's answers never pass for the selected
+    model's. Clients idle for longer than MODEL_IDLE_TTL seconds are dropped.
+    """
+    selected_model = None
+    if role:
+        selected_model, model = model, route_model(role, model, api_key)
+    key = _key(api_key, model, temperature, role, selected_model)
+    now = time.time()
+    with _lock:
+        _evict_idle(now)
+        entry = _models.get(key)
+        if entry is None:
+            client = RateLimitedChatGoogleGenerativeAI(
+                api_key=api_key, model=model, temperature=float(temperature), role=role, selected_model=selected_model,
+                max_retries=CLIENT_MAX_RETRIES,
+            )
+            entry = (client, now)
+        _models[key] = (entry[0], now)
+        return entry[0]
+
+def for_role(gpt_model, role):
+    """The client for role derived from gpt_model's key, selected model and temperature.
+
+    Models that are not Gemini clients (test doubles, other LLMs) are returned unchanged.
+    """
+    if not isinstance(gpt_model, RateLimitedChatGoogleGenerativeAI):
+        return gpt_model
+    selected_model = gpt_model.selected_model or gpt_model.model
+    return get_chat_model(gpt_model.google_api_key.get_secret_value(), selected_model, gpt_model.temperature, role=role)
+
+def clear_models():
+    with _lock:
+        _models.clear()
@@ -0,0 +1,124 @@
+"""Choice of Gemini model per call role.
+
+The sidebar model is an upper bound, not the model of every call: mechanical steps
+(ranking URLs, summarizing pages, the crew's research sub-steps) run on the fast
+tier, while synthesis and canvases keep the selected model. When the provider takes
+longer than a role's latency budget under one API key, that key's calls of the role
+move to the next faster tier for a cool-down period.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+ROLES = ("rank", "summarize", "research", "synthesize", "canvas")
+
+# Fastest first. Override with MODEL_TIERS='{"fast": "gemini-1.5-flash", "strong": "gemini-1.5-pro-latest"}'
+DEFAULT_TIERS = {"fast": "gemini-1.5-flash", "strong": "gemini-1.5-pro-latest"}
+MODEL_TIERS = json.loads(os.environ.get("MODEL_TIERS", "null")) or DEFAULT_TIERS
+TIER_ORDER = list(MODEL_TIERS)
+
+# Override with MODEL_ROLES='{"research": "strong"}'
+DEFAULT_ROLE_TIERS = {"rank": "fast", "summarize": "fast", "research": "fast", "synthesize": "strong", "canvas": "strong"}
+ROLE_TIERS = {**DEFAULT_ROLE_TIERS, **json.loads(os.environ.get("MODEL_ROLES", "{}"))}
+
+# Seconds the provider takes to answer a call, limiter waits excluded. Override with MODEL_LATENCY_BUDGETS='{"canvas": 30}'
+DEFAULT_LATENCY_BUDGETS = {"rank": 15, "summarize": 30, "research": 60, "synthesize": 90, "canvas": 60}
+LATENCY_BUDGETS = {**DEFAULT_LATENCY_BUDGETS, **json.loads(os.environ.get("MODEL_LATENCY_BUDGETS", "{}"))}
+# Seconds to the first chunk of a streamed call. Override with MODEL_FIRST_TOKEN_BUDGETS
+DEFAULT_FIRST_TOKEN_BUDGETS = {"rank": 5, "summarize": 10, "research": 15, "synthesize": 20, "canvas": 15}
+FIRST_TOKEN_BUDGETS = {**DEFAULT_FIRST_TOKEN_BUDGETS, **json.loads(os.environ.get("MODEL_FIRST_TOKEN_BUDGETS", "{}"))}
+FALLBACK_COOLDOWN = float(os.environ.get("MODEL_FALLBACK_COOLDOWN", 600))
+
+# USD per million (input, output) tokens, prompts up to 128k tokens. Override with MODEL_PRICES.
+DEFAULT_PRICES = {"gemini-1.5-flash": [0.35, 1.05], "gemini-1.5-pro-latest": [3.5, 10.5]}
+MODEL_PRICES = {**DEFAULT_PRICES, **json.loads(os.environ.get("MODEL_PRICES", "{}"))}
+
+# Weight of the newest call in the moving average latency of a (role, model)
+LATENCY_SMOOTHING = 0.3
+
+def _name(model) -> str:
+    return model.split("/")[-1]
+
+def _tier_index(model) -> Optional[int]:
+    for index, tier in enumerate(TIER_ORDER):
+        if MODEL_TIERS[tier] == _name(model):
+            return index
+    return None
+
+def _key_hash(api_key) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def cost(model, tokens_in, tokens_out) -> float:
+    price_in, price_out = MODEL_PRICES.get(_name(model), (0.0, 0.0))
+    return (tokens_in * price_in + tokens_out * price_out) / 1_000_000
+
+class ModelRouter:
+    """Routes roles to tiers and keeps per-role latency and savings figures."""
+
+    def __init__(self):
+        self._slow_until: Dict[tuple, float] = {}
+        self._latency: Dict[tuple, float] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, role, selected, api_key="") -> str:
+        """Model for a call of this role when the user selected `selected`; models outside the tiers are kept as is."""
+        selected_index = _tier_index(selected)
+        if selected_index is None or role not in ROLE_TIERS:
+            return _name(selected)
+        # Never slower (or dearer) than the selected model
+        index = min(TIER_ORDER.index(ROLE_TIERS[role]), selected_index)
+        now = time.time()
+        key_hash = _key_hash(api_key)
+        with self._lock:
+            while index > 0 and self._slow_until.get((key_hash, role, MODEL_TIERS[TIER_ORDER[index]]), 0) > now:
+                index -= 1
+        return MODEL_TIERS[TIER_ORDER[index]]
+
+    def record(self, role, model, selected, seconds, tokens_in, tokens_out, api_key="", first_token=False) -> None:
+        """Account for one finished call; a call over the role's budget sends the role to a faster tier for a while.
+
+        seconds is the provider's answer time, or its time to first token for a stream (first_token).
+        Fallbacks apply to the calls made with the same API key only.
+        """
+        model, selected = _name(model), _name(selected)
+        spent = cost(model, tokens_in, tokens_out)
+        saved_cost = cost(selected, tokens_in, tokens_out) - spent
+        budget = (FIRST_TOKEN_BUDGETS if first_token else LATENCY_BUDGETS).get(role)
+        # Streamed and whole calls are timed differently, so their averages are kept apart
+        kind = "first_token" if first_token else "call"
+        with self._lock:
+            previous = self._latency.get((role, kind, model))
+            self._latency[(role, kind, model)] = seconds if previous is None else previous + LATENCY_SMOOTHING * (seconds - previous)
+            # Only known once the selected model has served this role, e.g. before a fallback or with MODEL_ROLES
+            selected_latency = self._latency.get((role, kind, selected)) if model != selected else None
+            saved_seconds = selected_latency - seconds if selected_latency is not None else 0.0
+            # The fast tier has nowhere to fall back to
+            over_budget = budget is not None and seconds > budget and (_tier_index(model) or 0) > 0
+            if over_budget:
+                self._slow_until[(_key_hash(api_key), role, model)] = time.time() + FALLBACK_COOLDOWN
+            stats = self._stats.setdefault(role, {"calls": 0, "seconds": 0.0, "cost": 0.0, "cost_saved": 0.0, "seconds_saved": 0.0, "fallbacks": 0})
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["cost"] += spent
+            stats["cost_saved"] += saved_cost
+            stats["seconds_saved"] += saved_seconds
+            stats["fallbacks"] += 1 if over_budget else 0
+        if over_budget:
+            logging.warning(f"Model router: {role} call on {model} took {seconds:.1f}s ({kind.replace('_', ' ')} budget {budget}s); "
+                            f"using a faster tier for this key for {FALLBACK_COOLDOWN:.0f}s")
+        logging.info(f"Model router: {role} on {model} (selected {selected}) took {seconds:.1f}s, "
+                     f"${spent:.5f}; saved ${saved_cost:.5f} and {saved_seconds:.1f}s")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {role: dict(values) for role, values in self._stats.items()}
+
+router = ModelRouter()
+
+def route_model(role, selected, api_key="") -> str:
+    return router.route(role, selected, api_key)
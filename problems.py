@@ -1,5 +1,7 @@
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
+from assets import inject_css
+from model_factory import get_chat_model
+from llm_cache import cached_completion, cached_stream
 from duckduckgo_search import DDGS
 import requests
 from bs4 import BeautifulSoup
@@ -10,14 +12,13 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains.summarize import load_summarize_chain
 from langchain.docstore.document import Document
 from tools import fetch_with_user_agent, scrape, search, find_relevant_articles, summarize
-
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+from retrieval import retrieve_passages, format_passages
+from semantic_cache import semantic_completion, semantic_stream
+from canvases import parse_problems
 
 class SSSSS:
-    def __init__(self, google_api_key, google_temperature, industry_name, type_client, region, problem_number, language, year, model):
-        self.gpt_model = ChatGoogleGenerativeAI(api_key=google_api_key, model=model)
+    def __init__(self, google_api_key, google_temperature, industry_name, type_client, region, problem_number, language, year, model, use_cache=True):
+        self.gpt_model = get_chat_model(google_api_key, model, google_temperature, role="synthesize")
         self.google_api_key = google_api_key
         self.google_temperature = google_temperature
         self.industry_name = industry_name
@@ -27,28 +28,58 @@ class SSSSS:
         self.language = language
         self.year = year
         self.model = model
+        self.use_cache = use_cache
+        self.reused = {}
+
+    def call_google_chat(self, prompt, cache_prompt=None):
+        """prompt may be a function building it, called only on a cache miss; the answer is cached under cache_prompt."""
+        build = prompt if callable(prompt) else lambda: prompt
+        return cached_completion(lambda: self.gpt_model.invoke(build()).content, cache_prompt or prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def stream_google_chat(self, prompt, cache_prompt=None):
+        build = prompt if callable(prompt) else lambda: prompt
+        return cached_stream(lambda: (chunk.content for chunk in self.gpt_model.stream(build())), cache_prompt or prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def _on_reuse(self, name, match):
+        self.reused[name] = match
 
-    def call_google_chat(self, prompt):
-        response = self.gpt_model.invoke(prompt)
-        return response.content
+    def generate_problem(self, stream=False):
+        # Near-identical requests (same language, region and count) reuse an earlier answer, search included
+        text_inputs = {"industry_name": self.industry_name, "type_client": self.type_client}
+        exact_inputs = {"region": self.region, "problem_number": int(self.problem_number), "language": self.language, "model": self.gpt_model.model, "temperature": float(self.google_temperature)}
+        if stream:
+            return semantic_stream("problems", text_inputs, exact_inputs, lambda: self.research_problem(stream=True), year=self.year, use_cache=self.use_cache, on_reuse=self._on_reuse)
+        return semantic_completion("problems", text_inputs, exact_inputs, self.research_problem, year=self.year, use_cache=self.use_cache, on_reuse=self._on_reuse)
 
-    def generate_problem(self):
+    def research_problem(self, stream=False):
         # Extract URLs using tools.py
         query = f"current problems in the {self.industry_name} industry for {self.type_client} clients in {self.region}"
         search_results = search(query, self.year)
         urls = find_relevant_articles(search_results, query, self.gpt_model, self.problem_number)
-        
+
         # Build the prompt with URLs
         url_list = "\n".join(urls)
-        prompt = f"""
+
+        def prompt(passages):
+            return f"""
             You are an expert consultant in innovation specialized in applying the Lean Canvas. You have extensive experience in identifying critical problems within contemporary industries and markets. Your task is to identify {self.problem_number} current problems specifically faced by {self.type_client} clients in the {self.industry_name} industry in region {self.region}. You must conduct your research using the following sources:
             {url_list}
+            Extracts from these sources:
+            {passages}
             Please respond only in the {self.language} language. Please present the results in a markdown table with four columns: 'Problème', 'Description', 'Impact', and 'Source'. Include the source URLs in the 'Source' column.
         """
-        return self.call_google_chat(prompt)
 
-    def execute(self):
-        return self.generate_problem()
+        # Fetch the ranked pages in parallel so the model sees their content, not just the URLs. The answer is
+        # cached under the prompt without the extracts, so a cache hit fetches no page.
+        def prompt_with_passages():
+            return prompt(format_passages(retrieve_passages(urls)))
+
+        if stream:
+            return self.stream_google_chat(prompt_with_passages, cache_prompt=prompt(""))
+        return self.call_google_chat(prompt_with_passages, cache_prompt=prompt(""))
+
+    def execute(self, stream=False):
+        return self.generate_problem(stream=stream)
 
 def localize_text(language):
     texts = {
@@ -62,7 +93,8 @@ def localize_text(language):
             "num_problems": "Number of Problems:",
             "submit": "Submit",
             "result": "Here are the generated problems:",
-            "year": "Enter the research year:"
+            "year": "Enter the research year:",
+            "reused": "Reused the result generated for similar inputs ({inputs}, similarity {similarity:.0%})."
         },
         "French": {
             "title": "Recherche de Problèmes",
@@ -74,13 +106,14 @@ def localize_text(language):
             "num_problems": "Nombre de problèmes :",
             "submit": "Soumettre",
             "result": "Voici les problèmes générés :",
-            "year": "Entrez l'année de recherche :"
+            "year": "Entrez l'année de recherche :",
+            "reused": "Résultat réutilisé d'une demande similaire ({inputs}, similarité {similarity:.0%})."
         }
     }
     return texts[language]
 
 def display_problems(api_key, temperature, lang, model):
-    load_css('style.css')
+    inject_css('style.css')
 
     language = lang
     
@@ -139,10 +172,13 @@ def display_problems(api_key, temperature, lang, model):
             try:             
                 with st.spinner(lang_texts["result"]):
                     agent = SSSSS(api_key, temperature, industry_name, type_client, region_code, problem_number, language, year, model)
-                    generated_problems = agent.generate_problem()
+                    generated_problems = st.write_stream(agent.generate_problem(stream=True))
 
                     if isinstance(generated_problems, str):
-                        st.markdown(generated_problems)
+                        # Lets the Solutions tab solve every problem of this table in one run
+                        st.session_state["problems_result"] = {"industry_name": industry_name, "year": year, "problems": parse_problems(generated_problems)}
+                        for match in agent.reused.values():
+                            st.caption(lang_texts["reused"].format(inputs=match.describe(), similarity=match.similarity))
                         st.markdown("<br><br><br>", unsafe_allow_html=True)
                     else:
                         st.error("Problèmes générés ne sont pas sous forme de texte.")
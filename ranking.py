@@ -0,0 +1,147 @@
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+from telemetry import traced
+
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 10))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Field weights, applied by repeating the field's tokens
+TITLE_WEIGHT = 2
+SNIPPET_WEIGHT = 1
+DOMAIN_WEIGHT = 1
+
+STOPWORDS = set("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+au aux avec ce ces dans de des du en est et il la le les leur mais ne ou par pas pour qui que sa se
+ses son sur un une
+""".split())
+
+# Only parameters known to be tracking-only; generic names such as ref or source select content on some sites
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid)$", re.IGNORECASE)
+
+def tokenize(text) -> List[str]:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return [token for token in re.findall(r"[a-z0-9]+", text) if len(token) > 1 and token not in STOPWORDS]
+
+def normalize_url(url) -> str:
+    """Canonical form used to spot duplicates: no scheme/www/fragment/tracking parameters or trailing slash."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)])
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, "")).lstrip("/")
+
+def _document_tokens(result):
+    domain = urlsplit(result.get("href", "")).netloc
+    return (tokenize(result.get("title", "")) * TITLE_WEIGHT
+            + tokenize(result.get("body", "")) * SNIPPET_WEIGHT
+            + tokenize(domain) * DOMAIN_WEIGHT)
+
+def dedupe_results(results) -> List[Dict]:
+    seen = set()
+    unique = []
+    for result in results or []:
+        href = result.get("href")
+        if not href:
+            continue
+        key = normalize_url(href)
+        if key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
+
+def rank_results(results, query, top_k=None) -> List[Dict]:
+    """Rank DDGS results against the query with BM25 over title, snippet and domain."""
+    results = dedupe_results(results)
+    if not results:
+        return []
+    documents = [Counter(_document_tokens(result)) for result in results]
+    lengths = [sum(document.values()) for document in documents]
+    average_length = sum(lengths) / len(lengths) or 1
+    query_terms = set(tokenize(query))
+    document_frequency = {term: sum(1 for document in documents if term in document) for term in query_terms}
+
+    def score(index):
+        document, length = documents[index], lengths[index]
+        total = 0.0
+        for term in query_terms:
+            frequency = document.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            total += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+        return total
+
+    # Ties keep the search engine's own order
+    order = sorted(range(len(results)), key=lambda index: (-score(index), index))
+    ranked = [results[index] for index in order]
+    return ranked[:top_k] if top_k else ranked
+
+def parse_url_list(text) -> List[str]:
+    """Read the URL array out of a model answer, tolerating code fences and surrounding chatter."""
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    if match:
+        try:
+            urls = json.loads(match.group(0))
+            return [url for url in urls if isinstance(url, str)]
+        except ValueError:
+            pass
+    # Sentence punctuation right after a bare URL is not part of it
+    return [url.rstrip(".;:)") for url in re.findall(r"https?://[^\s\"'<>\],]+", text or "")]
+
+def llm_rerank(candidates, query, gpt_model, num_articles=6) -> List[str]:
+    """Let the model reorder the locally ranked candidates; falls back to the local order if the call fails."""
+    response_data = json.dumps(candidates)
+    template = f"""
+    You are the best researcher of all time. You are extremely good at finding the relevant articles to the query.
+    {{response_data}}
+    Above is the list of search results of articles for the query: {{query}}.
+    Please rank the best {num_articles} articles from the list, return ONLY an array of the urls, do not include any information.
+    Return ONLY an array of the urls, do not include anything else.
+    """
+
+    prompt = PromptTemplate(
+        input_variables=['response_data', 'query'],
+        template=template
+    )
+
+    chain = LLMChain(prompt=prompt, llm=gpt_model)
+    try:
+        answer = chain.run(response_data=response_data, query=query)
+    except Exception as e:
+        # Ranking only orders the sources; a failed call should not fail the page
+        logging.warning(f"LLM rerank failed, keeping the local ranking: {str(e)}")
+        answer = ""
+
+    by_key = {normalize_url(candidate["href"]): candidate["href"] for candidate in candidates}
+    reranked = []
+    for url in parse_url_list(answer):
+        href = by_key.get(normalize_url(url))
+        if href and href not in reranked:
+            reranked.append(href)
+    # Fill up from the local ranking if the model returned too few (or unknown) URLs
+    for candidate in candidates:
+        if len(reranked) >= num_articles:
+            break
+        if candidate["href"] not in reranked:
+            reranked.append(candidate["href"])
+    return reranked[:num_articles]
+
+@traced("find_relevant_articles")
+def find_relevant_urls(results, query, gpt_model=None, num_articles=6, rerank=False) -> List[str]:
+    """Local BM25 ranking by default; with rerank=True the model reorders only the top candidates."""
+    if rerank and gpt_model is not None:
+        candidates = rank_results(results, query, top_k=max(RERANK_CANDIDATES, num_articles))
+        return llm_rerank(candidates, query, gpt_model, num_articles)
+    return [result["href"] for result in rank_results(results, query, top_k=num_articles)]
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from summarization import count_tokens
+
+# Per-model budgets (requests and tokens per minute) applied to each API key separately, since
+# every user brings their own key and quota. Opt-in, as quotas depend on the key's billing tier:
+# LLM_RATE_LIMITS='{"gemini-1.5-pro-latest": {"rpm": 2, "tpm": 32000}}'. Without an entry, only
+# adaptive concurrency and backoff on throttling apply.
+RATE_LIMITS = json.loads(os.environ.get("LLM_RATE_LIMITS", "{}"))
+
+# Completion tokens charged up front, since the answer length is unknown when the call starts
+EXPECTED_OUTPUT_TOKENS = int(os.environ.get("LLM_EXPECTED_OUTPUT_TOKENS", 1000))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 5))
+BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", 2))
+BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", 60))
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+MIN_CONCURRENCY = 1
+
+def is_throttled(error) -> bool:
+    """True for Gemini 429 / RESOURCE_EXHAUSTED / quota errors, whatever layer wrapped them."""
+    while error is not None:
+        message = f"{type(error).__name__} {error}"
+        if "ResourceExhausted" in message or "RESOURCE_EXHAUSTED" in message or "429" in message or "quota" in message.lower():
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+class TokenBucket:
+    """Refills at rate units per minute up to capacity; acquire blocks until enough units are available."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate / 60.0
+        self.capacity = capacity or rate
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        # A single request bigger than the whole bucket still goes through once the bucket is full
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                delay = (amount - self.available) / self.rate
+            time.sleep(delay)
+
+class AdaptiveConcurrency:
+    """AIMD limit on calls in flight: +1 after a window of successes, halved when throttled."""
+
+    def __init__(self, maximum=MAX_CONCURRENCY, minimum=MIN_CONCURRENCY):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            # Additive increase of about one slot per limit's worth of successful calls
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            self._condition.notify_all()
+
+    def on_throttled(self):
+        with self._condition:
+            self.limit = max(self.minimum, self.limit / 2)
+
+class ModelLimiter:
+    """Request budget, token budget and adaptive concurrency for one model under one API key."""
+
+    def __init__(self, model):
+        model = model.split("/")[-1]
+        limits = RATE_LIMITS.get(model, {})
+        self.model = model
+        self.requests = TokenBucket(limits["rpm"]) if limits.get("rpm") else None
+        self.tokens = TokenBucket(limits["tpm"]) if limits.get("tpm") else None
+        self.concurrency = AdaptiveConcurrency()
+        self.throttled = 0
+
+    def _backoff(self, attempt, error):
+        self.throttled += 1
+        self.concurrency.on_throttled()
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+        logging.warning(f"{self.model} throttled ({error}); retrying in {delay:.1f}s, concurrency limit {int(self.concurrency.limit)}")
+        time.sleep(delay)
+
+    def _admit(self, prompt_tokens):
+        if self.requests:
+            self.requests.acquire()
+        if self.tokens:
+            self.tokens.acquire(prompt_tokens + EXPECTED_OUTPUT_TOKENS)
+
+    def call(self, function: Callable, prompt_tokens: int):
+        for attempt in range(MAX_RETRIES + 1):
+            self._admit(prompt_tokens)
+            with self.concurrency.slot():
+                try:
+                    result = function()
+                except Exception as e:
+                    if not is_throttled(e) or attempt == MAX_RETRIES:
+                        raise
+                    error = e
+                else:
+                    self.concurrency.on_success()
+                    return result
+            self._backoff(attempt, error)
+
+    def stream(self, function: Callable[[], Iterator], prompt_tokens: int) -> Iterator:
+        """Like call, for streams; a throttled stream is retried only if it had not produced anything yet."""
+        for attempt in range(MAX_RETRIES + 1):
+            self._admit(prompt_tokens)
+            started = False
+            with self.concurrency.slot():
+                try:
+                    for chunk in function():
+                        started = True
+                        yield chunk
+                except Exception as e:
+                    if started or not is_throttled(e) or attempt == MAX_RETRIES:
+                        raise
+                    error = e
+                else:
+                    self.concurrency.on_success()
+                    return
+            self._backoff(attempt, error)
+
+_limiters: Dict[Tuple[str, str], ModelLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(model, api_key="") -> ModelLimiter:
+    """The limiter of model for this API key; users with different keys never wait on each other."""
+    model = model.split("/")[-1]
+    key = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), model)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = ModelLimiter(model)
+        return _limiters[key]
+
+def requests_per_minute(model) -> Optional[float]:
+    """The configured request budget of model for one key, or None when it is not limited."""
+    return RATE_LIMITS.get(model.split("/")[-1], {}).get("rpm")
+
+def prompt_tokens(messages) -> int:
+    return sum(count_tokens(message.content if isinstance(message.content, str) else str(message.content)) for message in messages)
@@ -0,0 +1,41 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Tuple
+from extraction import scrape_url
+from telemetry import in_context
+
+RETRIEVAL_DEADLINE = float(os.environ.get("RETRIEVAL_DEADLINE", 8))
+RETRIEVAL_MAX_WORKERS = int(os.environ.get("RETRIEVAL_MAX_WORKERS", 8))
+PASSAGE_MAX_CHARS = int(os.environ.get("RETRIEVAL_PASSAGE_MAX_CHARS", 3000))
+
+def retrieve_passages(urls, deadline=RETRIEVAL_DEADLINE, max_chars=PASSAGE_MAX_CHARS) -> List[Tuple[str, str]]:
+    """Fetch and extract all urls in parallel, keeping rank order.
+
+    Pages that fail, come back empty or are not done by the deadline are dropped,
+    so the added latency is about one page fetch.
+    """
+    if not urls:
+        return []
+    executor = ThreadPoolExecutor(max_workers=min(RETRIEVAL_MAX_WORKERS, len(urls)))
+    futures = [executor.submit(in_context(scrape_url), url, max_chars=max_chars) for url in urls]
+    done, not_done = wait(futures, timeout=deadline)
+    # Slow pages keep their thread until the HTTP read timeout, but nobody waits for them
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    passages = []
+    for url, future in zip(urls, futures):
+        if future not in done:
+            logging.info(f"Dropped {url}: not retrieved within {deadline}s")
+            continue
+        try:
+            text = future.result()
+        except Exception as e:
+            logging.warning(f"Dropped {url}: {str(e)}")
+            continue
+        if text:
+            passages.append((url, text))
+    return passages
+
+def format_passages(passages) -> str:
+    return "\n\n".join(f"SOURCE: {url}\n{text}" for url, text in passages)
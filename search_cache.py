@@ -0,0 +1,122 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import RatelimitException
+from telemetry import annotate, span
+
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 6 * 3600))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1000))
+THROTTLE_COOLDOWN = float(os.environ.get("SEARCH_THROTTLE_COOLDOWN", 30))
+
+class SearchCache:
+    """TTL cache in front of DDGS.text.
+
+    Concurrent identical searches share one in-flight call, and when DuckDuckGo
+    throttles us an expired entry is served while it is refreshed in the background.
+    """
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.coalesced = 0
+        self._entries: Dict[Tuple, Tuple[float, List[Dict]]] = {}
+        self._in_flight: Dict[Tuple, Future] = {}
+        self._throttled_until = 0.0
+        self._lock = threading.Lock()
+
+    def _run_search(self, key):
+        query, year, region, safesearch = key
+        results = DDGS().text(f"{query} {year}", region=region, safesearch=safesearch) or []
+        with self._lock:
+            self._entries[key] = (time.time(), results)
+            if len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+        return results
+
+    def _fetch(self, key) -> Tuple[Future, bool]:
+        """Start a search for key, or join the one already running."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+        return future, True
+
+    def _complete(self, key, future):
+        try:
+            future.set_result(self._run_search(key))
+        except RatelimitException as e:
+            with self._lock:
+                self._throttled_until = time.time() + THROTTLE_COOLDOWN
+            future.set_exception(e)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _refresh_in_background(self, key):
+        future, owner = self._fetch(key)
+        if owner:
+            delay = max(0.0, self._throttled_until - time.time())
+            timer = threading.Timer(delay, self._complete, args=(key, future))
+            timer.daemon = True
+            timer.start()
+
+    def search(self, query: str, year: int, region: Optional[str] = "wt-wt", safesearch: str = "moderate") -> List[Dict]:
+        key = (query, year, region, safesearch)
+        with self._lock:
+            entry = self._entries.get(key)
+            throttled = time.time() < self._throttled_until
+        if entry and time.time() - entry[0] < self.ttl:
+            self.hits += 1
+            annotate(cache_hit=True)
+            return entry[1]
+        if entry and throttled:
+            self.stale_served += 1
+            annotate(cache_hit=True, stale=True)
+            self._refresh_in_background(key)
+            return entry[1]
+
+        self.misses += 1
+        future, owner = self._fetch(key)
+        if owner:
+            self._complete(key, future)
+        try:
+            return future.result()
+        except RatelimitException:
+            if entry:
+                logging.warning(f"DuckDuckGo rate limit, serving cached results for '{query}'")
+                self.stale_served += 1
+                annotate(cache_hit=True, stale=True)
+                self._refresh_in_background(key)
+                return entry[1]
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+        }
+
+search_cache = SearchCache()
+
+def cached_search(query: str, year: int, region: Optional[str] = "wt-wt", safesearch: str = "moderate") -> List[Dict]:
+    with span("search", query=query) as current:
+        results = search_cache.search(query, year, region, safesearch)
+        current.set(results=len(results))
+        return results
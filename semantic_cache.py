@@ -0,0 +1,202 @@
+"""Near-duplicate tier in front of the generators.
+
+Short naming fields (FUZZY_FIELDS: industry, client type) are embedded locally with
+a hashing vectorizer over accent-folded words and character trigrams, so
+"Industrie plastique" and "industrie du plastique" land close together without any
+model or network call; they must also use the same words, articles aside, so
+"rural" never stands in for "urban". Every other text input (problem, solution,
+value proposition, ...) is a sentence whose meaning turns on word order and
+negation, which a bag of words cannot see, so it must match exactly once case,
+accents, punctuation, spacing and plurals are normalised. Exact inputs (language,
+model, counts, method, ...) must be identical. Entries are never shared across
+languages.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+from ranking import tokenize
+from telemetry import annotate
+
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", 7 * 24 * 3600))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 500))
+# Requests this many years apart still count as the same request
+SEMANTIC_YEAR_TOLERANCE = int(os.environ.get("SEMANTIC_YEAR_TOLERANCE", 1))
+VECTOR_DIMENSIONS = 2 ** 18
+
+# Minimum cosine similarity of every fuzzy text input. Canvases are built from the exact
+# wording of their inputs, so they need closer matches than research.
+DEFAULT_THRESHOLDS = {
+    "problems": 0.85,
+    "solutions:existing": 0.88,
+    "solutions:creative": 0.9,
+    "lean_canvas": 0.92,
+    "business_canvas:value_proposition": 0.9,
+    "business_canvas:business_model": 0.95,
+}
+THRESHOLDS = {**DEFAULT_THRESHOLDS, **json.loads(os.environ.get("SEMANTIC_THRESHOLDS", "{}"))}
+
+# Text inputs short enough for the fuzzy match; the others are compared after normalisation only
+FUZZY_FIELDS = {"industry_name", "type_client"}
+# Words a fuzzy field may gain or lose ("industrie du plastique"); negations are deliberately absent
+ARTICLES = set("a an the of and d de des du et l la le les un une".split())
+
+def _stem(word) -> str:
+    # Plural "s"/"x" is the most common difference between two wordings of the same input
+    return word[:-1] if len(word) > 3 and word[-1] in "sx" else word
+
+def _words(text) -> List[str]:
+    """Accent-folded, lowercased, singular words in order; nothing is dropped."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return [_stem(word) for word in re.findall(r"[a-z0-9]+", text)]
+
+def normalize_text(text) -> str:
+    return " ".join(_words(text))
+
+def content_words(text) -> Set[str]:
+    return set(_words(text)) - ARTICLES
+
+def embed(text) -> Dict[int, float]:
+    """L2-normalised sparse vector of hashed words and character trigrams (stopwords and accents removed)."""
+    words = [_stem(word) for word in tokenize(text)]
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    vector: Dict[int, float] = {}
+    for feature in features:
+        index = zlib.crc32(feature.encode("utf-8")) % VECTOR_DIMENSIONS
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {index: value / norm for index, value in vector.items()} if norm else {}
+
+def cosine(a, b) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+class SemanticMatch:
+    def __init__(self, result, similarity, text_inputs, year):
+        self.result = result
+        self.similarity = similarity
+        self.text_inputs = text_inputs
+        self.year = year
+
+    def describe(self) -> str:
+        return ", ".join(f"'{value}'" for value in self.text_inputs.values())
+
+class SemanticCache:
+    """In-process vector index per generator and exact-input key, with TTL and LRU eviction."""
+
+    def __init__(self, ttl=SEMANTIC_CACHE_TTL, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, "OrderedDict"] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, text_inputs, exact_inputs) -> str:
+        # Non-fuzzy text inputs are part of the key in normalised form
+        exact = {**exact_inputs, **{field: normalize_text(value) for field, value in text_inputs.items() if field not in FUZZY_FIELDS}}
+        return name + "\x1f" + json.dumps(exact, sort_keys=True, ensure_ascii=False, default=str)
+
+    def lookup(self, name, text_inputs, exact_inputs, year=None) -> Optional[SemanticMatch]:
+        threshold = THRESHOLDS.get(name, 0.9)
+        fuzzy = {field: value for field, value in text_inputs.items() if field in FUZZY_FIELDS}
+        vectors = {field: embed(value) for field, value in fuzzy.items()}
+        words = {field: content_words(value) for field, value in fuzzy.items()}
+        now = time.time()
+        best = None
+        with self._lock:
+            entries = self._entries.get(self._key(name, text_inputs, exact_inputs), OrderedDict())
+            for entry_id, entry in list(entries.items()):
+                if now - entry["created"] > self.ttl:
+                    del entries[entry_id]
+                    continue
+                if year is not None and entry["year"] is not None and abs(int(year) - int(entry["year"])) > SEMANTIC_YEAR_TOLERANCE:
+                    continue
+                # A word present in only one of the two inputs means they name different things
+                if any(words[field] != entry["words"].get(field) for field in words):
+                    continue
+                similarity = min((cosine(vectors[field], entry["vectors"].get(field, {})) for field in vectors), default=1.0)
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, entry_id, entry)
+            if best is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(best[1])
+            self.hits += 1
+        similarity, _, entry = best
+        return SemanticMatch(entry["result"], similarity, entry["text_inputs"], entry["year"])
+
+    def store(self, name, text_inputs, exact_inputs, result, year=None) -> None:
+        fuzzy = {field: value for field, value in text_inputs.items() if field in FUZZY_FIELDS}
+        entry = {
+            "vectors": {field: embed(value) for field, value in fuzzy.items()},
+            "words": {field: content_words(value) for field, value in fuzzy.items()},
+            "text_inputs": dict(text_inputs), "year": year, "result": result, "created": time.time(),
+        }
+        entry_id = json.dumps(text_inputs, sort_keys=True, ensure_ascii=False) + f"\x1f{year}"
+        with self._lock:
+            entries = self._entries.setdefault(self._key(name, text_inputs, exact_inputs), OrderedDict())
+            entries[entry_id] = entry
+            entries.move_to_end(entry_id)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = sum(len(entries) for entries in self._entries.values())
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+semantic_cache = SemanticCache()
+
+def semantic_completion(name, text_inputs, exact_inputs, generate: Callable[[], str], year=None, use_cache=True,
+                        on_reuse: Optional[Callable[[str, SemanticMatch], None]] = None) -> str:
+    """Return the result cached for near-identical inputs, or call generate() and store its result.
+
+    exact_inputs must include the language. on_reuse(name, match) is called when a cached result is served.
+    """
+    if not use_cache:
+        return generate()
+    match = semantic_cache.lookup(name, text_inputs, exact_inputs, year)
+    if match is not None:
+        annotate(semantic_hit=name, similarity=round(match.similarity, 3))
+        if on_reuse:
+            on_reuse(name, match)
+        return match.result
+    result = generate()
+    if result:
+        semantic_cache.store(name, text_inputs, exact_inputs, result, year)
+    return result
+
+def semantic_stream(name, text_inputs, exact_inputs, generate_chunks: Callable[[], Iterable[str]], year=None, use_cache=True,
+                    on_reuse: Optional[Callable[[str, SemanticMatch], None]] = None) -> Iterator[str]:
+    """Streaming counterpart of semantic_completion: a reused result is yielded as one chunk."""
+    match = semantic_cache.lookup(name, text_inputs, exact_inputs, year) if use_cache else None
+    if match is not None:
+        annotate(semantic_hit=name, similarity=round(match.similarity, 3))
+        if on_reuse:
+            on_reuse(name, match)
+        yield match.result
+        return
+    parts = []
+    for chunk in generate_chunks():
+        if chunk:
+            parts.append(chunk)
+            yield chunk
+    result = "".join(parts)
+    if use_cache and result:
+        semantic_cache.store(name, text_inputs, exact_inputs, result, year)
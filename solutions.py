@@ -1,15 +1,26 @@
+import os
+import time
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
+from assets import inject_css
+from model_factory import get_chat_model
+from rate_limit import get_limiter, requests_per_minute
 from tools import fetch_with_user_agent, scrape, search, find_relevant_articles, summarize
+from retrieval import retrieve_passages, format_passages
 from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+from llm_cache import cached_completion, cached_stream
+from telemetry import in_context
+from semantic_cache import semantic_completion, semantic_stream
 
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# Most problems solved at once in pipeline mode; fewer when the key's rate limits would only queue them (see fanout_concurrency)
+FANOUT_CONCURRENCY = int(os.environ.get("SOLUTIONS_FANOUT_CONCURRENCY", 5))
+# Each problem streams its existing and creative branches side by side
+CALLS_PER_PROBLEM = 2
 
 class Solutions:
-    def __init__(self, google_api_key, google_temperature, industry_name, problem_description, num_solutions, language, year, model, creative_method):
-        self.gpt_model = ChatGoogleGenerativeAI(api_key=google_api_key, model=model)
+    def __init__(self, google_api_key, google_temperature, industry_name, problem_description, num_solutions, language, year, model, creative_method, use_cache=True):
+        self.gpt_model = get_chat_model(google_api_key, model, google_temperature, role="synthesize")
         self.google_api_key = google_api_key
         self.google_temperature = google_temperature
         self.industry_name = industry_name
@@ -19,29 +30,78 @@ class Solutions:
         self.year = year
         self.model = model
         self.creative_method = creative_method
+        self.use_cache = use_cache
+        self.reused = {}
 
-    def call_google_chat(self, prompt):
-        response = self.gpt_model.invoke(prompt)
-        if response and response.content:
-            return response.content
-        else:
-            raise ValueError("Invalid response from Google API")
+    def call_google_chat(self, prompt, cache_prompt=None):
+        """prompt may be a function building it, called only on a cache miss; the answer is cached under cache_prompt."""
+        build = prompt if callable(prompt) else lambda: prompt
+
+        def generate():
+            response = self.gpt_model.invoke(build())
+            if response and response.content:
+                return response.content
+            else:
+                raise ValueError("Invalid response from Google API")
+        return cached_completion(generate, cache_prompt or prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def stream_google_chat(self, prompt, cache_prompt=None):
+        build = prompt if callable(prompt) else lambda: prompt
+
+        def generate_chunks():
+            streamed = False
+            for chunk in self.gpt_model.stream(build()):
+                if chunk.content:
+                    streamed = True
+                    yield chunk.content
+            if not streamed:
+                raise ValueError("Invalid response from Google API")
+        return cached_stream(generate_chunks, cache_prompt or prompt, self.gpt_model.model, self.google_temperature, self.language, use_cache=self.use_cache)
+
+    def _on_reuse(self, name, match):
+        self.reused[name] = match
 
-    def generate_existing_solutions(self):
+    def _semantic(self, name, generate, stream, year=None, **exact_inputs):
+        """Serve near-identical requests (same language, count and model) from the semantic cache."""
+        text_inputs = {"industry_name": self.industry_name, "problem_description": self.problem_description}
+        exact_inputs.update(num_solutions=int(self.num_solutions), language=self.language, model=self.gpt_model.model, temperature=float(self.google_temperature))
+        if stream:
+            return semantic_stream(name, text_inputs, exact_inputs, lambda: generate(stream=True), year=year, use_cache=self.use_cache, on_reuse=self._on_reuse)
+        return semantic_completion(name, text_inputs, exact_inputs, generate, year=year, use_cache=self.use_cache, on_reuse=self._on_reuse)
+
+    def generate_existing_solutions(self, stream=False):
+        return self._semantic("solutions:existing", self.research_existing_solutions, stream, year=self.year)
+
+    def generate_creative_solutions(self, stream=False):
+        return self._semantic("solutions:creative", self.create_solutions, stream, creative_method=self.creative_method)
+
+    def research_existing_solutions(self, stream=False):
         query = f"current solutions for the {self.problem_description} in the {self.industry_name} industry"
         search_results = search(query, self.year)
         urls = find_relevant_articles(search_results, query, self.gpt_model, self.num_solutions)
 
         # Build the prompt with URLs
         url_list = "\n".join(urls)
-        prompt = f"""
+
+        def prompt(passages):
+            return f"""
             You are an expert consultant in innovation specializing in applying the Lean Canvas. Your task is to identify {self.num_solutions} existing solutions to solve the following problem in the {self.industry_name} industry: {self.problem_description}. Please conduct your research using the following sources:
             {url_list}
+            Extracts from these sources:
+            {passages}
             Please respond only in the {self.language} language. Please present the results in a markdown table with three columns: 'Solution', 'Description', and 'Source'. Include the source URLs in the 'Source' column.
         """
-        return self.call_google_chat(prompt)
 
-    def generate_creative_solutions(self):
+        # Fetch the ranked pages in parallel so the model sees their content, not just the URLs. The answer is
+        # cached under the prompt without the extracts, so a cache hit fetches no page.
+        def prompt_with_passages():
+            return prompt(format_passages(retrieve_passages(urls)))
+
+        if stream:
+            return self.stream_google_chat(prompt_with_passages, cache_prompt=prompt(""))
+        return self.call_google_chat(prompt_with_passages, cache_prompt=prompt(""))
+
+    def create_solutions(self, stream=False):
         if self.creative_method == "Five Whys":
             prompt = f"""
                 Step into the role of an expert consultant in innovation. Pinpoint the initial problem within the {self.problem_description} in the {self.industry_name} industry, and continuously question 'why?' the problem exists, getting five layers deep to expose the fundamental reason. Document your findings and propose {self.num_solutions} actionable solutions. Please respond only in the {self.language} language. Present the results in a markdown table with four columns: 'Solution', 'Description', 'Unique Value Proposition', and 'Customer Segment'.
@@ -54,49 +114,143 @@ class Solutions:
             prompt = f"""
                 Embrace the mindset of an expert consultant in innovation. Apply the TRIZ framework to creatively address {self.problem_description} in the {self.industry_name} industry. Seek out and reconcile paradoxes, leveraging TRIZ's standards to formulate {self.num_solutions} breakthrough solutions. Detail your process and the application of TRIZ concepts in your strategy. Please respond only in the {self.language} language. Present the results in a markdown table with four columns: 'Solution', 'Description', 'Unique Value Proposition', and 'Customer Segment'.
             """
+        if stream:
+            return self.stream_google_chat(prompt)
         return self.call_google_chat(prompt)
 
-    def execute(self):
+    def execute_as_completed(self):
+        """Run both branches concurrently and yield (name, result) as each one finishes."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {
+                executor.submit(in_context(self.generate_existing_solutions)): "existing",
+                executor.submit(in_context(self.generate_creative_solutions)): "creative",
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def execute_stream(self):
+        """Stream both branches concurrently, yielding (name, text_so_far, done) as chunks arrive."""
+        events = queue.Queue()
+
+        def run(name, generate):
+            text = ""
+            try:
+                for chunk in generate(stream=True):
+                    text += chunk
+                    events.put((name, text, False, None))
+                events.put((name, text, True, None))
+            except Exception as e:
+                events.put((name, text, True, e))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(in_context(run), "existing", self.generate_existing_solutions)
+            executor.submit(in_context(run), "creative", self.generate_creative_solutions)
+            remaining = 2
+            while remaining:
+                name, text, done, error = events.get()
+                if error is not None:
+                    raise error
+                if done:
+                    remaining -= 1
+                yield name, text, done
+
+    def execute(self, parallel=True):
         try:
-            existing_solutions = self.generate_existing_solutions()
-            creative_solutions = self.generate_creative_solutions()
+            if parallel:
+                results = dict(self.execute_as_completed())
+                existing_solutions, creative_solutions = results["existing"], results["creative"]
+            else:
+                existing_solutions = self.generate_existing_solutions()
+                creative_solutions = self.generate_creative_solutions()
         except ValueError as e:
             st.error(f"Error generating solutions: {str(e)}")
             return None, None
 
         return existing_solutions, creative_solutions
 
+def fanout_concurrency(agents) -> int:
+    """Problems to solve at once: no more than the limiter of their key and model lets call the model together.
+
+    Problems started beyond the request budget or the adaptive concurrency limit would only wait in the
+    limiter, delaying the first finished problem without finishing the last one sooner.
+    """
+    if not agents:
+        return 1
+    model, api_key = agents[0].gpt_model.model, agents[0].google_api_key
+    workers = min(FANOUT_CONCURRENCY, len(agents), int(get_limiter(model, api_key).concurrency.limit) // CALLS_PER_PROBLEM)
+    rpm = requests_per_minute(model)
+    if rpm:
+        workers = min(workers, int(rpm) // CALLS_PER_PROBLEM)
+    return max(1, workers)
+
+def stream_solutions_for_problems(agents, max_workers=None):
+    """Run every agent's execute_stream concurrently, yielding (index, name, text, done, error) as chunks arrive.
+
+    name is None on the last event of an agent, whose error is the exception it failed with, if any;
+    a failing problem does not stop the others. max_workers defaults to fanout_concurrency(agents).
+    """
+    events = queue.Queue()
+
+    def run(index, agent):
+        error = None
+        try:
+            for name, text, done in agent.execute_stream():
+                events.put((index, name, text, done, None))
+        except Exception as e:
+            error = e
+        events.put((index, None, None, True, error))
+
+    if not agents:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers or fanout_concurrency(agents), len(agents))) as executor:
+        for index, agent in enumerate(agents):
+            executor.submit(in_context(run), index, agent)
+        remaining = len(agents)
+        while remaining:
+            event = events.get()
+            if event[1] is None:
+                remaining -= 1
+            yield event
+
 def localize_text(language):
     texts = {
         "English": {
             "title": "Solutions",
             "subtitle": "Generate solutions using AI",
             "input_details": "Enter the details below:",
+            "api_key": "Enter your Google API Key",
             "industry_name": "Industry:",
             "problem_description": "Problem Description:",
             "num_solutions": "Number of Solutions:",
             "creative_method": "Creative Method:",
             "submit": "Submit",
             "result": "Here are the generated solutions:",
-            "year": "Enter the research year:"
+            "year": "Enter the research year:",
+            "reused": "Reused the result generated for similar inputs ({inputs}, similarity {similarity:.0%}).",
+            "all_problems": "Solve every problem found on the Problems tab ({count})",
+            "progress": "{done} of {total} problems solved in {seconds:.0f}s"
         },
         "French": {
             "title": "Solutions",
             "subtitle": "Générez des solutions à l'aide de l'IA",
             "input_details": "Entrez les détails ci-dessous :",
+            "api_key": "Entrez votre clé API Google",
             "industry_name": "Industrie :",
             "problem_description": "Description du Problème :",
             "num_solutions": "Nombre de Solutions :",
             "creative_method": "Méthode créative :",
             "submit": "Soumettre",
             "result": "Voici les solutions générés :",
-            "year": "Entrez l'année de recherche :"
+            "year": "Entrez l'année de recherche :",
+            "reused": "Résultat réutilisé d'une demande similaire ({inputs}, similarité {similarity:.0%}).",
+            "all_problems": "Résoudre tous les problèmes trouvés dans l'onglet Problèmes ({count})",
+            "progress": "{done} problèmes sur {total} résolus en {seconds:.0f} s"
         }
     }
     return texts[language]
 
 def display_solutions(api_key, temperature, lang, model):
-    load_css('style.css')
+    inject_css('style.css')
 
     language = lang
     
@@ -129,32 +283,90 @@ def display_solutions(api_key, temperature, lang, model):
         st.markdown(f'<div class="css-hi6a2p">{lang_texts["creative_method"]}</div>', unsafe_allow_html=True)
         creative_method = st.selectbox("", ["Five Whys", "Scamper", "Triz"], key="creative_method_solutions", label_visibility="collapsed")
     
+    # Problems parsed from the last table generated on the Problems tab
+    problems_result = st.session_state.get("problems_result") or {}
+    found_problems = problems_result.get("problems", [])
+
     col7 = st.columns([1])
     with col7[0]:
+        all_problems = False
+        if found_problems:
+            all_problems = st.checkbox(lang_texts["all_problems"].format(count=len(found_problems)), key="all_problems_solutions")
         generate_button = st.button(lang_texts["submit"], key="submit_solutions")
 
-    if generate_button:
+    if generate_button and all_problems:
+        if not api_key:
+            # The industry and problems come from the Problems tab, so only the key can be missing
+            st.warning(lang_texts['api_key'])
+        else:
+            try:
+                # The problems were researched for the Problems tab's industry, whatever this tab's field says
+                display_all_problems(api_key, temperature, problems_result["industry_name"], found_problems, num_solutions, language, year, model, creative_method, lang_texts)
+            except Exception as e:
+                st.error(f"Une erreur est survenue lors de la génération des solutions pour l'industrie '{problems_result['industry_name']}' : {str(e)}")
+    elif generate_button:
         if not api_key or not industry_name or not problem_description:
-            st.warning(f"{lang_texts['industry_name']}, et {lang_texts['problem_description']}")
+            st.warning(f"{lang_texts['api_key']}, {lang_texts['industry_name']} et {lang_texts['problem_description']}")
         else:
             try:
                 with st.spinner(lang_texts["result"]):
                     agent = Solutions(api_key, temperature, industry_name, problem_description, num_solutions, language, year, model, creative_method)
-                    existing_solutions, creative_solutions = agent.execute()
-
-                    if existing_solutions is None or creative_solutions is None:
-                        st.error("Problèmes générés ne sont pas sous forme de texte.")
-                    else:
-                        # Display existing solutions
-                        st.markdown("### Existing Solutions")
-                        st.markdown(existing_solutions)
-
-                        # Display creative solutions
-                        st.markdown("### Creative Solutions")
-                        st.markdown(creative_solutions)
-                    
+
+                    # Reserve both sections so each one renders in place as soon as it is ready
+                    existing_placeholder = st.empty()
+                    creative_placeholder = st.empty()
+                    placeholders = {
+                        "existing": (existing_placeholder, "### Existing Solutions"),
+                        "creative": (creative_placeholder, "### Creative Solutions"),
+                    }
+                    try:
+                        for name, text, done in agent.execute_stream():
+                            placeholder, heading = placeholders[name]
+                            placeholder.markdown(f"{heading}\n\n{text}")
+                    except ValueError as e:
+                        st.error(f"Error generating solutions: {str(e)}")
+
+                    for match in agent.reused.values():
+                        st.caption(lang_texts["reused"].format(inputs=match.describe(), similarity=match.similarity))
                     st.markdown("<br><br><br>", unsafe_allow_html=True)
                 
             except Exception as e:
                 st.error(f"Une erreur est survenue lors de la génération des solutions pour l'industrie '{industry_name}' avec {num_solutions} solutions : {str(e)}")
 
+def problem_description(problem) -> str:
+    """A parsed problems row as the problem description a user would type: the problem, then its description."""
+    if problem.get("description"):
+        return f"{problem['problem']} — {problem['description']}"
+    return problem["problem"]
+
+def display_all_problems(api_key, temperature, industry_name, problems, num_solutions, language, year, model, creative_method, lang_texts):
+    """Solve every problem concurrently, filling one section per problem as its results stream in."""
+    agents = [
+        Solutions(api_key, temperature, industry_name, problem_description(problem), num_solutions, language, year, model, creative_method)
+        for problem in problems
+    ]
+    progress = st.empty()
+    placeholders = []
+    for index, problem in enumerate(problems, start=1):
+        st.markdown(f"### {index}. {problem['problem']}")
+        if problem.get("description"):
+            st.caption(problem["description"])
+        placeholders.append({"existing": (st.empty(), "#### Existing Solutions"), "creative": (st.empty(), "#### Creative Solutions"), "status": st.empty()})
+
+    started = time.perf_counter()
+    done = 0
+    progress.caption(lang_texts["progress"].format(done=done, total=len(agents), seconds=0))
+    for index, name, text, _, error in stream_solutions_for_problems(agents):
+        if name is not None:
+            placeholder, heading = placeholders[index][name]
+            placeholder.markdown(f"{heading}\n\n{text}")
+            continue
+        done += 1
+        progress.caption(lang_texts["progress"].format(done=done, total=len(agents), seconds=time.perf_counter() - started))
+        if error is not None:
+            placeholders[index]["status"].error(f"Error generating solutions: {str(error)}")
+        elif agents[index].reused:
+            with placeholders[index]["status"].container():
+                for match in agents[index].reused.values():
+                    st.caption(lang_texts["reused"].format(inputs=match.describe(), similarity=match.similarity))
+    st.markdown("<br><br><br>", unsafe_allow_html=True)
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from telemetry import annotate, in_context, traced
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 1500))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("SUMMARY_CHUNK_OVERLAP_TOKENS", 50))
+STUFF_MAX_TOKENS = int(os.environ.get("SUMMARY_STUFF_MAX_TOKENS", 6000))
+# Refine makes one serial call per chunk, while map-reduce maps the chunks concurrently and adds one
+# call for the post, so refine is only as fast up to 2 chunks. Documents over STUFF_MAX_TOKENS have
+# more chunks than that with the defaults, so they are map-reduced; strategy="refine" still forces it.
+REFINE_MAX_CHUNKS = int(os.environ.get("SUMMARY_REFINE_MAX_CHUNKS", 2))
+MAP_CONCURRENCY = int(os.environ.get("SUMMARY_MAP_CONCURRENCY", 4))
+MAX_COLLAPSE_ROUNDS = 3
+
+POST_TEMPLATES = {
+    "French": """
+        Écrire un post détaillé sur le sujet "{query}" en incluant le lien trouvé comme référence dans l'article.
+        {texts}
+        LIEN:
+        {url}
+        POST DÉTAILLÉ :
+        """,
+    "English": """
+        Write a detailed post on the topic "{query}" including the link found as a reference within the article.
+        {texts}
+        LINK:
+        {url}
+        DETAILED POST:
+        """,
+}
+
+MAP_TEMPLATES = {
+    "French": """
+        Résumer le passage suivant en conservant les faits, chiffres et noms utiles pour le sujet "{query}".
+        {texts}
+        RÉSUMÉ :
+        """,
+    "English": """
+        Summarize the following passage, keeping the facts, figures and names relevant to the topic "{query}".
+        {texts}
+        SUMMARY:
+        """,
+}
+
+REFINE_TEMPLATES = {
+    "French": """
+        Voici un post existant sur le sujet "{query}" (lien de référence : {url}) :
+        {existing}
+        Améliorer ce post avec le contexte supplémentaire ci-dessous, seulement s'il est utile.
+        {texts}
+        POST DÉTAILLÉ :
+        """,
+    "English": """
+        Here is an existing post on the topic "{query}" (reference link: {url}):
+        {existing}
+        Refine the post with the additional context below, only if it is useful.
+        {texts}
+        DETAILED POST:
+        """,
+}
+
+def count_tokens(text):
+    """Token count for budgeting; cl100k_base approximates Gemini's tokenizer closely enough."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+def split_text(document_text, chunk_tokens=CHUNK_TOKENS):
+    text_splitter = RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", ". ", " "],
+        chunk_size=chunk_tokens,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        length_function=count_tokens,
+    )
+    return text_splitter.split_text(document_text)
+
+def choose_strategy(total_tokens, num_chunks):
+    if total_tokens <= STUFF_MAX_TOKENS:
+        return "stuff"
+    if num_chunks <= REFINE_MAX_CHUNKS:
+        return "refine"
+    return "map_reduce"
+
+def _chain(templates, language, gpt_model):
+    template = templates.get(language, templates["English"])
+    return LLMChain(prompt=PromptTemplate.from_template(template), llm=gpt_model)
+
+def _map(chunks, gpt_model, language, query):
+    map_chain = _chain(MAP_TEMPLATES, language, gpt_model)
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as executor:
+        return list(executor.map(in_context(lambda chunk: map_chain.run(texts=chunk, query=query)), chunks))
+
+@traced("summarize")
+def summarize_document(document_text, gpt_model, language, url, query, strategy=None):
+    """Summarize a page into a post, picking stuff, refine or map-reduce from its token size."""
+    chunks = split_text(document_text)
+    if not chunks:
+        return ""
+    total_tokens = count_tokens(document_text)
+    strategy = strategy or choose_strategy(total_tokens, len(chunks))
+    annotate(strategy=strategy, document_tokens=total_tokens, chunks=len(chunks))
+    post_chain = _chain(POST_TEMPLATES, language, gpt_model)
+
+    if strategy == "stuff":
+        return post_chain.run(texts=document_text, query=query, url=url)
+
+    if strategy == "refine":
+        refine_chain = _chain(REFINE_TEMPLATES, language, gpt_model)
+        post = post_chain.run(texts=chunks[0], query=query, url=url)
+        for chunk in chunks[1:]:
+            post = refine_chain.run(existing=post, texts=chunk, query=query, url=url)
+        return post
+
+    # map_reduce: summarize chunks concurrently, collapsing again until the summaries fit one prompt
+    summaries = _map(chunks, gpt_model, language, query)
+    combined = "\n\n".join(summaries)
+    for _ in range(MAX_COLLAPSE_ROUNDS):
+        if count_tokens(combined) <= STUFF_MAX_TOKENS or len(summaries) <= 1:
+            break
+        summaries = _map(split_text(combined), gpt_model, language, query)
+        combined = "\n\n".join(summaries)
+    return post_chain.run(texts=combined, query=query, url=url)
@@ -0,0 +1,286 @@
+"""Spans and counters for the stages of a request (search, ranking, fetch, scrape, LLM calls, crew tasks).
+
+Finished spans are appended to a JSONL trace file, aggregated into counters that
+render_prometheus() exposes in the Prometheus text format, and collected per trace
+so the sidebar can show where the last request spent its time.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Set TRACE_PATH to an empty string to stop writing the trace file
+TRACE_PATH = os.environ.get("TRACE_PATH", os.path.join(".cache", "traces.jsonl"))
+TRACE_MAX_BYTES = int(os.environ.get("TRACE_MAX_BYTES", 20_000_000))
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Span attributes that are summed per stage
+SUMMED_ATTRIBUTES = ("tokens_in", "tokens_out", "bytes")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class Span:
+    def __init__(self, name, trace, parent_id, attributes):
+        self.name = name
+        self.trace = trace
+        self.trace_id = trace.trace_id if trace else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+            "start": round(self.start, 6), "duration": round(self.duration, 6), "error": self.error, **self.attributes,
+        }
+
+class Trace:
+    """The spans of one request, e.g. one page render or one background job."""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.start = time.time()
+        self.duration = None
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> List[Dict]:
+        """Per stage: calls, summed seconds, tokens, bytes, cache hits and errors."""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span.name, {"stage": span.name, "calls": 0, "seconds": 0.0, "cache_hits": 0, "errors": 0,
+                                                  **{name: 0 for name in SUMMED_ATTRIBUTES}})
+            stage["calls"] += 1
+            stage["seconds"] += span.duration
+            stage["cache_hits"] += 1 if span.attributes.get("cache_hit") else 0
+            stage["errors"] += 1 if span.error else 0
+            for name in SUMMED_ATTRIBUTES:
+                stage[name] += span.attributes.get(name) or 0
+        return sorted(stages.values(), key=lambda stage: -stage["seconds"])
+
+class Metrics:
+    """Process-wide counters and latency histograms per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict] = {}
+
+    def record(self, span):
+        with self._lock:
+            stage = self._stages.setdefault(span.name, {
+                "calls": 0, "errors": 0, "cache_hits": 0, "seconds": 0.0,
+                "buckets": [0] * len(LATENCY_BUCKETS), **{name: 0 for name in SUMMED_ATTRIBUTES},
+            })
+            stage["calls"] += 1
+            stage["errors"] += 1 if span.error else 0
+            stage["cache_hits"] += 1 if span.attributes.get("cache_hit") else 0
+            stage["seconds"] += span.duration
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if span.duration <= bound:
+                    stage["buckets"][index] += 1
+            for name in SUMMED_ATTRIBUTES:
+                stage[name] += span.attributes.get(name) or 0
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            stages = {name: dict(stage, buckets=list(stage["buckets"])) for name, stage in self._stages.items()}
+        lines = []
+
+        def family(metric, kind, help_text, samples):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(samples)
+
+        family("app_stage_calls_total", "counter", "Calls per stage.",
+               [f'app_stage_calls_total{{stage="{name}"}} {stage["calls"]}' for name, stage in stages.items()])
+        family("app_stage_errors_total", "counter", "Failed calls per stage.",
+               [f'app_stage_errors_total{{stage="{name}"}} {stage["errors"]}' for name, stage in stages.items()])
+        family("app_stage_cache_hits_total", "counter", "Calls answered from a cache.",
+               [f'app_stage_cache_hits_total{{stage="{name}"}} {stage["cache_hits"]}' for name, stage in stages.items()])
+        family("app_stage_tokens_total", "counter", "LLM tokens per stage and direction.",
+               [f'app_stage_tokens_total{{stage="{name}",direction="{direction}"}} {stage["tokens_" + direction]}'
+                for name, stage in stages.items() for direction in ("in", "out") if stage["tokens_" + direction]])
+        family("app_stage_bytes_total", "counter", "Bytes fetched per stage.",
+               [f'app_stage_bytes_total{{stage="{name}"}} {stage["bytes"]}' for name, stage in stages.items() if stage["bytes"]])
+        samples = []
+        for name, stage in stages.items():
+            for bound, count in zip(LATENCY_BUCKETS, stage["buckets"]):
+                samples.append(f'app_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            samples.append(f'app_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stage["calls"]}')
+            samples.append(f'app_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6f}')
+            samples.append(f'app_stage_seconds_count{{stage="{name}"}} {stage["calls"]}')
+        family("app_stage_seconds", "histogram", "Stage latency in seconds.", samples)
+        return "\n".join(lines) + "\n"
+
+class TraceWriter:
+    """Appends finished spans to the JSONL trace file, rotating it to .1 once it is too big."""
+
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, span):
+        if not self.path:
+            return
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+                if self._file.tell() > self.max_bytes:
+                    self._file.close()
+                    os.replace(self.path, self.path + ".1")
+                    self._file = None
+            except OSError as e:
+                logging.warning(f"Could not write trace: {str(e)}")
+
+metrics = Metrics()
+writer = TraceWriter()
+
+def _finish(span):
+    if span.trace is not None:
+        span.trace.add(span)
+    metrics.record(span)
+    writer.write(span)
+
+@contextmanager
+def span(name, **attributes):
+    """Time a stage; set attributes on the yielded span (or with annotate) while it runs."""
+    parent = _current_span.get()
+    current = Span(name, _current_trace.get(), parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A generator closed from another context; nothing to restore there
+            pass
+        _finish(current)
+
+@contextmanager
+def stream_span(name, **attributes):
+    """span for the body of a generator.
+
+    The span is not made the current one: the consumer's code runs between chunks, in the
+    same context, and would otherwise open its spans under it, and an abandoned generator
+    would leave it current. Set attributes on the yielded span directly. The span ends when
+    the generator is exhausted, closed or collected; a stream closed early is marked abandoned.
+    """
+    parent = _current_span.get()
+    current = Span(name, _current_trace.get(), parent.span_id if parent else None, attributes)
+    started = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        current.set(abandoned=True)
+        raise
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _finish(current)
+
+def traced(name):
+    """Decorator form of span."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**attributes):
+    """Set attributes on the innermost open span, if any (e.g. cache_hit=True from deep inside a cache)."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+@contextmanager
+def trace(name):
+    """Collect the spans of one request; the yielded Trace has a breakdown() once the block ends."""
+    current = Trace(name)
+    token = _current_trace.set(current)
+    span_token = _current_span.set(None)
+    try:
+        yield current
+    finally:
+        current.duration = time.time() - current.start
+        _current_span.reset(span_token)
+        _current_trace.reset(token)
+
+def in_context(function):
+    """Bind function to the caller's context, so spans it opens in a worker thread join the caller's trace."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call runs in its own copy
+        return context.copy().run(function, *args, **kwargs)
+    return wrapper
+
+def render_prometheus() -> str:
+    return metrics.render_prometheus()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on host:port from a daemon thread; later calls are no-ops."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+        return _server
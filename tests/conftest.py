@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import types
+
+# Modules read their settings at import time: keep tests from writing traces or caches into the checkout
+SCRATCH_DIR = tempfile.mkdtemp(prefix="tests-")
+os.environ.setdefault("TRACE_PATH", "")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(SCRATCH_DIR, "llm_cache.sqlite3"))
+os.environ.setdefault("HTTP_CACHE_DIR", os.path.join(SCRATCH_DIR, "http"))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import duckduckgo_search  # noqa: F401
+except ImportError:
+    # The benchmarks' offline stand-in for DDGS, so the page modules import; tests never search
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    import fakes
+    fakes.install_fake_search()
+
+def _install_fake_crewai():
+    """Register the few crewai names crew_runner imports; the tests replace run_task, so no crew ever runs."""
+    class Process:
+        sequential = "sequential"
+        hierarchical = "hierarchical"
+
+    class Crew:
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+        def kickoff(self):
+            raise RuntimeError("crewai is not installed")
+
+    class TaskOutput:
+        def __init__(self, description, raw, agent):
+            self.description, self.raw, self.agent = description, raw, agent
+
+        def __str__(self):
+            return self.raw
+
+    crewai = types.ModuleType("crewai")
+    crewai.Crew, crewai.Process = Crew, Process
+    tasks = types.ModuleType("crewai.tasks")
+    task_output = types.ModuleType("crewai.tasks.task_output")
+    task_output.TaskOutput = TaskOutput
+    crewai.tasks, tasks.task_output = tasks, task_output
+    sys.modules.update({"crewai": crewai, "crewai.tasks": tasks, "crewai.tasks.task_output": task_output})
+
+try:
+    import crewai  # noqa: F401
+except ImportError:
+    _install_fake_crewai()
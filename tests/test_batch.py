@@ -0,0 +1,137 @@
+import json
+import sys
+import types
+import pytest
+import batch
+from batch import RateLimiter, completed_ids, is_transient, read_items, run_batch, run_item
+
+class ResourceExhausted(Exception):
+    pass
+
+class FakeGenerator:
+    # Per industry_name, the errors to raise before answering
+    failures = {}
+    calls = []
+
+    def __init__(self, google_api_key, industry_name, language, model, google_temperature):
+        self.industry_name = industry_name
+        self.reused = {}
+
+    def execute(self):
+        FakeGenerator.calls.append(self.industry_name)
+        failures = FakeGenerator.failures.get(self.industry_name, [])
+        if failures:
+            raise failures.pop(0)
+        return f"answer for {self.industry_name}"
+
+@pytest.fixture(autouse=True)
+def fake_kind(monkeypatch):
+    module = types.ModuleType("fake_generators")
+    module.FakeGenerator = FakeGenerator
+    monkeypatch.setitem(sys.modules, "fake_generators", module)
+    monkeypatch.setitem(batch.KINDS, "fake", ("fake_generators", "FakeGenerator", {"industry_name": None},
+                                              lambda generator: {"answer": generator.execute()}))
+    monkeypatch.setattr(batch.time, "sleep", lambda seconds: None)
+    FakeGenerator.failures = {}
+    FakeGenerator.calls = []
+
+def item(industry_name=None, **fields):
+    row = {"kind": "fake", **({"industry_name": industry_name} if industry_name else {}), **fields}
+    return {**row, "id": batch.item_id(row)}
+
+def test_rate_limiter_spaces_starts(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr(batch.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(batch.time, "sleep", sleeps.append)
+    limiter = RateLimiter(rate=30)
+    for _ in range(3):
+        limiter.wait()
+    assert sleeps == [2.0, 4.0]
+
+def test_rate_limiter_without_a_rate_never_waits(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(batch.time, "sleep", sleeps.append)
+    limiter = RateLimiter(rate=0)
+    for _ in range(5):
+        limiter.wait()
+    assert sleeps == []
+
+@pytest.mark.parametrize("error", [
+    ResourceExhausted("429 quota exceeded"), TimeoutError("timed out"), ConnectionResetError("reset"),
+    batch.NoResult("nothing"), type("DeadlineExceeded", (Exception,), {})("504"),
+])
+def test_transient_errors(error):
+    assert is_transient(error)
+
+def test_wrapped_transient_errors_are_transient():
+    try:
+        try:
+            raise TimeoutError("read timed out")
+        except TimeoutError as e:
+            raise RuntimeError("the agent failed") from e
+    except RuntimeError as e:
+        assert is_transient(e)
+
+@pytest.mark.parametrize("error", [ValueError("Missing field 'industry_name'"), KeyError("kind"), TypeError("bad argument")])
+def test_input_errors_are_not_transient(error):
+    assert not is_transient(error)
+
+def test_transient_failures_are_retried():
+    FakeGenerator.failures = {"Bijouteries": [ResourceExhausted("429"), TimeoutError("timed out")]}
+    record = run_item("key", item("Bijouteries"), RateLimiter(0), retries=3, backoff=1)
+    assert record["status"] == "ok"
+    assert record["attempts"] == 3
+    assert record["output"] == {"answer": "answer for Bijouteries", "reused": []}
+    assert record["error"] is None
+
+def test_retries_are_bounded():
+    FakeGenerator.failures = {"Bijouteries": [TimeoutError("timed out")] * 5}
+    record = run_item("key", item("Bijouteries"), RateLimiter(0), retries=2, backoff=1)
+    assert record["status"] == "failed"
+    assert record["attempts"] == 3
+    assert record["error"] == "timed out"
+
+def test_input_errors_fail_at_once(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(batch.time, "sleep", sleeps.append)
+    record = run_item("key", item(), RateLimiter(0), retries=3, backoff=1)
+    assert record["status"] == "failed"
+    assert record["attempts"] == 1
+    assert "Missing field 'industry_name'" in record["error"]
+    assert sleeps == []
+    assert FakeGenerator.calls == []
+
+def test_non_transient_generator_errors_fail_at_once():
+    FakeGenerator.failures = {"Bijouteries": [ValueError("Invalid argument")]}
+    record = run_item("key", item("Bijouteries"), RateLimiter(0), retries=3, backoff=1)
+    assert record["status"] == "failed"
+    assert record["attempts"] == 1
+    assert FakeGenerator.calls == ["Bijouteries"]
+
+def test_batch_output_resumes(tmp_path):
+    FakeGenerator.failures = {"Cafés": [ValueError("Invalid argument")]}
+    items = [item("Bijouteries"), item("Cafés"), item("Librairies")]
+    output_path = str(tmp_path / "out.jsonl")
+    records = run_batch("key", items, output_path, workers=2, rate=0, retries=1, backoff=1)
+    assert len(records) == 3
+    with open(output_path, encoding="utf-8") as f:
+        written = [json.loads(line) for line in f]
+    assert sorted(record["id"] for record in written) == sorted(row["id"] for row in items)
+    assert {record["input"]["industry_name"]: record["status"] for record in written} == {
+        "Bijouteries": "ok", "Cafés": "failed", "Librairies": "ok",
+    }
+    # A cut-off last line is ignored and only successful items count as done
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "cut')
+    assert completed_ids(output_path) == {items[0]["id"], items[2]["id"]}
+
+def test_read_items(tmp_path):
+    path = tmp_path / "items.csv"
+    path.write_text("kind,industry_name,problem_description\nlean_canvas,Bijouteries,Clients hesitate\n,Cafés,\n", encoding="utf-8")
+    rows = read_items(str(path), default_kind="problems")
+    assert [row["kind"] for row in rows] == ["lean_canvas", "problems"]
+    assert "problem_description" not in rows[1]
+    assert rows[0]["id"] == batch.item_id({"kind": "lean_canvas", "industry_name": "Bijouteries", "problem_description": "Clients hesitate"})
+    with pytest.raises(ValueError):
+        read_items(str(path))
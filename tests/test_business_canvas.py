@@ -0,0 +1,48 @@
+import business_canvas
+from business_canvas import BusinessCanvas
+
+VALUE_PROPOSITION = """| Section | Content |
+|---|---|
+| Customer Jobs | * Buy a gift * Invest in rare pieces |
+| Pains | * Opaque prices * Doubts about authenticity |
+| Gains | * A unique piece |
+| Products & Services | * Certified rare jewels |
+| Pain Relievers | * Posted prices * Certificates of authenticity |
+| Gain Creators | * Free engraving |
+"""
+
+class NoModel:
+    model = "no-model"
+
+def agent(monkeypatch):
+    monkeypatch.setattr(business_canvas, "get_chat_model", lambda api_key, model, temperature, role=None: NoModel())
+    return BusinessCanvas("key", 0.7, "Bijouteries", "Vente des bijoux rares", "Consommateurs aisés", "English")
+
+def test_condensed_value_proposition_is_handed_off(monkeypatch):
+    canvas = agent(monkeypatch)
+    # The table as generate_value_proposition_canvas returns it
+    handoff = canvas.condense_value_proposition(canvas.format_markdown_table(VALUE_PROPOSITION))
+    assert handoff.splitlines() == [
+        "Customer Jobs: Buy a gift; Invest in rare pieces",
+        "Pains: Opaque prices; Doubts about authenticity",
+        "Gains: A unique piece",
+        "Products & Services: Certified rare jewels",
+        "Pain Relievers: Posted prices; Certificates of authenticity",
+        "Gain Creators: Free engraving",
+    ]
+    assert canvas.value_proposition.is_complete()
+    assert canvas.handoff_tokens["after"] < canvas.handoff_tokens["before"]
+    assert canvas.handoff_tokens["saved_percent"] > 0
+
+def test_unparsed_value_proposition_is_handed_off_whole(monkeypatch):
+    canvas = agent(monkeypatch)
+    text = "Customer Jobs: buy a gift.<br>The rest of the answer\nis plain   prose."
+    handoff = canvas.condense_value_proposition(text)
+    assert canvas.value_proposition.found() < business_canvas.MIN_HANDOFF_SECTIONS
+    assert handoff == "Customer Jobs: buy a gift. The rest of the answer is plain prose."
+    assert canvas.handoff_tokens["saved_percent"] >= 0
+
+def test_empty_value_proposition(monkeypatch):
+    canvas = agent(monkeypatch)
+    assert canvas.condense_value_proposition("") == ""
+    assert canvas.handoff_tokens == {"before": 0, "after": 0, "saved_percent": 0}
@@ -0,0 +1,151 @@
+import pytest
+from canvases import LeanCanvasSections, ValuePropositionCanvas, parse_markdown_tables, parse_problems, split_items
+
+FRENCH = """Voici les problèmes :
+
+| Problème | Description | Impact |
+|---|---|---|
+| **Délais de moules** | Les moules prennent des semaines | Élevé |
+| Pénurie de régleurs | Départs à la retraite | Moyen |
+"""
+
+ENGLISH = """| # | Problems | Description | Impact |
+|:--|:--|:--|:--|
+| 1 | Mould lead times | Moulds take weeks<br>to build | High |
+"""
+
+UNKNOWN_HEADERS = """| Enjeu | Détail |
+| --- | --- |
+| Délais de moules | Les moules prennent des semaines |
+"""
+
+def test_french_headers():
+    assert parse_problems(FRENCH) == [
+        {"problem": "Délais de moules", "description": "Les moules prennent des semaines", "impact": "Élevé"},
+        {"problem": "Pénurie de régleurs", "description": "Départs à la retraite", "impact": "Moyen"},
+    ]
+
+def test_english_headers_in_any_column_order():
+    assert parse_problems(ENGLISH) == [{"problem": "Mould lead times", "description": "Moulds take weeks to build", "impact": "High"}]
+
+def test_unknown_headers_use_the_first_columns():
+    assert parse_problems(UNKNOWN_HEADERS) == [{"problem": "Délais de moules", "description": "Les moules prennent des semaines", "impact": ""}]
+
+@pytest.mark.parametrize("text", ["", "No table in this answer.", "| Problème |\n|---|\n"])
+def test_no_problems(text):
+    assert parse_problems(text) == []
+
+def test_tables_are_split_and_separators_dropped():
+    tables = parse_markdown_tables(FRENCH + "\nTexte\n\n" + ENGLISH)
+    assert len(tables) == 2
+    assert tables[0][0] == ["Problème", "Description", "Impact"]
+    assert len(tables[1]) == 2
+
+def test_split_items():
+    assert split_items("- Moules<br>- Presses") == ["Moules", "Presses"]
+    assert split_items("1. Moules 2. Presses") == ["Moules", "Presses"]
+
+FRENCH_TITLES = {
+    "customer_segments": "Segments de clientèle", "value_propositions": "Propositions de valeur", "channels": "Canaux",
+    "revenue_streams": "Flux de revenus", "cost_structure": "Structure des coûts", "key_metrics": "Indicateurs clés",
+    "competitive_advantages": "Avantages concurrentiels",
+}
+
+LEAN_ROWS = """| Élément | Description |
+|---|---|
+| Segments de clientèle | * Mouleurs<br>* Équipementiers |
+| Proposition de valeur | Moules livrés en 48 h |
+| Canaux | Salons professionnels |
+| Flux de revenus | Abonnement |
+| Structure des coûts | Imprimantes 3D |
+| Indicateurs clés | Délai moyen |
+| Avantage concurrentiel | Brevet |
+"""
+
+LEAN_COLUMNS = """| Canaux | Segments de clientèle | Propositions de valeur | Flux de revenus | Structure des coûts | Indicateurs clés | Avantages concurrentiels |
+|---|---|---|---|---|---|---|
+| Salons | Mouleurs | Moules en 48 h | Abonnement | Imprimantes | Délai | Brevet |
+"""
+
+def test_rows_are_rendered_again_with_the_model_header_and_localized_titles():
+    canvas = LeanCanvasSections.parse(LEAN_ROWS)
+    markdown = canvas.to_markdown(FRENCH_TITLES, ["Section", "Contenu"])
+    lines = markdown.splitlines()
+    assert lines[0] == "| Élément | Description |"
+    assert lines[2] == "| Segments de clientèle | * Mouleurs<br>* Équipementiers |"
+    assert "Customer" not in markdown
+    assert LeanCanvasSections.parse(markdown).to_dict() == canvas.to_dict()
+
+def test_columns_keep_their_order_after_a_section_is_replaced():
+    canvas = LeanCanvasSections.parse(LEAN_COLUMNS)
+    updated = LeanCanvasSections.from_dict({**canvas.to_dict(), "channels": ["Distributeurs"]}, canvas.layout)
+    lines = updated.to_markdown(FRENCH_TITLES).splitlines()
+    assert lines[0].startswith("| Canaux | Segments de clientèle |")
+    assert len(lines) == 3
+    assert lines[2].startswith("| * Distributeurs | * Mouleurs |")
+    assert LeanCanvasSections.parse("\n".join(lines)).to_dict() == updated.to_dict()
+
+def test_without_a_known_layout_the_given_header_is_used():
+    canvas = LeanCanvasSections({"channels": ["Salons"]})
+    assert canvas.to_markdown(FRENCH_TITLES, ["Section", "Contenu"]).splitlines()[0] == "| Section | Contenu |"
+
+VALUE_PROPOSITION_ROWS = """Voici le canvas :
+
+| Section | Contenu |
+|---|---|
+| **Tâches du client** | * Offrir un cadeau<br>* Investir |
+| Douleurs | Prix opaques |
+| Bénéfices attendus | Pièce unique |
+| Produits et services | Bijoux certifiés |
+| Soulageurs de douleurs | Prix affichés |
+| Créateurs de gains | Gravure offerte |
+"""
+
+VALUE_PROPOSITION_COLUMNS = """| Customer Jobs | Pains | Gains | Products & Services | Pain Relievers | Gain Creators |
+|---|---|---|---|---|---|
+| Buy a gift | Opaque prices | Unique piece | Certified jewels | Posted prices | Free engraving |
+| Invest | | | | | |
+"""
+
+def test_value_proposition_rows_with_french_titles():
+    canvas = ValuePropositionCanvas.parse(VALUE_PROPOSITION_ROWS)
+    assert canvas.is_complete()
+    assert canvas.items["customer_jobs"] == ["Offrir un cadeau", "Investir"]
+    assert canvas.items["pain_relievers"] == ["Prix affichés"]
+    assert canvas.layout == {"columns": False, "order": ValuePropositionCanvas.keys(), "header": ["Section", "Contenu"]}
+
+def test_value_proposition_columns():
+    canvas = ValuePropositionCanvas.parse(VALUE_PROPOSITION_COLUMNS)
+    assert canvas.is_complete()
+    assert canvas.items["customer_jobs"] == ["Buy a gift", "Invest"]
+    assert canvas.items["gain_creators"] == ["Free engraving"]
+    assert canvas.layout["columns"]
+    assert ValuePropositionCanvas.parse(canvas.to_markdown()).to_dict() == canvas.to_dict()
+
+def test_value_proposition_headings_fallback():
+    canvas = ValuePropositionCanvas.parse("## Customer Jobs\n- Buy a gift\n**Pains**: Opaque prices\nGains:\n- Unique piece\n")
+    assert canvas.to_dict() == {
+        "customer_jobs": ["Buy a gift"], "pains": ["Opaque prices"], "gains": ["Unique piece"],
+        "products_services": [], "pain_relievers": [], "gain_creators": [],
+    }
+    assert not canvas.is_complete()
+
+def test_value_proposition_truncated_table_keeps_the_rows_it_has():
+    truncated = "\n".join(VALUE_PROPOSITION_ROWS.splitlines()[:7]) + "\n| Produits et"
+    canvas = ValuePropositionCanvas.parse(truncated)
+    assert canvas.found() == 3
+    assert canvas.items["products_services"] == []
+
+@pytest.mark.parametrize("text", ["", "Sorry, I cannot help with that.", "| Foo | Bar |\n|---|---|\n| a | b |"])
+def test_value_proposition_without_sections(text):
+    canvas = ValuePropositionCanvas.parse(text)
+    assert canvas.found() == 0
+    assert canvas.layout == {}
+    assert canvas.condensed() == ""
+
+def test_value_proposition_condensed():
+    canvas = ValuePropositionCanvas.parse(VALUE_PROPOSITION_ROWS)
+    lines = canvas.condensed().splitlines()
+    assert lines[0] == "Customer Jobs: Offrir un cadeau; Investir"
+    assert len(lines) == 6
+    assert "Pains" not in canvas.condensed(exclude=("pains",))
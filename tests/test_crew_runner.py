@@ -0,0 +1,139 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+import crew_runner
+from crew_runner import run_task_graph, task_dependencies
+
+def make_task(name, context=(), seconds=0.05):
+    return SimpleNamespace(name=name, context=list(context), seconds=seconds, description=name, expected_output=name,
+                           agent=SimpleNamespace(role=name, allow_delegation=False), output=None)
+
+class Recorder:
+    """Stands in for run_task: records start and end order and the peak number of tasks running."""
+
+    def __init__(self, failing=()):
+        self.events = []
+        self.running = 0
+        self.peak = 0
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+
+    def __call__(self, task, agents, verbose=2):
+        with self.lock:
+            self.events.append(("start", task.name))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(task.seconds)
+        with self.lock:
+            self.running -= 1
+            self.events.append(("end", task.name))
+        if task.name in self.failing:
+            raise RuntimeError(f"{task.name} failed")
+        return f"output of {task.name}"
+
+    def position(self, event, name):
+        return self.events.index((event, name))
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(crew_runner, "run_task", recorder)
+    return recorder
+
+def test_dependencies_are_limited_to_the_run():
+    outside = make_task("outside")
+    research = make_task("research")
+    plan = make_task("plan", [research, outside])
+    assert task_dependencies(plan, [research, plan]) == [research]
+
+def test_independent_tasks_run_concurrently_and_dependents_wait(recorder):
+    market, competitors, finance = make_task("market"), make_task("competitors"), make_task("finance")
+    plan = make_task("plan", [market, competitors, finance])
+    outputs = run_task_graph([], [plan, market, competitors, finance], max_workers=3)
+    assert outputs == ["output of plan", "output of market", "output of competitors", "output of finance"]
+    assert recorder.peak == 3
+    assert recorder.position("start", "plan") > max(recorder.position("end", name) for name in ("market", "competitors", "finance"))
+
+def test_max_workers_bounds_concurrency(recorder):
+    tasks = [make_task(f"task {index}") for index in range(5)]
+    run_task_graph([], tasks, max_workers=2)
+    assert recorder.peak == 2
+
+def test_chain_runs_in_order_and_reports_each_task(recorder):
+    first = make_task("first")
+    second = make_task("second", [first])
+    third = make_task("third", [second])
+    done = []
+    run_task_graph([], [third, second, first], on_task_done=lambda task, output: done.append(task.name))
+    assert done == ["first", "second", "third"]
+
+def test_circular_context_is_rejected(recorder):
+    first = make_task("first")
+    second = make_task("second", [first])
+    first.context = [second]
+    with pytest.raises(ValueError):
+        run_task_graph([], [first, second])
+
+def test_a_failing_task_stops_the_run(monkeypatch):
+    recorder = Recorder(failing={"market"})
+    monkeypatch.setattr(crew_runner, "run_task", recorder)
+    market = make_task("market")
+    plan = make_task("plan", [market])
+    with pytest.raises(RuntimeError):
+        run_task_graph([], [market, plan])
+    assert ("start", "plan") not in recorder.events
+
+def test_checkpointed_tasks_are_restored_instead_of_run(recorder):
+    class Checkpoints:
+        saved = {}
+
+        def fingerprint(self, task, context_outputs):
+            return "|".join([task.name, *context_outputs])
+
+        def load(self, task, fingerprint):
+            return "restored market" if fingerprint == "market" else None
+
+        def save(self, task, fingerprint, output):
+            self.saved[task.name] = fingerprint
+
+    market = make_task("market")
+    plan = make_task("plan", [market])
+    checkpoints = Checkpoints()
+    assert run_task_graph([], [market, plan], checkpoints=checkpoints) == ["restored market", "output of plan"]
+    assert ("start", "market") not in recorder.events
+    assert str(market.output) == "restored market"
+    assert checkpoints.saved == {"plan": "plan|restored market"}
+
+class SavingCheckpoints:
+    def __init__(self):
+        self.saved = {}
+
+    def fingerprint(self, task, context_outputs):
+        return task.name
+
+    def load(self, task, fingerprint):
+        return None
+
+    def save(self, task, fingerprint, output):
+        self.saved[task.name] = output
+
+def test_siblings_of_a_failed_task_are_still_saved(monkeypatch):
+    recorder = Recorder(failing={"market"})
+    monkeypatch.setattr(crew_runner, "run_task", recorder)
+    market = make_task("market", seconds=0.01)
+    competitors, finance = make_task("competitors", seconds=0.1), make_task("finance", seconds=0.1)
+    plan = make_task("plan", [market, competitors, finance])
+    checkpoints = SavingCheckpoints()
+    with pytest.raises(RuntimeError, match="market failed"):
+        run_task_graph([], [market, competitors, finance, plan], max_workers=3, checkpoints=checkpoints)
+    assert checkpoints.saved == {"competitors": "output of competitors", "finance": "output of finance"}
+    assert ("start", "plan") not in recorder.events
+
+def test_no_task_starts_after_a_failure(monkeypatch):
+    recorder = Recorder(failing={"first"})
+    monkeypatch.setattr(crew_runner, "run_task", recorder)
+    tasks = [make_task("first", seconds=0.01), make_task("second", seconds=0.1), make_task("third"), make_task("fourth")]
+    with pytest.raises(RuntimeError):
+        run_task_graph([], tasks, max_workers=2)
+    assert [name for event, name in recorder.events if event == "start"] == ["first", "second"]
@@ -0,0 +1,31 @@
+import os
+import pytest
+from extraction import _is_boilerplate, extract_main_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+def fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+def test_webforms_page_keeps_its_body():
+    text = extract_main_text(fixture("webforms_page_fr.html"))
+    assert "La rareté de la main-d'œuvre qualifiée" in text
+    assert "programme d'aide à l'automatisation" in text
+    assert "__VIEWSTATE" not in text
+    assert "Rechercher" not in text
+
+def test_page_with_content_named_like_chrome():
+    text = extract_main_text(fixture("shareholder_letter_en.html"))
+    assert "Dear shareholders" in text
+    assert "certify forty setup technicians" in text
+    for chrome in ("We use cookies", "Share on LinkedIn", "Related posts", "Subscribe to investor updates", "All rights reserved"):
+        assert chrome not in text
+
+@pytest.mark.parametrize("attributes", ["shareholder-letter", "article-header-image", "entry_footer_text post", "shared-services"])
+def test_content_classes_are_not_boilerplate(attributes):
+    assert not _is_boilerplate(attributes)
+
+@pytest.mark.parametrize("attributes", ["site-header", "page_footer", "share-buttons", "cookie-banner", "related-posts", "comments", "ads"])
+def test_chrome_classes_are_boilerplate(attributes):
+    assert _is_boilerplate(attributes)
@@ -0,0 +1,91 @@
+import os
+import time
+from types import SimpleNamespace
+import pytest
+import http_client
+from http_client import HTTPCache
+
+URL = "https://example.com/page"
+
+def response(**headers):
+    return SimpleNamespace(headers={"ETag": '"v1"', **headers})
+
+def test_store_then_load(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.store(URL, response(), "<p>page</p>", 11)
+    entry = cache.load(URL)
+    assert entry["text"] == "<p>page</p>"
+    assert entry["etag"] == '"v1"'
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_touch_keeps_the_body(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.store(URL, response(), "<p>page</p>", 11)
+    cache.touch(URL, response(ETag='"v2"'), cache.load(URL))
+    entry = cache.load(URL)
+    assert entry["etag"] == '"v2"'
+    assert entry["text"] == "<p>page</p>"
+
+def test_body_from_another_write_is_a_miss(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.store(URL, response(), "<p>first</p>", 12)
+    _, body_path = cache._paths(URL)
+    with open(body_path, "w", encoding="utf-8") as f:
+        f.write("<p>second</p>")
+    assert cache.load(URL) is None
+
+def test_failed_write_leaves_the_previous_entry(tmp_path, monkeypatch):
+    cache = HTTPCache(str(tmp_path))
+    cache.store(URL, response(), "<p>page</p>", 11)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(http_client.os, "replace", fail)
+    with pytest.raises(OSError):
+        cache.store(URL, response(ETag='"v2"'), "<p>new page</p>", 15)
+    assert cache.load(URL)["text"] == "<p>page</p>"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def entry_names(directory):
+    return {name.rsplit(".", 1)[0] for name in os.listdir(directory)}
+
+def test_prune_drops_entries_older_than_max_age(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_age=3600)
+    cache.store(URL, response(), "<p>old</p>", 10)
+    cache.store(URL + "/new", response(), "<p>new</p>", 10)
+    old = time.time() - 7200
+    for path in cache._paths(URL):
+        os.utime(path, (old, old))
+    cache.prune()
+    assert cache.load(URL) is None
+    assert cache.load(URL + "/new")["text"] == "<p>new</p>"
+
+def test_prune_keeps_the_newest_entries_within_max_bytes(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_bytes=10 ** 9)
+    for index in range(4):
+        cache.store(f"{URL}/{index}", response(), "x" * 1000, 1000)
+        written = time.time() - 100 + index
+        for path in cache._paths(f"{URL}/{index}"):
+            os.utime(path, (written, written))
+    entry_bytes = sum(os.path.getsize(path) for path in cache._paths(f"{URL}/0"))
+    cache.max_bytes = 2 * entry_bytes
+    cache.prune()
+    assert [cache.load(f"{URL}/{index}") is not None for index in range(4)] == [False, False, True, True]
+    assert len(entry_names(tmp_path)) == 2
+
+def test_prune_removes_stale_temporary_files(tmp_path):
+    leftover = tmp_path / "abc.tmp"
+    leftover.write_text("partial")
+    old = time.time() - 3600
+    os.utime(leftover, (old, old))
+    fresh = tmp_path / "def.tmp"
+    fresh.write_text("being written")
+    HTTPCache(str(tmp_path), max_age=60)
+    assert not leftover.exists()
+    assert fresh.exists()
+
+def test_session_blocks_at_the_pool_size():
+    adapter = http_client.get_session().get_adapter("https://example.com")
+    assert adapter._pool_block is True
+    assert adapter._pool_maxsize == http_client.POOL_MAXSIZE
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import jobs
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobQueueFull, JobRunner, JobStore
+
+def wait_for(store, job_id, *statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is still {store.get(job_id)['status']}")
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+def test_job_goes_from_queued_to_done_with_partial_results(store):
+    runner = JobRunner(store, max_workers=1)
+    release = threading.Event()
+
+    def work(params, report):
+        report("market", f"market of {params['industry']}")
+        release.wait(5)
+        return "plan"
+
+    job_id = runner.submit("business_plan", {"industry": "plastique"}, work)
+    job = wait_for(store, job_id, RUNNING)
+    deadline = time.time() + 5
+    while not store.get(job_id)["partial"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert store.get(job_id)["partial"] == {"market": "market of plastique"}
+    assert job["params"] == {"industry": "plastique"}
+    release.set()
+    job = wait_for(store, job_id, DONE)
+    assert job["result"] == "plan"
+    assert job["error"] is None
+
+def test_failed_job_records_its_error(store):
+    runner = JobRunner(store, max_workers=1)
+
+    def work(params, report):
+        raise RuntimeError("quota exceeded")
+
+    job = wait_for(store, runner.submit("business_plan", {}, work), FAILED)
+    assert job["error"] == "quota exceeded"
+
+def test_admission_control_and_queue_positions(store):
+    runner = JobRunner(store, max_workers=1, max_queued=2)
+    release = threading.Event()
+    work = lambda params, report: release.wait(5)
+    running = runner.submit("business_plan", {}, work)
+    wait_for(store, running, RUNNING)
+    first, second = runner.submit("business_plan", {}, work), runner.submit("business_plan", {}, work)
+    assert (runner.position(first), runner.position(second)) == (0, 1)
+    with pytest.raises(JobQueueFull):
+        runner.submit("business_plan", {}, work)
+    assert store.count(QUEUED) == 2
+    release.set()
+    for job_id in (running, first, second):
+        wait_for(store, job_id, DONE)
+    assert runner.position(first) == 0
+
+def test_a_second_store_leaves_running_jobs_alone(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = JobStore(path)
+    job_id = first.create("business_plan", {})
+    first.update(job_id, status=RUNNING)
+    second = JobStore(path)
+    assert second.recover_interrupted() == 0
+    assert second.get(job_id)["status"] == RUNNING
+
+def test_recovery_fails_jobs_of_stopped_processes_only(store, monkeypatch):
+    stopped = subprocess.Popen([sys.executable, "-c", "pass"])
+    stopped.wait()
+    host = jobs.socket.gethostname()
+    owners = {
+        "stopped": f"{host}:{stopped.pid}:deadbeef",
+        "earlier life of this pid": f"{host}:{os.getpid()}:deadbeef",
+        "this process": jobs.OWNER,
+        "other host": "elsewhere:1:deadbeef",
+        "before owners": None,
+    }
+    job_ids = {}
+    for name, owner in owners.items():
+        job_ids[name] = store.create("business_plan", {})
+        store.update(job_ids[name], status=RUNNING, owner=owner)
+    assert store.recover_interrupted() == 3
+    statuses = {name: store.get(job_id)["status"] for name, job_id in job_ids.items()}
+    assert statuses == {"stopped": FAILED, "earlier life of this pid": FAILED, "this process": RUNNING, "other host": RUNNING, "before owners": FAILED}
+    assert store.get(job_ids["stopped"])["error"] == "Interrupted by a server restart"
+
+def test_older_databases_gain_the_owner_column(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, "
+                 "partial TEXT NOT NULL, result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)")
+    conn.execute("INSERT INTO jobs VALUES ('old', 'business_plan', 'running', '{}', '{}', NULL, NULL, 0, 0)")
+    conn.commit()
+    conn.close()
+    store = JobStore(path)
+    assert store.recover_interrupted() == 1
+    assert store.get("old")["status"] == FAILED
+    assert store.get(store.create("business_plan", {}))["status"] == QUEUED
@@ -0,0 +1,69 @@
+import time
+import pytest
+from llm_cache import LLMCache, cached_completion, cached_stream
+import llm_cache
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(llm_cache, "_cache", cache)
+    return cache
+
+def answer(text):
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return text
+    return generate, calls
+
+def test_reformatted_prompts_share_an_entry(cache):
+    generate, calls = answer("answer")
+    cached_completion(generate, "Identify   problems\n   in plastics", "model", 0.5, "French")
+    assert cached_completion(generate, "Identify problems in plastics", "model", 0.5, "French") == "answer"
+    assert len(calls) == 1
+
+@pytest.mark.parametrize("model, temperature, language, prompt", [
+    ("other-model", 0.5, "French", "prompt"),
+    ("model", 0.7, "French", "prompt"),
+    ("model", 0.5, "English", "prompt"),
+    ("model", 0.5, "French", "other prompt"),
+])
+def test_model_temperature_language_and_prompt_are_part_of_the_key(cache, model, temperature, language, prompt):
+    generate, calls = answer("answer")
+    cached_completion(generate, "prompt", "model", 0.5, "French")
+    cached_completion(generate, prompt, model, temperature, language)
+    assert len(calls) == 2
+
+def test_empty_answers_are_not_cached(cache):
+    generate, calls = answer("")
+    cached_completion(generate, "prompt", "model", 0.5, "French")
+    cached_completion(generate, "prompt", "model", 0.5, "French")
+    assert len(calls) == 2
+
+def test_use_cache_false_bypasses_the_cache(cache):
+    generate, calls = answer("answer")
+    cached_completion(generate, "prompt", "model", 0.5, "French")
+    cached_completion(generate, "prompt", "model", 0.5, "French", use_cache=False)
+    assert len(calls) == 2
+
+def test_streams_are_stored_once_complete_and_replayed_as_one_chunk(cache):
+    chunks = lambda: iter(["first ", "second"])
+    assert list(cached_stream(chunks, "prompt", "model", 0.5, "French")) == ["first ", "second"]
+    assert list(cached_stream(chunks, "prompt", "model", 0.5, "French")) == ["first second"]
+
+def test_abandoned_stream_is_not_stored(cache):
+    stream = cached_stream(lambda: iter(["first ", "second"]), "prompt", "model", 0.5, "French")
+    next(stream)
+    stream.close()
+    assert cache.get(cache.make_key("model", 0.5, "French", "prompt")) is None
+
+def test_expired_and_evicted_entries(tmp_path):
+    cache = LLMCache(str(tmp_path / "ttl.sqlite3"), ttl=0.05, max_entries=2)
+    cache.set("a", "1")
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    for key in ("b", "c", "d"):
+        cache.set(key, key)
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,112 @@
+import time
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+import model_factory
+import model_router
+from model_router import ModelRouter, cost
+
+PRO, FLASH = "gemini-1.5-pro-latest", "gemini-1.5-flash"
+
+def test_roles_use_their_tier_capped_by_the_selected_model():
+    router = ModelRouter()
+    assert router.route("rank", PRO) == FLASH
+    assert router.route("canvas", PRO) == PRO
+    assert router.route("canvas", FLASH) == FLASH
+    assert router.route("canvas", "fake-model") == "fake-model"
+
+def test_over_budget_falls_back_for_that_key_only():
+    router = ModelRouter()
+    router.record("canvas", "models/" + PRO, PRO, model_router.LATENCY_BUDGETS["canvas"] + 1, 100, 100, api_key="a")
+    assert router.route("canvas", PRO, "a") == FLASH
+    assert router.route("canvas", PRO, "b") == PRO
+    assert router.route("synthesize", PRO, "a") == PRO
+    assert router.stats()["canvas"]["fallbacks"] == 1
+
+def test_streams_are_judged_on_time_to_first_token():
+    router = ModelRouter()
+    router.record("canvas", PRO, PRO, model_router.FIRST_TOKEN_BUDGETS["canvas"] - 1, 100, 100, api_key="a", first_token=True)
+    assert router.route("canvas", PRO, "a") == PRO
+    router.record("canvas", PRO, PRO, model_router.FIRST_TOKEN_BUDGETS["canvas"] + 1, 100, 100, api_key="a", first_token=True)
+    assert router.route("canvas", PRO, "a") == FLASH
+
+def test_fast_tier_has_no_fallback():
+    router = ModelRouter()
+    router.record("rank", FLASH, PRO, 1000, 100, 100, api_key="a")
+    assert router.route("rank", PRO, "a") == FLASH
+    assert router.stats()["rank"]["fallbacks"] == 0
+
+def test_savings_are_accounted_per_role():
+    router = ModelRouter()
+    router.record("summarize", PRO, PRO, 10, 1000, 1000)
+    router.record("summarize", FLASH, PRO, 2, 1000, 1000)
+    stats = router.stats()["summarize"]
+    assert stats["calls"] == 2
+    assert stats["cost"] == pytest.approx(cost(PRO, 1000, 1000) + cost(FLASH, 1000, 1000))
+    assert stats["cost_saved"] == pytest.approx(cost(PRO, 1000, 1000) - cost(FLASH, 1000, 1000))
+    assert stats["seconds_saved"] == pytest.approx(8)
+
+class SlowLimiter:
+    """Stands in for a limiter that makes every call queue before reaching the provider."""
+
+    def call(self, function, tokens):
+        time.sleep(0.2)
+        return function()
+
+    def stream(self, function, tokens):
+        time.sleep(0.2)
+        yield from function()
+
+@pytest.fixture
+def recorded(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_factory, "router", type("Router", (), {"record": lambda self, *args, **kwargs: calls.append((args, kwargs))})())
+    monkeypatch.setattr(model_factory, "get_limiter", lambda model, api_key: SlowLimiter())
+    monkeypatch.setattr(ChatGoogleGenerativeAI, "_generate", lambda self, messages, stop=None, run_manager=None, **kwargs:
+                        ChatResult(generations=[ChatGeneration(message=AIMessage(content="answer"))]))
+
+    def stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content="first"))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="second"))
+
+    monkeypatch.setattr(ChatGoogleGenerativeAI, "_stream", stream)
+    model_factory.clear_models()
+    return calls
+
+def test_limiter_waits_are_not_charged_to_the_model(recorded):
+    client = model_factory.get_chat_model("key", PRO, 0.5, role="canvas")
+    client.invoke([HumanMessage(content="prompt")])
+    (role, model, selected, seconds, *_), kwargs = recorded[0]
+    assert (role, selected) == ("canvas", PRO)
+    assert seconds < 0.1
+    assert kwargs == {"api_key": "key", "first_token": False}
+
+def test_streams_report_time_to_first_token(recorded):
+    client = model_factory.get_chat_model("key", PRO, 0.5, role="canvas")
+    for _ in client.stream([HumanMessage(content="prompt")]):
+        # A slow consumer must not count against the model
+        time.sleep(0.2)
+    (_, _, _, seconds, *_), kwargs = recorded[0]
+    assert seconds < 0.1
+    assert kwargs["first_token"] is True
+
+class FixedModel:
+    def __init__(self, model, answer):
+        self.model = model
+        self.answer = answer
+
+    def invoke(self, prompt):
+        return AIMessage(content=self.answer)
+
+def test_answers_are_cached_under_the_routed_model(monkeypatch):
+    import lean_canvas
+    models = {FLASH: FixedModel("models/" + FLASH, "flash answer"), PRO: FixedModel("models/" + PRO, "pro answer")}
+    arguments = ("key", 0.5, "Cache key industry", "Problem", "Solution", "English", 2024, PRO)
+
+    # The router fell back to flash for this call...
+    monkeypatch.setattr(lean_canvas, "get_chat_model", lambda api_key, model, temperature, role=None: models[FLASH])
+    assert lean_canvas.LeanCanvas(*arguments, use_cache=True).call_google_chat("prompt") == "flash answer"
+    # ...so a later call answered by pro must not be served flash's answer
+    monkeypatch.setattr(lean_canvas, "get_chat_model", lambda api_key, model, temperature, role=None: models[PRO])
+    assert lean_canvas.LeanCanvas(*arguments, use_cache=True).call_google_chat("prompt") == "pro answer"
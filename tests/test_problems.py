@@ -0,0 +1,35 @@
+from langchain_core.messages import AIMessage
+import problems
+from problems import SSSSS
+
+class CountingModel:
+    model = "counting-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content="| Problème | Description | Impact | Source |")
+
+def test_cached_research_fetches_no_page(monkeypatch):
+    model = CountingModel()
+    retrieved = []
+    monkeypatch.setattr(problems, "get_chat_model", lambda api_key, model_name, temperature, role=None: model)
+    monkeypatch.setattr(problems, "search", lambda query, year: [{"href": "https://example.com/a"}])
+    monkeypatch.setattr(problems, "retrieve_passages", lambda urls: retrieved.append(urls) or [(urls[0], "Extract")])
+
+    def research(urls):
+        monkeypatch.setattr(problems, "find_relevant_articles", lambda results, query, gpt_model, count: urls)
+        return SSSSS("key", 0.5, "Moules research cache", "Fabricants", "wt-wt", 3, "French", 2024, "fake").research_problem()
+
+    research(["https://example.com/a"])
+    research(["https://example.com/a"])
+    assert len(model.prompts) == 1
+    assert "Extract" in model.prompts[0]
+    assert len(retrieved) == 1
+
+    # Other sources are another prompt
+    research(["https://example.com/b"])
+    assert len(model.prompts) == 2
+    assert len(retrieved) == 2
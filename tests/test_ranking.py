@@ -0,0 +1,89 @@
+from typing import List
+import pytest
+from langchain_core.language_models.llms import LLM
+from ranking import dedupe_results, find_relevant_urls, normalize_url, parse_url_list, rank_results, tokenize
+
+class ScriptedLLM(LLM):
+    """Returns answer, or raises error, for every prompt."""
+
+    answer: str = ""
+    error: str = ""
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(prompt)
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.answer
+
+RESULTS = [
+    {"href": "https://blog.example.com/recipes", "title": "Cooking with plastic wrap", "body": "Kitchen tips"},
+    {"href": "https://www.plastics.org/moulding-lead-times?utm_source=ddg", "title": "Injection moulding lead times",
+     "body": "Why injection moulding lead times grow in the plastics industry"},
+    {"href": "https://news.example.com/industry", "title": "Plastics industry news", "body": "Moulding plants invest in automation"},
+    {"href": "https://plastics.org/moulding-lead-times/", "title": "Injection moulding lead times (copy)", "body": "Duplicate"},
+]
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("Les délais de l'industrie du Plastique") == ["delais", "industrie", "plastique"]
+
+@pytest.mark.parametrize("url, normalized", [
+    ("https://www.example.com/page/", "example.com/page"),
+    ("http://example.com/page#section", "example.com/page"),
+    ("https://example.com/page?utm_source=x&utm_medium=y&fbclid=1&gclid=2", "example.com/page"),
+    ("https://example.com/page?id=7&utm_campaign=z", "example.com/page?id=7"),
+])
+def test_normalize_url(url, normalized):
+    assert normalize_url(url) == normalized
+
+@pytest.mark.parametrize("param", ["ref", "source", "mc_cid"])
+def test_content_params_are_kept(param):
+    assert normalize_url(f"https://example.com/view?{param}=a") != normalize_url(f"https://example.com/view?{param}=b")
+
+def test_dedupe_keeps_the_first_of_each_page_and_drops_results_without_link():
+    results = dedupe_results(RESULTS + [{"title": "no link"}])
+    assert [result["href"] for result in results] == [RESULTS[0]["href"], RESULTS[1]["href"], RESULTS[2]["href"]]
+
+def test_bm25_ranks_the_matching_titles_first():
+    ranked = rank_results(RESULTS, "injection moulding lead times plastics")
+    assert ranked[0]["href"] == RESULTS[1]["href"]
+    assert ranked[-1]["href"] == RESULTS[0]["href"]
+    assert len(ranked) == 3
+
+def test_ties_keep_the_search_engine_order():
+    results = [{"href": f"https://example.com/{index}", "title": "same", "body": "same"} for index in range(4)]
+    assert [result["href"] for result in rank_results(results, "unrelated query", top_k=3)] == [result["href"] for result in results[:3]]
+
+def test_rank_results_of_nothing():
+    assert rank_results([], "query") == []
+    assert rank_results(None, "query") == []
+
+@pytest.mark.parametrize("answer, urls", [
+    ('["https://a.com", "https://b.com"]', ["https://a.com", "https://b.com"]),
+    ('```json\n["https://a.com", 3, "https://b.com"]\n```', ["https://a.com", "https://b.com"]),
+    ("Here you go: https://a.com, then https://b.com.", ["https://a.com", "https://b.com"]),
+    ("[not json https://a.com]", ["https://a.com"]),
+    ("", []),
+])
+def test_parse_url_list(answer, urls):
+    assert parse_url_list(answer) == urls
+
+def test_local_ranking_by_default_makes_no_model_call():
+    llm = ScriptedLLM(prompts=[])
+    assert find_relevant_urls(RESULTS, "injection moulding lead times", llm, num_articles=2) == [RESULTS[1]["href"], RESULTS[2]["href"]]
+    assert llm.prompts == []
+
+def test_rerank_maps_the_model_answer_back_to_candidates_and_fills_up():
+    llm = ScriptedLLM(answer='["https://news.example.com/industry/", "https://unknown.com"]', prompts=[])
+    urls = find_relevant_urls(RESULTS, "injection moulding lead times", llm, num_articles=2, rerank=True)
+    assert urls == [RESULTS[2]["href"], RESULTS[1]["href"]]
+
+def test_failed_rerank_keeps_the_local_order():
+    llm = ScriptedLLM(error="quota exceeded", prompts=[])
+    urls = find_relevant_urls(RESULTS, "injection moulding lead times", llm, num_articles=2, rerank=True)
+    assert urls == [RESULTS[1]["href"], RESULTS[2]["href"]]
+    assert len(llm.prompts) == 1
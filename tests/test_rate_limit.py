@@ -0,0 +1,51 @@
+import pytest
+import rate_limit
+from rate_limit import ModelLimiter, get_limiter, is_throttled
+
+class ResourceExhausted(Exception):
+    pass
+
+def test_limiters_are_per_api_key_and_model():
+    assert get_limiter("models/gemini-1.5-pro-latest", "key-a") is get_limiter("gemini-1.5-pro-latest", "key-a")
+    assert get_limiter("gemini-1.5-pro-latest", "key-a") is not get_limiter("gemini-1.5-pro-latest", "key-b")
+    assert get_limiter("gemini-1.5-pro-latest", "key-a") is not get_limiter("gemini-1.5-flash", "key-a")
+
+def test_budgets_are_opt_in(monkeypatch):
+    assert ModelLimiter("gemini-1.5-pro-latest").requests is None
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", {"gemini-1.5-pro-latest": {"rpm": 2, "tpm": 32000}})
+    limiter = ModelLimiter("models/gemini-1.5-pro-latest")
+    assert limiter.requests.capacity == 2
+    assert limiter.tokens.capacity == 32000
+    assert rate_limit.requests_per_minute("gemini-1.5-pro-latest") == 2
+
+def test_throttled_calls_are_retried(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda seconds: None)
+    limiter = ModelLimiter("gemini-1.5-flash")
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ResourceExhausted("429 quota exceeded")
+        return "ok"
+
+    assert limiter.call(call, 10) == "ok"
+    assert len(attempts) == 3
+    assert limiter.throttled == 2
+    assert limiter.concurrency.limit < rate_limit.MAX_CONCURRENCY
+
+def test_other_errors_are_not_retried():
+    limiter = ModelLimiter("gemini-1.5-flash")
+    with pytest.raises(ValueError):
+        limiter.call(lambda: (_ for _ in ()).throw(ValueError("bad request")), 10)
+    assert limiter.throttled == 0
+
+def test_is_throttled_follows_the_cause_chain():
+    try:
+        try:
+            raise ResourceExhausted("RESOURCE_EXHAUSTED")
+        except ResourceExhausted as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as error:
+        assert is_throttled(error)
+    assert not is_throttled(ValueError("bad request"))
@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+import search_cache
+from search_cache import RatelimitException, SearchCache
+
+class CountingDDGS:
+    queries = []
+    delay = 0.0
+    error = None
+
+    def text(self, keywords, region="wt-wt", safesearch="moderate"):
+        CountingDDGS.queries.append((keywords, region, safesearch))
+        time.sleep(CountingDDGS.delay)
+        if CountingDDGS.error:
+            raise CountingDDGS.error
+        return [{"href": f"https://example.com/{len(CountingDDGS.queries)}", "title": keywords}]
+
+@pytest.fixture(autouse=True)
+def ddgs(monkeypatch):
+    CountingDDGS.queries, CountingDDGS.delay, CountingDDGS.error = [], 0.0, None
+    monkeypatch.setattr(search_cache, "DDGS", CountingDDGS)
+
+def test_identical_searches_hit_the_cache():
+    cache = SearchCache()
+    first = cache.search("moules", 2024)
+    assert cache.search("moules", 2024) == first
+    assert len(CountingDDGS.queries) == 1
+    assert cache.stats()["hits"] == 1
+
+@pytest.mark.parametrize("other", [("moules acier", 2024, "wt-wt"), ("moules", 2023, "wt-wt"), ("moules", 2024, "fr-fr")])
+def test_query_year_and_region_are_part_of_the_key(other):
+    cache = SearchCache()
+    cache.search("moules", 2024, "wt-wt")
+    query, year, region = other
+    cache.search(query, year, region)
+    assert len(CountingDDGS.queries) == 2
+
+def test_expired_entries_are_searched_again():
+    cache = SearchCache(ttl=0.05)
+    cache.search("moules", 2024)
+    time.sleep(0.1)
+    cache.search("moules", 2024)
+    assert len(CountingDDGS.queries) == 2
+
+def test_concurrent_identical_searches_share_one_call():
+    CountingDDGS.delay = 0.1
+    cache = SearchCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.search("moules", 2024))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(CountingDDGS.queries) == 1
+    assert len(results) == 4 and all(result == results[0] for result in results)
+    assert cache.stats()["coalesced"] == 3
+
+def test_rate_limited_search_serves_the_expired_entry():
+    cache = SearchCache(ttl=0.01)
+    stale = cache.search("moules", 2024)
+    time.sleep(0.02)
+    CountingDDGS.error = RatelimitException("202 Ratelimit")
+    assert cache.search("moules", 2024) == stale
+    assert cache.stats()["stale_served"] == 1
+
+def test_failures_are_not_cached():
+    cache = SearchCache()
+    CountingDDGS.error = RatelimitException("202 Ratelimit")
+    with pytest.raises(RatelimitException):
+        cache.search("moules", 2024)
+    CountingDDGS.error = None
+    assert cache.search("moules", 2024)
+    assert len(CountingDDGS.queries) == 2
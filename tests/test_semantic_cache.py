@@ -0,0 +1,61 @@
+import pytest
+from semantic_cache import SemanticCache, content_words, normalize_text
+
+FRENCH = {"language": "French", "model": "gemini-1.5-flash", "temperature": 0.5}
+
+@pytest.fixture
+def cache():
+    return SemanticCache()
+
+def test_fuzzy_fields_match_rewordings(cache):
+    cache.store("problems", {"industry_name": "Industrie plastique", "type_client": "Fabricants de moules"}, FRENCH, "cached")
+    match = cache.lookup("problems", {"industry_name": "industrie du plastique", "type_client": "fabricants de moules"}, FRENCH)
+    assert match is not None and match.result == "cached"
+    assert cache.lookup("problems", {"industry_name": "Industrie textile", "type_client": "Fabricants de moules"}, FRENCH) is None
+
+def test_plurals_and_accents_match(cache):
+    cache.store("business_canvas:value_proposition", {"industry_name": "Bijouteries", "job_to_be_done": "Vente des bijoux rares", "customer_description": "Consommateurs aisés"}, FRENCH, "cached")
+    match = cache.lookup("business_canvas:value_proposition", {"industry_name": "Bijouterie", "job_to_be_done": "vente des bijoux rares", "customer_description": "Consommateurs aises"}, FRENCH)
+    assert match is not None
+
+@pytest.mark.parametrize("field, cached, requested", [
+    ("solution_description", "A mobile app that lets farmers sell directly to consumers", "A mobile app that lets consumers sell directly to farmers"),
+    ("problem_description", "Hospitals in rural areas lack access to specialists", "Hospitals in urban areas lack access to specialists"),
+    ("problem_description", "Companies do not have tools to track their emissions", "Companies have tools to track their emissions"),
+])
+def test_descriptions_that_differ_in_meaning_miss(cache, field, cached, requested):
+    inputs = {"industry_name": "Agriculture", "problem_description": "Problem", "solution_description": "Solution"}
+    cache.store("lean_canvas", {**inputs, field: cached}, FRENCH, "cached")
+    assert cache.lookup("lean_canvas", {**inputs, field: requested}, FRENCH) is None
+
+def test_descriptions_match_after_normalisation(cache):
+    inputs = {"industry_name": "Santé", "problem_description": "Hospitals in rural areas lack access to specialists."}
+    cache.store("solutions:existing", inputs, FRENCH, "cached")
+    match = cache.lookup("solutions:existing", {"industry_name": "santé", "problem_description": "  hospitals in Rural areas lack access to Specialists "}, FRENCH)
+    assert match is not None
+
+@pytest.mark.parametrize("cached, requested", [
+    ("Rural hospitals", "Urban hospitals"),
+    ("Produits sans gluten", "Produits avec gluten"),
+])
+def test_fuzzy_fields_reject_a_different_word(cache, cached, requested):
+    cache.store("problems", {"industry_name": cached}, FRENCH, "cached")
+    assert cache.lookup("problems", {"industry_name": requested}, FRENCH) is None
+
+def test_entries_are_isolated_by_exact_inputs(cache):
+    inputs = {"industry_name": "Industrie plastique"}
+    cache.store("problems", inputs, FRENCH, "french")
+    assert cache.lookup("problems", inputs, {**FRENCH, "language": "English"}) is None
+    assert cache.lookup("problems", inputs, {**FRENCH, "model": "gemini-1.5-pro-latest"}) is None
+    assert cache.lookup("solutions:existing", inputs, FRENCH) is None
+    assert cache.lookup("problems", inputs, FRENCH).result == "french"
+
+def test_year_tolerance(cache):
+    inputs = {"industry_name": "Industrie plastique"}
+    cache.store("problems", inputs, FRENCH, "cached", year=2024)
+    assert cache.lookup("problems", inputs, FRENCH, year=2025) is not None
+    assert cache.lookup("problems", inputs, FRENCH, year=2027) is None
+
+def test_normalisation_keeps_order_and_negation():
+    assert normalize_text("Companies do NOT have tools!") == "companie do not have tool"
+    assert content_words("industrie du plastique") == content_words("Industrie plastique")
@@ -0,0 +1,114 @@
+import threading
+import time
+from types import SimpleNamespace
+from langchain_core.messages import AIMessage
+import rate_limit
+import solutions
+from solutions import Solutions, fanout_concurrency, problem_description, stream_solutions_for_problems
+
+class FakeAgent:
+    """Stands in for Solutions: streams both branches after a short delay, or fails."""
+
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, api_key="key", model="fake-gemini", error=None):
+        self.google_api_key = api_key
+        self.gpt_model = SimpleNamespace(model=model)
+        self.error = error
+
+    def execute_stream(self):
+        with FakeAgent.lock:
+            FakeAgent.running += 1
+            FakeAgent.peak = max(FakeAgent.peak, FakeAgent.running)
+        try:
+            time.sleep(0.05)
+            if self.error:
+                raise self.error
+            yield "existing", "existing solutions", True
+            yield "creative", "creative solutions", True
+        finally:
+            with FakeAgent.lock:
+                FakeAgent.running -= 1
+
+def test_problem_description_includes_the_description():
+    assert problem_description({"problem": "Long lead times", "description": "Moulds take weeks", "impact": ""}) == "Long lead times — Moulds take weeks"
+    assert problem_description({"problem": "Long lead times", "description": "", "impact": ""}) == "Long lead times"
+
+def test_fanout_is_sized_from_the_request_budget(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", {"budgeted-model": {"rpm": 4}})
+    agents = [FakeAgent(model="budgeted-model") for _ in range(6)]
+    assert fanout_concurrency(agents) == 4 // solutions.CALLS_PER_PROBLEM
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", {"budgeted-model": {"rpm": 1}})
+    assert fanout_concurrency(agents) == 1
+
+def test_fanout_without_budget_follows_the_limiter_and_setting(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", {})
+    monkeypatch.setattr(solutions, "FANOUT_CONCURRENCY", 3)
+    assert fanout_concurrency([FakeAgent(api_key="fanout") for _ in range(6)]) == 3
+    assert fanout_concurrency([FakeAgent(api_key="fanout")]) == 1
+    limiter = rate_limit.get_limiter("fake-gemini", "throttled-key")
+    limiter.concurrency.limit = 2
+    assert fanout_concurrency([FakeAgent(api_key="throttled-key") for _ in range(6)]) == 1
+
+def test_stream_runs_up_to_max_workers_and_reports_failures():
+    FakeAgent.peak = 0
+    agents = [FakeAgent(), FakeAgent(error=ValueError("no answer")), FakeAgent(), FakeAgent()]
+    events = list(stream_solutions_for_problems(agents, max_workers=2))
+    assert FakeAgent.peak == 2
+    finished = {index: error for index, name, _, _, error in events if name is None}
+    assert set(finished) == {0, 1, 2, 3}
+    assert isinstance(finished[1], ValueError)
+    assert all(finished[index] is None for index in (0, 2, 3))
+    streamed = {(index, name) for index, name, _, _, _ in events if name is not None}
+    assert streamed == {(index, name) for index in (0, 2, 3) for name in ("existing", "creative")}
+
+class CountingModel:
+    model = "counting-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content="| Solution | Description | Source |")
+
+def test_cached_research_fetches_no_page(monkeypatch):
+    model = CountingModel()
+    retrieved = []
+    monkeypatch.setattr(solutions, "get_chat_model", lambda api_key, model_name, temperature, role=None: model)
+    monkeypatch.setattr(solutions, "search", lambda query, year: [{"href": "https://example.com/a"}])
+    monkeypatch.setattr(solutions, "find_relevant_articles", lambda results, query, gpt_model, count: ["https://example.com/a"])
+    monkeypatch.setattr(solutions, "retrieve_passages", lambda urls: retrieved.append(urls) or [(urls[0], "Extract")])
+
+    def research():
+        agent = Solutions("key", 0.5, "Moules research cache", "Délais", 3, "French", 2024, "fake", "Five Whys")
+        return agent.research_existing_solutions()
+
+    assert research() == research()
+    assert len(model.prompts) == 1
+    assert "Extract" in model.prompts[0]
+    assert len(retrieved) == 1
+
+def render_without_key(language, all_problems):
+    from streamlit.testing.v1 import AppTest
+
+    def page(language, all_problems):
+        import streamlit as st
+        from solutions import display_solutions
+        if all_problems:
+            st.session_state["problems_result"] = {"industry_name": "Plasturgie", "year": 2024, "problems": [{"problem": "Moules", "description": ""}]}
+        display_solutions("", 0.5, language, "fake-gemini")
+
+    app = AppTest.from_function(page, kwargs={"language": language, "all_problems": all_problems}).run()
+    if all_problems:
+        app.checkbox(key="all_problems_solutions").check().run()
+    app.button(key="submit_solutions").click().run()
+    return [warning.value for warning in app.warning]
+
+def test_missing_key_warning_when_solving_every_problem():
+    assert render_without_key("English", all_problems=True) == ["Enter your Google API Key"]
+
+def test_missing_key_warning_for_one_problem():
+    assert render_without_key("French", all_problems=False) == ["Entrez votre clé API Google, Industrie : et Description du Problème :"]
@@ -0,0 +1,61 @@
+from typing import List
+import pytest
+from langchain_core.language_models.llms import LLM
+import summarization
+from summarization import CHUNK_TOKENS, REFINE_MAX_CHUNKS, STUFF_MAX_TOKENS, choose_strategy, count_tokens, split_text, summarize_document
+
+class RecordingLLM(LLM):
+    """Answers every prompt with a short summary and keeps the prompts it was given."""
+
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self):
+        return "recording"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(prompt)
+        return "summary"
+
+def document(tokens):
+    sentence = "Automation lowers labour costs for plastic moulding plants in Quebec. "
+    text = ""
+    while count_tokens(text) < tokens:
+        text += sentence * 20 + "\n\n"
+    return text
+
+@pytest.mark.parametrize("tokens, strategy", [
+    (STUFF_MAX_TOKENS // 2, "stuff"),
+    (STUFF_MAX_TOKENS + CHUNK_TOKENS // 2, "map_reduce"),
+    (CHUNK_TOKENS * 8, "map_reduce"),
+])
+def test_each_strategy_is_chosen_for_its_document_size(tokens, strategy):
+    text = document(tokens)
+    assert choose_strategy(count_tokens(text), len(split_text(text))) == strategy
+
+def test_refine_is_only_chosen_for_documents_of_a_few_chunks(monkeypatch):
+    monkeypatch.setattr(summarization, "STUFF_MAX_TOKENS", CHUNK_TOKENS)
+    assert choose_strategy(CHUNK_TOKENS * 2, REFINE_MAX_CHUNKS) == "refine"
+    assert choose_strategy(CHUNK_TOKENS * 3, REFINE_MAX_CHUNKS + 1) == "map_reduce"
+
+def test_stuff_makes_one_call():
+    llm = RecordingLLM(prompts=[])
+    summarize_document(document(STUFF_MAX_TOKENS // 2), llm, "English", "https://example.com", "automation")
+    assert len(llm.prompts) == 1
+
+def test_refine_makes_one_call_per_chunk_in_order():
+    llm = RecordingLLM(prompts=[])
+    text = document(STUFF_MAX_TOKENS + CHUNK_TOKENS // 2)
+    summarize_document(text, llm, "English", "https://example.com", "automation", strategy="refine")
+    assert len(llm.prompts) == len(split_text(text))
+    assert "existing post" not in llm.prompts[0]
+    assert all("existing post" in prompt for prompt in llm.prompts[1:])
+
+def test_map_reduce_maps_every_chunk_then_writes_one_post(monkeypatch):
+    monkeypatch.setattr(summarization, "MAP_CONCURRENCY", 2)
+    llm = RecordingLLM(prompts=[])
+    text = document(CHUNK_TOKENS * 8)
+    summarize_document(text, llm, "French", "https://example.com", "automatisation")
+    assert sum("RÉSUMÉ" in prompt for prompt in llm.prompts) == len(split_text(text))
+    assert "POST DÉTAILLÉ" in llm.prompts[-1]
+    assert len(llm.prompts) == len(split_text(text)) + 1
@@ -0,0 +1,50 @@
+import gc
+import telemetry
+from llm_cache import cached_stream
+from telemetry import annotate, span, trace
+
+def chunks():
+    yield "first "
+    yield "second"
+
+def spans_named(request_trace, name):
+    return [recorded for recorded in request_trace.spans if recorded.name == name]
+
+def test_consumer_spans_between_chunks_are_not_children_of_the_stream():
+    with trace("page") as request_trace:
+        with span("render") as render:
+            for _ in cached_stream(chunks, "prompt", "fake-model", 0.5, "English", use_cache=False):
+                with span("markdown"):
+                    annotate(chunk=True)
+    stream, = spans_named(request_trace, "call_google_chat")
+    assert stream.parent_id == render.span_id
+    assert all(recorded.parent_id == render.span_id for recorded in spans_named(request_trace, "markdown"))
+    assert "chunk" not in stream.attributes
+    assert "abandoned" not in stream.attributes
+
+def test_abandoned_stream_finishes_its_span_and_leaves_the_context_alone():
+    with trace("page") as request_trace:
+        with span("render") as render:
+            stream = cached_stream(chunks, "prompt", "fake-model", 0.5, "English", use_cache=False)
+            next(stream)
+            assert telemetry._current_span.get() is render
+            del stream
+            gc.collect()
+            assert telemetry._current_span.get() is render
+    stream_span, = spans_named(request_trace, "call_google_chat")
+    assert stream_span.attributes["abandoned"] is True
+    assert stream_span.duration is not None
+    assert telemetry._current_span.get() is None
+
+def test_failing_stream_records_its_error():
+    def failing():
+        yield "first "
+        raise ValueError("no answer")
+
+    with trace("page") as request_trace:
+        try:
+            list(cached_stream(failing, "prompt", "fake-model", 0.5, "English", use_cache=False))
+        except ValueError:
+            pass
+    stream_span, = spans_named(request_trace, "call_google_chat")
+    assert stream_span.error == "ValueError: no answer"
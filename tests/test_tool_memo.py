@@ -0,0 +1,134 @@
+import threading
+import time
+import pytest
+from telemetry import in_context
+from tool_memo import ToolMemo, current_run, memoized, tool_run
+
+calls = []
+
+@memoized("scrape", ignore=("model",))
+def scrape(url, model=None, max_chars=1000):
+    calls.append(url)
+    return f"text of {url}"
+
+def setup_function():
+    calls.clear()
+
+def test_outside_a_run_every_call_runs():
+    scrape("https://example.com")
+    scrape("https://example.com")
+    assert len(calls) == 2
+    assert current_run() is None
+
+def test_inside_a_run_identical_calls_are_computed_once():
+    with tool_run() as memo:
+        assert scrape("https://example.com", model=object()) == "text of https://example.com"
+        assert scrape(url="https://example.com", model=object(), max_chars=1000) == "text of https://example.com"
+        scrape("https://example.com", max_chars=500)
+        scrape("https://example.org")
+    assert calls == ["https://example.com", "https://example.com", "https://example.org"]
+    assert memo.stats()["scrape"]["calls"] == 4
+    assert memo.stats()["scrape"]["reused"] == 1
+    assert current_run() is None
+
+def test_runs_do_not_share_results():
+    with tool_run():
+        scrape("https://example.com")
+    with tool_run():
+        scrape("https://example.com")
+    assert len(calls) == 2
+
+def test_failures_are_not_memoized():
+    memo = ToolMemo()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("reset")
+        return "page"
+
+    with pytest.raises(ConnectionError):
+        memo.call("fetch", {"url": "u"}, flaky)
+    assert memo.peek("fetch", {"url": "u"}) is None
+    assert memo.call("fetch", {"url": "u"}, flaky) == "page"
+    assert memo.peek("fetch", {"url": "u"}) == "page"
+    assert len(attempts) == 2
+
+def test_concurrent_identical_calls_wait_for_the_first():
+    memo = ToolMemo()
+    started = []
+
+    def slow():
+        started.append(1)
+        time.sleep(0.1)
+        return "results"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(memo.call("search", {"query": "q"}, slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["results"] * 5
+    assert len(started) == 1
+    assert memo.stats()["search"]["reused"] == 4
+
+def test_waiting_callers_see_the_failure():
+    memo = ToolMemo()
+    release = threading.Event()
+
+    def failing():
+        release.wait(1)
+        raise TimeoutError("slow site")
+
+    errors = []
+
+    def call():
+        try:
+            memo.call("fetch", {"url": "u"}, failing)
+        except TimeoutError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=call)
+    first.start()
+    time.sleep(0.05)
+    second = threading.Thread(target=call)
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert len(errors) == 2
+
+def test_worker_threads_started_with_in_context_share_the_run():
+    with tool_run() as memo:
+        threads = [threading.Thread(target=in_context(scrape), args=("https://example.com",)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert calls == ["https://example.com"]
+    assert memo.stats()["scrape"]["calls"] == 3
+
+def test_business_plan_tools_share_results_within_a_run(monkeypatch):
+    from tools_business_plan import fetch_tools, scrape_tools, search_tools, summarize_tools
+    monkeypatch.setattr(search_tools, "cached_search", lambda query, year, region, safesearch: calls.append("search") or [
+        {"title": "Moules", "href": "https://example.com", "body": "Snippet"}])
+    monkeypatch.setattr(fetch_tools, "fetch_text", lambda url: calls.append("fetch") or "<p>Page</p>")
+    monkeypatch.setattr(scrape_tools, "scrape_url", lambda url: calls.append("scrape") or "Page")
+    monkeypatch.setattr(summarize_tools, "summarize_document", lambda text, model, language, url, query: calls.append("summarize") or "Summary")
+    monkeypatch.setattr(summarize_tools, "for_role", lambda model, role: model)
+
+    def agent():
+        # Each agent has its own tool instances, as in business_plan
+        assert "Link: https://example.com" in search_tools.SearchTools().search_internet.func("moules", 2024)
+        assert fetch_tools.FetchTools().fetch_with_user_agent.func("https://example.com") == "<p>Page</p>"
+        assert scrape_tools.ScrapeTools().scrape.func("https://example.com") == "Page"
+        assert summarize_tools.SummarizeTools().summarize.func("Page", object(), 0.5, "French", "https://example.com", "moules") == "Summary"
+
+    with tool_run() as memo:
+        agent()
+        agent()
+    # The fetched page is parsed rather than scraped again
+    assert calls == ["search", "fetch", "summarize"]
+    assert {tool: values["reused"] for tool, values in memo.stats().items()} == {"search": 1, "fetch": 1, "scrape": 1, "summarize": 1}
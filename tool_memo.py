@@ -0,0 +1,123 @@
+"""Memoization of tool results for the duration of one crew run.
+
+The business plan agents are given their own tool instances, yet they research
+the same industry and often search, fetch and scrape the same sources. Inside
+tool_run() every search, fetch, scrape and summarize call is keyed on its
+arguments and computed once for all agents; concurrent identical calls wait for
+the first one instead of repeating it. Outside a run the tools behave as before.
+"""
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from telemetry import annotate
+
+_current_run = contextvars.ContextVar("tool_run", default=None)
+
+def _key(tool, args) -> str:
+    payload = json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+    return tool + "\x1f" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ToolMemo:
+    """Results of one run's tool calls, with per-tool call and reuse counts."""
+
+    def __init__(self):
+        self._results: Dict[str, Future] = {}
+        # Per key: tool name, time the first call took and number of calls that reused it
+        self._durations: Dict[str, float] = {}
+        self._reuses: Dict[str, int] = {}
+        self._tools: Dict[str, str] = {}
+        self._calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def call(self, tool, args, function: Callable[[], str]) -> str:
+        """Result of function() for these arguments, computed at most once per run."""
+        key = _key(tool, args)
+        with self._lock:
+            self._calls[tool] = self._calls.get(tool, 0) + 1
+            self._tools[key] = tool
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+            else:
+                self._reuses[key] = self._reuses.get(key, 0) + 1
+        if not owner:
+            annotate(tool_reused=tool)
+            return future.result()
+        started = time.perf_counter()
+        try:
+            result = function()
+        except BaseException as e:
+            # Failures are not memoized: drop the entry so a later call can retry
+            with self._lock:
+                del self._results[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._durations[key] = time.perf_counter() - started
+        future.set_result(result)
+        return result
+
+    def peek(self, tool, args) -> Optional[str]:
+        """The finished result of an earlier call, if there is one, without counting a call."""
+        with self._lock:
+            future = self._results.get(_key(tool, args))
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per tool: calls made, calls served from an earlier result, and the time those would have taken."""
+        with self._lock:
+            stats = {tool: {"calls": calls, "reused": 0, "seconds_saved": 0.0} for tool, calls in self._calls.items()}
+            for key, reuses in self._reuses.items():
+                stats[self._tools[key]]["reused"] += reuses
+                stats[self._tools[key]]["seconds_saved"] += reuses * self._durations.get(key, 0.0)
+        return stats
+
+    def summary(self) -> str:
+        """One line per tool, e.g. "scrape: 4 of 9 calls reused (~12.3 s saved)"."""
+        return "\n".join(
+            f"{tool}: {int(values['reused'])} of {int(values['calls'])} calls reused (~{values['seconds_saved']:.1f} s saved)"
+            for tool, values in sorted(self.stats().items())
+        )
+
+@contextmanager
+def tool_run():
+    """Share tool results between all agents of the run in this block (threads started with telemetry.in_context included)."""
+    memo = ToolMemo()
+    token = _current_run.set(memo)
+    try:
+        yield memo
+    finally:
+        _current_run.reset(token)
+
+def current_run() -> Optional[ToolMemo]:
+    return _current_run.get()
+
+def memoized(tool, ignore: Tuple[str, ...] = ()):
+    """Decorator for a tool function: inside tool_run(), reuse the result of an identical earlier call.
+
+    Arguments named in ignore (model objects, for instance) are left out of the key.
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            memo = _current_run.get()
+            if memo is None:
+                return function(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key_args = {name: value for name, value in bound.arguments.items() if name not in ignore}
+            return memo.call(tool, key_args, lambda: function(*args, **kwargs))
+        return wrapper
+    return decorator
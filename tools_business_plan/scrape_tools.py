@@ -1,15 +1,22 @@
-from bs4 import BeautifulSoup
 from langchain.tools import tool
-from tools_business_plan.fetch_tools import FetchTools
+from extraction import scrape_url, extract_main_text
+from tool_memo import memoized, current_run
+
+@memoized("scrape")
+def scrape_page(url: str):
+    # A page another agent already fetched in full is parsed again rather than downloaded again
+    run = current_run()
+    html_content = run.peek("fetch", {"url": url}) if run else None
+    if html_content:
+        return extract_main_text(html_content)
+    return scrape_url(url)
 
 class ScrapeTools:
     @tool("scrape")
     def scrape(url: str) -> str:
-        """Scrape a webpage and return its text content."""
-        html_content = FetchTools.fetch_with_user_agent(url)
-        if html_content:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            text_content = soup.get_text()
+        """Scrape a webpage and return its main text content."""
+        text_content = scrape_page(url)
+        if text_content:
             return text_content
         else:
             return "You do not have permission to access the requested page."
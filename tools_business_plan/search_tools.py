@@ -1,13 +1,18 @@
 import json
 from langchain.tools import tool
-from duckduckgo_search import DDGS
+from search_cache import cached_search
+from tool_memo import memoized
+
+@memoized("search")
+def search_results(query: str, year: int, region: str = "wt-wt", safesearch: str = "moderate"):
+    """The search results, shared by every agent of the current run."""
+    return cached_search(query, year, region=region, safesearch=safesearch)
 
 class SearchTools:
     @tool("search")
     def search_internet(query: str, year: int, region: str = "wt-wt", safesearch: str = "moderate") -> str:
         """Search the internet for a given topic and return relevant results."""
-        ddgs = DDGS()
-        results = ddgs.text(f"{query} {year}", region=region, safesearch=safesearch)
+        results = search_results(query, year, region, safesearch)
 
         if not results:
             return "Sorry, I couldn't find anything about that, there could be an error with your search tool."